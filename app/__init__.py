@@ -1,10 +1,27 @@
 # app/__init__.py
 
-from .agent_orchestrator import determine_data_source, process_user_input_stream, run_agent_orchestrator
-from .tools.data_analyst_agent import DataVisualizationAgent
-from .tools.sql_data_analyst_agent import SQLDataAnalysisAgent
-from .visualization_server import VisualizationServer
+import importlib
 
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .agent_orchestrator import determine_data_source, process_user_input_stream, run_agent_orchestrator
+    from .tools.data_analyst_agent import DataVisualizationAgent
+    from .tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+    from .visualization_server import VisualizationServer
+
+
+# Exports load their module on first access, so importing one tool (or a worker process
+# importing its module) does not pull in the orchestrator, LLM clients and plotting stack
+_EXPORTS = {
+    "determine_data_source": ".agent_orchestrator",
+    "process_user_input_stream": ".agent_orchestrator",
+    "run_agent_orchestrator": ".agent_orchestrator",
+    "VisualizationServer": ".visualization_server",
+    "DataVisualizationAgent": ".tools.data_analyst_agent",
+    "SQLDataAnalysisAgent": ".tools.sql_data_analyst_agent",
+}
 
 __all__ = [
     "determine_data_source",
@@ -14,3 +31,12 @@ __all__ = [
     "DataVisualizationAgent",
     "SQLDataAnalysisAgent",
 ]
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
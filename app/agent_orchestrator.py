@@ -1,331 +1,611 @@
-import os
-
-from dataclasses import dataclass
-from typing import Any, TypedDict
-
-import pandas as pd
-import sqlalchemy as sql
-
-from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
-from pydantic_ai import Agent, RunContext
-from pydantic_ai.usage import UsageLimits
-
-from app.tools.data_analyst_agent import DataVisualizationAgent
-from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
-
-
-# Define our dependency type for orchestration
-@dataclass
-class OrchestratorDependency:
-    """Dependencies for the orchestrator agent."""
-
-    user_prompt: str
-    model: BaseChatModel
-    data: pd.DataFrame | None = None
-    db_connection: sql.engine.base.Connection | None = None
-    usage_limits: UsageLimits | None = None
-
-
-# Type for streamed results
-class AnalysisResult(TypedDict):
-    success: bool
-    message: str
-    visualization_path: str | None
-    error: str | None
-    data_summary: dict[str, Any] | None
-
-
-# Create our master orchestrator agent
-orchestrator_agent = Agent(
-    "openai:gpt-4o",
-    deps_type=OrchestratorDependency,
-    result_type=AnalysisResult,
-    system_prompt="""
-    You are an expert data analysis orchestrator. Your job is to:
-    1. Understand user requests related to data analysis and visualization
-    2. Determine whether to use SQL database analysis or direct DataFrame analysis
-    3. Call the appropriate agent to handle the request
-    4. Return results in a clear, organized manner
-
-    For SQL database requests, use the sql_agent tool.
-    For DataFrame visualization requests, use the visualization_agent tool.
-""",
-)
-
-
-@orchestrator_agent.tool
-async def sql_agent(ctx: RunContext[OrchestratorDependency], query: str) -> dict[str, Any]:  # noqa: D417
-    """Process a SQL database query and visualization request.
-
-    Args:
-        query: The user's analysis request/question about the database
-
-    Returns:
-        A dictionary with the analysis results
-
-    """
-    if ctx.deps.db_connection is None:
-        return {"error": "Database connection is required but not provided"}
-
-    # Initialize the SQL agent with the provided connection
-    sql_agent = SQLDataAnalysisAgent(
-        model=ctx.deps.model, connection=ctx.deps.db_connection, n_samples=5, log=True, log_path="logs/", verbose=True
-    )
-
-    # Execute the query but don't auto-display (we'll handle that)
-    results = sql_agent.invoke_agent(query, auto_display=False)
-
-    # Check for errors
-    if results.get("error"):
-        return {"success": False, "error": results.get("error"), "message": f"Analysis failed: {results.get('error')}"}
-
-    # Get visualization path if available
-    vis_path = None
-    if results.get("plotly_graph"):
-        if not os.path.exists("visualizations"):
-            os.makedirs("visualizations")
-        vis_path = "visualizations/analysis_result.html"
-        results.get("plotly_graph").write_html(vis_path)
-
-    # Get data summary
-    data_summary = None
-    df = sql_agent.get_data_sql()
-    if df is not None and not isinstance(df, str):
-        data_summary = {
-            "shape": df.shape,
-            "columns": list(df.columns),
-            "sample": df.head(5).to_dict() if len(df) > 0 else {},
-        }
-
-    return {
-        "success": True,
-        "message": "SQL analysis completed successfully",
-        "visualization_path": vis_path,
-        "sql_query": sql_agent.get_sql_query_code(),
-        "data_summary": data_summary,
-    }
-
-
-@orchestrator_agent.tool
-async def visualization_agent(ctx: RunContext[OrchestratorDependency], instructions: str) -> dict[str, Any]:  # noqa: D417
-    """Create a visualization from a DataFrame based on instructions.
-
-    Args:
-        instructions: The visualization instructions
-
-    Returns:
-        A dictionary with the visualization results
-
-    """
-    if ctx.deps.data is None:
-        return {"error": "DataFrame is required but not provided"}
-
-    # Initialize the visualization agent
-    vis_agent = DataVisualizationAgent(model=ctx.deps.model, log=True, log_path="logs/")
-
-    # Generate the visualization
-    response = vis_agent.generate_visualization(data=ctx.deps.data, instructions=instructions)
-
-    # Check for errors
-    if not response.get("success", False):
-        return {
-            "success": False,
-            "error": response.get("error", "Unknown error"),
-            "message": f"Visualization failed: {response.get('error', 'Unknown error')}",
-        }
-
-    # Save the visualization if available
-    vis_path = None
-    fig = vis_agent.get_plotly_figure()
-    if fig:
-        if not os.path.exists("visualizations"):
-            os.makedirs("visualizations")
-        vis_path = "visualizations/analysis_result.html"
-        fig.write_html(vis_path)
-
-    return {
-        "success": True,
-        "message": "Visualization created successfully",
-        "visualization_path": vis_path,
-        "visualization_code": vis_agent.get_visualization_code(),
-        "explanation": response.get("explanation", ""),
-    }
-
-
-@orchestrator_agent.tool
-async def determine_data_source(ctx: RunContext[OrchestratorDependency], query: str) -> str:  # noqa: D417
-    """Determine whether to use SQL database or DataFrame analysis based on the query.
-
-    Args:
-        query: The user's analysis request/question
-
-    Returns:
-        A recommendation for which data source to use ("sql" or "dataframe")
-
-    """
-    # Check if we have both options available
-    has_db = ctx.deps.db_connection is not None
-    has_df = ctx.deps.data is not None
-
-    # If we only have one option, use that
-    if has_db and not has_df:
-        return "sql"
-    if has_df and not has_db:
-        return "dataframe"
-
-    # If we have both options, determine based on query content
-    sql_keywords = ["sql", "database", "table", "query", "join", "select", "from", "where"]
-    has_sql_keywords = any(keyword in query.lower() for keyword in sql_keywords)
-
-    if has_sql_keywords:
-        return "sql"
-    return "dataframe"
-
-
-async def process_user_input(
-    user_input: str,
-    data: pd.DataFrame = None,
-    db_connection: sql.engine.base.Connection = None,
-    usage_limits: UsageLimits = None,
-) -> dict[str, Any]:
-    """Process a user input with the orchestrator agent.
-
-    Args:
-        user_input: The user's prompt/question
-        data: Optional DataFrame to analyze
-        db_connection: Optional database connection
-        usage_limits: Optional usage limits
-
-    Returns:
-        The results of the analysis
-
-    """
-    # Set up the LLM
-    model = ChatOpenAI(model_name="gpt-4o")
-
-    # Create dependencies
-    deps = OrchestratorDependency(
-        user_prompt=user_input, model=model, data=data, db_connection=db_connection, usage_limits=usage_limits
-    )
-
-    # Run the agent
-    result = await orchestrator_agent.run(user_input, deps=deps, usage_limits=usage_limits)
-
-    return result.data
-
-
-async def run_agent_orchestrator(
-    user_input: str, data_path: str = None, db_url: str = None, usage_limits: UsageLimits = None
-) -> dict[str, Any]:
-    """Run the agent orchestrator with file path or database URL.
-
-    Args:
-        user_input: The user's prompt/question
-        data_path: Optional path to a data file (CSV, Excel)
-        db_url: Optional database URL
-        usage_limits: Optional usage limits
-
-    Returns:
-        The results of the analysis
-
-    """
-    data = None
-    db_connection = None
-
-    # Load data if provided
-    if data_path:
-        if data_path.endswith(".csv"):
-            data = pd.read_csv(data_path)
-        elif data_path.endswith((".xls", ".xlsx")):
-            data = pd.read_excel(data_path)
-        else:
-            return {"error": "Unsupported file format. Please use .csv, .xls, or .xlsx"}
-
-    # Set up database connection if provided
-    if db_url:
-        try:
-            engine = sql.create_engine(db_url)
-            db_connection = engine.connect()
-        except Exception as e:
-            return {"error": f"Failed to connect to database: {str(e)}"}
-
-    try:
-        # Process the request
-        result = await process_user_input(
-            user_input=user_input, data=data, db_connection=db_connection, usage_limits=usage_limits
-        )
-
-        # Clean up database connection if we created one
-        if db_connection:
-            db_connection.close()
-
-        return result
-    except Exception as e:
-        if db_connection:
-            db_connection.close()
-        return {"error": str(e)}
-
-
-# Streaming version of the process_user_input function
-async def process_user_input_stream(
-    user_input: str,
-    data: pd.DataFrame = None,
-    db_connection: sql.engine.base.Connection = None,
-    usage_limits: UsageLimits = None,
-):
-    """Process a user input with the orchestrator agent and stream the results.
-
-    Args:
-        user_input: The user's prompt/question
-        data: Optional DataFrame to analyze
-        db_connection: Optional database connection
-        usage_limits: Optional usage limits
-
-    Returns:
-        An async generator that yields progress updates
-
-    """
-    # Set up the LLM
-    model = ChatOpenAI(model_name="gpt-4o")
-
-    # Create dependencies
-    deps = OrchestratorDependency(
-        user_prompt=user_input, model=model, data=data, db_connection=db_connection, usage_limits=usage_limits
-    )
-
-    # First yield the starting message
-    yield "Starting analysis...\n"
-
-    try:
-        # Run the agent and get the result (non-streaming first)
-        run_result = await orchestrator_agent.run(user_input, deps=deps, usage_limits=usage_limits)
-
-        # Yield progress updates
-        yield "Processing data and creating visualization...\n"
-
-        # Get the final result
-        result = run_result.data
-
-        # Yield the final result summary
-        if result.get("success", False):
-            yield "\nAnalysis completed successfully!\n"
-            if result.get("visualization_path"):
-                yield f"Visualization saved to: {result.get('visualization_path')}\n"
-                yield "You can view the visualization in your browser.\n"
-
-            if result.get("data_summary"):
-                yield "\nData Summary:\n"
-                shape = result.get("data_summary", {}).get("shape")
-                if shape:
-                    yield f"- Shape: {shape[0]} rows × {shape[1]} columns\n"
-
-                columns = result.get("data_summary", {}).get("columns")
-                if columns:
-                    yield f"- Columns: {', '.join(columns)}\n"
-        else:
-            yield f"\nAnalysis failed: {result.get('error', 'Unknown error')}\n"
-
-    except Exception as e:
-        # Handle any exceptions
-        yield f"\nError during analysis: {str(e)}\n"
+import asyncio
+import os
+
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, TypedDict
+
+import pandas as pd
+import sqlalchemy as sql
+
+from langchain_core.language_models import BaseChatModel
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.usage import UsageLimits
+
+from app.database import get_engine_registry
+from app.tools.data_analyst_agent import DataVisualizationAgent
+from app.tools.file_sql_agent import OUT_OF_CORE_FORMAT_MESSAGE, FileSQLAnalysisAgent, supports_out_of_core
+from app.tools.ingestion import UNSUPPORTED_FORMAT_MESSAGE, is_supported, read_dataset
+from app.tools.llm_client import get_agent_model, get_chat_model
+from app.tools.result_store import get_result_store, result_handle
+from app.tools.sandbox import get_sandbox_pool
+from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+# Define our dependency type for orchestration
+@dataclass
+class OrchestratorDependency:
+    """Dependencies for the orchestrator agent."""
+
+    user_prompt: str
+    model: BaseChatModel
+    data: pd.DataFrame | None = None
+    db_connection: sql.engine.base.Connection | None = None
+    usage_limits: UsageLimits | None = None
+    # A connection is not thread-safe, so parallel tool calls on it take turns
+    db_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Progress messages from the tools, drained by process_user_input_stream
+    progress: asyncio.Queue | None = None
+    # Ids of the full tool results in the result store, attached to the final response
+    result_ids: list[str] = field(default_factory=list)
+
+
+# Type for streamed results; data summaries, SQL and code are attached from the result store afterwards
+class AnalysisResult(TypedDict):
+    success: bool
+    message: str
+    visualization_path: str | None
+    error: str | None
+
+
+@dataclass
+class _StreamedText:
+    """A chunk of the final message, passed through the progress queue unchanged."""
+
+    text: str
+
+
+# Create our master orchestrator agent; its requests share the rate limiter of the pipelines' LLM calls
+orchestrator_agent = Agent(
+    get_agent_model("gpt-4o"),
+    deps_type=OrchestratorDependency,
+    result_type=AnalysisResult,
+    system_prompt="""
+    You are an expert data analysis orchestrator. Your job is to:
+    1. Understand user requests related to data analysis and visualization
+    2. Determine whether to use SQL database analysis or direct DataFrame analysis
+    3. Call the appropriate agent to handle the request
+    4. Return results in a clear, organized manner
+
+    For SQL database requests, use the sql_agent tool.
+    For DataFrame visualization requests, use the visualization_agent tool.
+
+    Tools return a compact result handle (result_id, row and column counts). The full data,
+    SQL and code are attached to the response for you; do not ask for or repeat them.
+""",
+)
+
+
+def _progress_callback(deps: OrchestratorDependency) -> Callable[[str], None] | None:
+    """Return a callback that agents can call from any thread to report progress."""
+    queue = deps.progress
+    if queue is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    return lambda message: loop.call_soon_threadsafe(queue.put_nowait, message)
+
+
+@orchestrator_agent.tool
+async def sql_agent(ctx: RunContext[OrchestratorDependency], query: str) -> dict[str, Any]:  # noqa: D417
+    """Process a SQL database query and visualization request.
+
+    Args:
+        query: The user's analysis request/question about the database
+
+    Returns:
+        A compact handle to the analysis results
+
+    """
+    return _store_result(ctx.deps, await run_sql_analysis(ctx.deps, query))
+
+
+async def run_sql_analysis(deps: OrchestratorDependency, query: str) -> dict[str, Any]:
+    """Run the SQL analysis pipeline against the dependencies' database connection.
+
+    Args:
+        deps: The orchestrator dependencies
+        query: The user's analysis request/question about the database
+
+    Returns:
+        A dictionary with the analysis results
+
+    """
+    if deps.db_connection is None:
+        return {"error": "Database connection is required but not provided"}
+
+    # Initialize the SQL agent with the provided connection
+    sql_agent = SQLDataAnalysisAgent(
+        model=deps.model,
+        connection=deps.db_connection,
+        n_samples=5,
+        log=True,
+        log_path="logs/",
+        verbose=True,
+        progress=_progress_callback(deps),
+        sandbox=get_sandbox_pool(),
+    )
+
+    # LLM calls are awaited and database work runs on the database thread pool, so the event loop stays free
+    async with deps.db_lock:
+        results = await sql_agent.ainvoke_agent(query, auto_display=False)
+
+    return _sql_analysis_result(sql_agent, results)
+
+
+async def run_file_analysis(deps: OrchestratorDependency, data_path: str, query: str) -> dict[str, Any]:
+    """Run the SQL analysis pipeline on a data file queried in place with DuckDB.
+
+    Only the aggregated result of the generated SQL is loaded into pandas,
+    so files larger than memory can be analyzed.
+
+    Args:
+        deps: The orchestrator dependencies
+        data_path: Path of a CSV, TSV, Parquet or JSON Lines file
+        query: The user's analysis request/question about the file
+
+    Returns:
+        A dictionary with the analysis results
+
+    """
+    if not supports_out_of_core(data_path):
+        return {"error": OUT_OF_CORE_FORMAT_MESSAGE}
+
+    file_agent = FileSQLAnalysisAgent(
+        model=deps.model,
+        data_path=data_path,
+        n_samples=5,
+        log=True,
+        log_path="logs/",
+        verbose=True,
+        progress=_progress_callback(deps),
+        sandbox=get_sandbox_pool(),
+    )
+    try:
+        results = await file_agent.ainvoke_agent(query, auto_display=False)
+    finally:
+        file_agent.close()
+
+    return _sql_analysis_result(file_agent, results)
+
+
+def _sql_analysis_result(sql_agent: SQLDataAnalysisAgent, results: dict[str, Any]) -> dict[str, Any]:
+    """Build the pipeline result of a finished SQL agent run, saving its figure."""
+    # Check for errors
+    if results.get("error"):
+        return {"success": False, "error": results.get("error"), "message": f"Analysis failed: {results.get('error')}"}
+
+    # Get visualization path if available
+    vis_path = None
+    if results.get("plotly_graph"):
+        if not os.path.exists("visualizations"):
+            os.makedirs("visualizations")
+        vis_path = "visualizations/analysis_result.html"
+        results.get("plotly_graph").write_html(vis_path)
+
+    # Get data summary
+    data_summary = None
+    df = sql_agent.get_data_sql()
+    if df is not None and not isinstance(df, str):
+        data_summary = {
+            "shape": df.shape,
+            "columns": list(df.columns),
+            "sample": df.head(5).to_dict() if len(df) > 0 else {},
+        }
+
+    return {
+        "success": True,
+        "message": "SQL analysis completed successfully",
+        "visualization_path": vis_path,
+        "sql_query": sql_agent.get_sql_query_code(),
+        "used_cached_sql": results.get("used_cached_sql", False),
+        "used_cached_result": results.get("used_cached_result", False),
+        "used_cached_code": results.get("used_cached_code", False),
+        "data_truncated": results.get("data_truncated", False),
+        "data_summary": data_summary,
+    }
+
+
+@orchestrator_agent.tool
+async def visualization_agent(ctx: RunContext[OrchestratorDependency], instructions: str) -> dict[str, Any]:  # noqa: D417
+    """Create a visualization from a DataFrame based on instructions.
+
+    Args:
+        instructions: The visualization instructions
+
+    Returns:
+        A compact handle to the visualization results
+
+    """
+    return _store_result(ctx.deps, await run_visualization(ctx.deps, instructions))
+
+
+async def run_visualization(deps: OrchestratorDependency, instructions: str) -> dict[str, Any]:
+    """Run the visualization pipeline on the dependencies' DataFrame.
+
+    Args:
+        deps: The orchestrator dependencies
+        instructions: The visualization instructions
+
+    Returns:
+        A dictionary with the visualization results
+
+    """
+    if deps.data is None:
+        return {"error": "DataFrame is required but not provided"}
+
+    # Initialize the visualization agent
+    vis_agent = DataVisualizationAgent(
+        model=deps.model, log=True, log_path="logs/", progress=_progress_callback(deps), sandbox=get_sandbox_pool()
+    )
+
+    # Generate the visualization
+    response = await vis_agent.agenerate_visualization(data=deps.data, instructions=instructions)
+
+    # Check for errors
+    if not response.get("success", False):
+        return {
+            "success": False,
+            "error": response.get("error", "Unknown error"),
+            "message": f"Visualization failed: {response.get('error', 'Unknown error')}",
+        }
+
+    # Save the visualization if available
+    vis_path = None
+    fig = vis_agent.get_plotly_figure()
+    if fig:
+        if not os.path.exists("visualizations"):
+            os.makedirs("visualizations")
+        vis_path = "visualizations/analysis_result.html"
+        fig.write_html(vis_path)
+
+    return {
+        "success": True,
+        "message": "Visualization created successfully",
+        "visualization_path": vis_path,
+        "visualization_code": vis_agent.get_visualization_code(),
+        "explanation": response.get("explanation", ""),
+        "used_cached_code": response.get("used_cached_code", False),
+    }
+
+
+@orchestrator_agent.tool
+async def determine_data_source(ctx: RunContext[OrchestratorDependency], query: str) -> str:  # noqa: D417
+    """Determine whether to use SQL database or DataFrame analysis based on the query.
+
+    Args:
+        query: The user's analysis request/question
+
+    Returns:
+        A recommendation for which data source to use ("sql" or "dataframe")
+
+    """
+    # If we only have one option, use that
+    source = _single_data_source(ctx.deps)
+    if source is not None:
+        return source
+
+    # If we have both options, determine based on query content
+    sql_keywords = ["sql", "database", "table", "query", "join", "select", "from", "where"]
+    has_sql_keywords = any(keyword in query.lower() for keyword in sql_keywords)
+
+    if has_sql_keywords:
+        return "sql"
+    return "dataframe"
+
+
+def _store_result(deps: OrchestratorDependency, result: dict[str, Any]) -> dict[str, Any]:
+    """Keep a tool's full result server-side and return the compact handle the LLM sees."""
+    if not result.get("success", False):
+        # Failures are short and the model needs the error to react to it
+        return {"success": False, "error": result.get("error"), "message": result.get("message", "")}
+    result_id = get_result_store().put(result)
+    deps.result_ids.append(result_id)
+    return result_handle(result_id, result)
+
+
+def _attach_results(result: dict[str, Any], deps: OrchestratorDependency) -> dict[str, Any]:
+    """Attach the payloads of this run's successful tool calls to the model's final answer.
+
+    Every payload is listed under its result id in ``results``. The latest
+    payload's fields are also merged into a successful answer; a failed answer
+    keeps its own fields rather than those of an earlier tool call.
+    """
+    store = get_result_store()
+    payloads = {result_id: payload for result_id in deps.result_ids if (payload := store.get(result_id)) is not None}
+    if not payloads:
+        return result
+    attached = {**result, "results": payloads, "result_ids": list(payloads)}
+    if result.get("success", False):
+        latest = list(payloads.values())[-1]
+        attached.update({key: value for key, value in latest.items() if key not in ("success", "message")})
+    return attached
+
+
+def _single_data_source(deps: OrchestratorDependency) -> str | None:
+    """Return "sql" or "dataframe" when only that data source is available, None otherwise."""
+    has_db = deps.db_connection is not None
+    has_df = deps.data is not None
+    if has_db and not has_df:
+        return "sql"
+    if has_df and not has_db:
+        return "dataframe"
+    return None
+
+
+def _as_analysis_result(result: dict[str, Any]) -> dict[str, Any]:
+    """Fill in the ``AnalysisResult`` keys a pipeline result may leave out."""
+    return {
+        "success": False,
+        "message": "",
+        "visualization_path": None,
+        "error": None,
+        "data_summary": None,
+        **result,
+    }
+
+
+async def _run_pipeline(deps: OrchestratorDependency, source: str, user_input: str) -> dict[str, Any]:
+    """Run the SQL ("sql") or visualization ("dataframe") pipeline without the orchestrator LLM."""
+    if source == "sql":
+        return _as_analysis_result(await run_sql_analysis(deps, user_input))
+    return _as_analysis_result(await run_visualization(deps, user_input))
+
+
+async def process_user_input(
+    user_input: str,
+    data: pd.DataFrame = None,
+    db_connection: sql.engine.base.Connection = None,
+    usage_limits: UsageLimits = None,
+    direct_dispatch: bool = True,
+) -> dict[str, Any]:
+    """Process a user input with the orchestrator agent.
+
+    Args:
+        user_input: The user's prompt/question
+        data: Optional DataFrame to analyze
+        db_connection: Optional database connection
+        usage_limits: Optional usage limits
+        direct_dispatch: Call the SQL or visualization pipeline directly when only one data source is given,
+            skipping the orchestrator's routing LLM calls
+
+    Returns:
+        The results of the analysis
+
+    """
+    # Use the shared, rate-limited LLM client
+    model = get_chat_model("gpt-4o")
+
+    # Create dependencies
+    deps = OrchestratorDependency(
+        user_prompt=user_input, model=model, data=data, db_connection=db_connection, usage_limits=usage_limits
+    )
+
+    # With a single data source there is nothing to route
+    source = _single_data_source(deps) if direct_dispatch else None
+    if source is not None:
+        return await _run_pipeline(deps, source, user_input)
+
+    # Run the agent
+    result = await orchestrator_agent.run(user_input, deps=deps, usage_limits=usage_limits)
+
+    return _attach_results(result.data, deps)
+
+
+async def run_agent_orchestrator(
+    user_input: str,
+    data_path: str = None,
+    db_url: str = None,
+    usage_limits: UsageLimits = None,
+    direct_dispatch: bool = True,
+    sheet_name: str | None = None,
+    out_of_core: bool = False,
+) -> dict[str, Any]:
+    """Run the agent orchestrator with file path or database URL.
+
+    Args:
+        user_input: The user's prompt/question
+        data_path: Optional path to a data file (CSV, TSV, Excel, Parquet, Feather, JSON Lines)
+        db_url: Optional database URL
+        usage_limits: Optional usage limits
+        direct_dispatch: Skip the orchestrator LLM when only one data source is given
+        sheet_name: Sheet to analyze when ``data_path`` is an Excel workbook (the first by default)
+        out_of_core: Query ``data_path`` in place with DuckDB instead of loading it, for files larger than memory
+
+    Returns:
+        The results of the analysis
+
+    """
+    data = None
+    db_connection = None
+
+    # Out-of-core files are never loaded; the generated SQL aggregates them in place
+    if data_path and out_of_core:
+        if db_url:
+            return {"error": "Out-of-core mode analyzes a single file; it cannot be combined with a database"}
+        deps = OrchestratorDependency(user_prompt=user_input, model=get_chat_model("gpt-4o"), usage_limits=usage_limits)
+        return _as_analysis_result(await run_file_analysis(deps, data_path, user_input))
+
+    # Load data if provided
+    if data_path:
+        if not is_supported(data_path):
+            return {"error": UNSUPPORTED_FORMAT_MESSAGE}
+        data = read_dataset(data_path, sheet_name=sheet_name)
+
+    # Check a connection out of the shared pool for this URL
+    if db_url:
+        try:
+            db_connection = get_engine_registry().get_engine(db_url).connect()
+        except Exception as e:
+            return {"error": f"Failed to connect to database: {str(e)}"}
+
+    try:
+        # Process the request
+        result = await process_user_input(
+            user_input=user_input,
+            data=data,
+            db_connection=db_connection,
+            usage_limits=usage_limits,
+            direct_dispatch=direct_dispatch,
+        )
+
+        # Return the connection to the pool
+        if db_connection:
+            db_connection.close()
+
+        return result
+    except Exception as e:
+        if db_connection:
+            db_connection.close()
+        return {"error": str(e)}
+
+
+# Streaming version of the process_user_input function
+async def process_user_input_stream(
+    user_input: str,
+    data: pd.DataFrame = None,
+    db_connection: sql.engine.base.Connection = None,
+    usage_limits: UsageLimits = None,
+    db_url: str | None = None,
+    direct_dispatch: bool = True,
+):
+    """Process a user input with the orchestrator agent and stream the results.
+
+    Args:
+        user_input: The user's prompt/question
+        data: Optional DataFrame to analyze
+        db_connection: Optional database connection
+        usage_limits: Optional usage limits
+        db_url: Optional database URL, used when no connection is given
+        direct_dispatch: Run the SQL or visualization pipeline directly when only one data source is given,
+            streaming its progress without the orchestrator's routing LLM calls
+
+    Returns:
+        An async generator that yields progress updates
+
+    """
+    if db_connection is None and db_url:
+        try:
+            connection = get_engine_registry().get_engine(db_url).connect()
+        except Exception as e:
+            yield f"\nFailed to connect to database: {str(e)}\n"
+            return
+        try:
+            async for message in process_user_input_stream(
+                user_input,
+                data=data,
+                db_connection=connection,
+                usage_limits=usage_limits,
+                direct_dispatch=direct_dispatch,
+            ):
+                yield message
+        finally:
+            # Return the connection to the pool
+            connection.close()
+        return
+
+    # Use the shared, rate-limited LLM client
+    model = get_chat_model("gpt-4o")
+
+    # Create dependencies; the tools report progress through the queue
+    progress: asyncio.Queue = asyncio.Queue()
+    deps = OrchestratorDependency(
+        user_prompt=user_input,
+        model=model,
+        data=data,
+        db_connection=db_connection,
+        usage_limits=usage_limits,
+        progress=progress,
+    )
+
+    # First yield the starting message
+    yield "Starting analysis...\n"
+
+    try:
+        result = None
+        # With a single data source there is nothing to route
+        source = _single_data_source(deps) if direct_dispatch else None
+        async for event in _stream_run_events(user_input, deps, usage_limits, source):
+            if isinstance(event, str):
+                yield event
+            else:
+                result = _attach_results(event, deps)
+
+        # Yield the final result summary
+        for line in _result_summary(result):
+            yield line
+
+    except Exception as e:
+        # Handle any exceptions
+        yield f"\nError during analysis: {str(e)}\n"
+
+
+async def _stream_run_events(
+    user_input: str, deps: OrchestratorDependency, usage_limits: UsageLimits | None, source: str | None = None
+) -> AsyncIterator[str | dict[str, Any]]:
+    """Run the orchestrator with ``run_stream`` (or one pipeline directly) and yield events as they happen.
+
+    Progress messages from the tools and the final message text are yielded
+    as strings while the run is in flight; the final result dict comes last.
+    With a ``source``, that pipeline runs without the orchestrator LLM.
+    """
+    queue = deps.progress
+
+    async def run() -> dict[str, Any]:
+        if source is not None:
+            return await _run_pipeline(deps, source, user_input)
+        async with orchestrator_agent.run_stream(user_input, deps=deps, usage_limits=usage_limits) as stream:
+            # Forward the final message text as it is generated
+            streamed = ""
+            async for partial in stream.stream(debounce_by=0.05):
+                message = (partial or {}).get("message") or ""
+                if message.startswith(streamed) and len(message) > len(streamed):
+                    queue.put_nowait(_StreamedText(("\n" if not streamed else "") + message[len(streamed) :]))
+                    streamed = message
+            if streamed:
+                queue.put_nowait(_StreamedText("\n"))
+            return await stream.get_data()
+
+    task = asyncio.create_task(run())
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield _format_progress(getter.result())
+            else:
+                getter.cancel()
+        while not queue.empty():
+            yield _format_progress(queue.get_nowait())
+        yield task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _result_summary(result: dict[str, Any]) -> Iterator[str]:
+    """Yield the lines summarizing a finished analysis."""
+    if result.get("success", False):
+        yield "\nAnalysis completed successfully!\n"
+        if result.get("visualization_path"):
+            yield f"Visualization saved to: {result.get('visualization_path')}\n"
+            yield "You can view the visualization in your browser.\n"
+
+        if result.get("data_summary"):
+            yield "\nData Summary:\n"
+            shape = result.get("data_summary", {}).get("shape")
+            if shape:
+                yield f"- Shape: {shape[0]} rows × {shape[1]} columns\n"
+
+            columns = result.get("data_summary", {}).get("columns")
+            if columns:
+                yield f"- Columns: {', '.join(columns)}\n"
+    else:
+        yield f"\nAnalysis failed: {result.get('error', 'Unknown error')}\n"
+
+
+def _format_progress(event: str | _StreamedText) -> str:
+    """Format a progress message from the tools as a line of the stream."""
+    if isinstance(event, _StreamedText):
+        return event.text
+    return f"- {event}\n"
@@ -0,0 +1,172 @@
+import asyncio
+import functools
+import os
+import threading
+import weakref
+
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+import sqlalchemy as sql
+
+
+T = TypeVar("T")
+
+
+def _default_pool_options() -> dict[str, Any]:
+    """Pool settings for server databases, overridable through the environment."""
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        # Recycle connections before servers or proxies drop them as idle
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        # Test connections on checkout so a dropped one is replaced instead of failing the request
+        "pool_pre_ping": True,
+    }
+
+
+def _is_memory_sqlite(url: sql.engine.URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+class EngineRegistry:
+    """Process-wide registry of pooled engines, one per database URL.
+
+    Request handlers check connections out of the shared pool and return them
+    when done, instead of creating a new engine (and handshake) per request.
+    """
+
+    def __init__(self, **pool_options: Any):
+        """Initialize the registry.
+
+        Args:
+            **pool_options: Options passed to ``create_engine`` for pooled databases,
+                overriding the defaults (and the ``DB_POOL_*`` environment variables)
+
+        """
+        self.pool_options = pool_options
+        self._engines: dict[str, sql.engine.Engine] = {}
+        self._lock = threading.Lock()
+
+    def get_engine(self, db_url: str) -> sql.engine.Engine:
+        """Return the shared engine for a URL, creating it on first use.
+
+        Args:
+            db_url: The database URL
+
+        Returns:
+            The pooled engine for the URL
+
+        """
+        with self._lock:
+            engine = self._engines.get(db_url)
+            if engine is None:
+                engine = self._engines[db_url] = self._create_engine(db_url)
+            return engine
+
+    @contextmanager
+    def connect(self, db_url: str) -> Iterator[sql.engine.base.Connection]:
+        """Check a connection out of the URL's pool and return it when the block exits."""
+        connection = self.get_engine(db_url).connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def dispose(self, db_url: str | None = None) -> None:
+        """Close the pooled connections of one URL, or of every URL if none is given."""
+        with self._lock:
+            urls = [db_url] if db_url is not None else list(self._engines)
+            engines = [self._engines.pop(url) for url in urls if url in self._engines]
+        for engine in engines:
+            engine.dispose()
+
+    def _create_engine(self, db_url: str) -> sql.engine.Engine:
+        url = sql.engine.make_url(db_url)
+        if _is_memory_sqlite(url):
+            # In-memory SQLite uses a per-thread single-connection pool; pool sizing does not apply
+            return sql.create_engine(db_url)
+        return sql.create_engine(db_url, **{**_default_pool_options(), **self.pool_options})
+
+
+# Global registry instance
+_registry = None
+
+
+def get_engine_registry() -> EngineRegistry:
+    """Get or create the shared engine registry."""
+    global _registry
+    if _registry is None:
+        _registry = EngineRegistry()
+    return _registry
+
+
+class DatabaseExecutor:
+    """Run blocking database work off the event loop with per-database limits.
+
+    Work runs on a bounded thread pool shared by all databases, and each
+    database may only occupy a limited number of its threads at once, so one
+    slow or busy database cannot starve requests against the others.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_concurrency: int | None = None):
+        """Initialize the executor.
+
+        Args:
+            max_workers: Threads shared by all databases (``DB_EXECUTOR_WORKERS``, default 16)
+            max_concurrency: Concurrent jobs allowed per database (``DB_MAX_CONCURRENCY``, default 4)
+
+        """
+        self.max_workers = max_workers or int(os.environ.get("DB_EXECUTOR_WORKERS", "16"))
+        self.max_concurrency = max_concurrency or int(os.environ.get("DB_MAX_CONCURRENCY", "4"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        # asyncio primitives belong to one event loop, so semaphores are kept per loop
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _semaphore(self, database: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            semaphore = semaphores.get(database)
+            if semaphore is None:
+                semaphore = semaphores[database] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+
+    async def run(self, database: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking function on the pool, waiting for a free slot of its database.
+
+        Args:
+            database: Key of the database the work runs against (see ``engine_cache_key``)
+            func: The blocking function
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The function's return value
+
+        """
+        async with self._semaphore(database):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """Wait for running jobs and stop the threads."""
+        self._executor.shutdown(wait=True)
+
+
+# Global executor instance
+_executor = None
+
+
+def get_database_executor() -> DatabaseExecutor:
+    """Get or create the shared database executor."""
+    global _executor
+    if _executor is None:
+        _executor = DatabaseExecutor()
+    return _executor
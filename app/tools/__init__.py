@@ -1,5 +1,26 @@
-from .data_analyst_agent import DataVisualizationAgent
-from .sql_data_analyst_agent import SQLDataAnalysisAgent
+import importlib
 
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .data_analyst_agent import DataVisualizationAgent
+    from .sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+# The agents load on first access, so importing a lightweight tool module does not import them
+_EXPORTS = {
+    "DataVisualizationAgent": ".data_analyst_agent",
+    "SQLDataAnalysisAgent": ".sql_data_analyst_agent",
+}
 
 __all__ = ["SQLDataAnalysisAgent", "DataVisualizationAgent"]
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
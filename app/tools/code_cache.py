@@ -0,0 +1,144 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dataclasses import dataclass
+
+import pandas as pd
+
+from app.tools.question_cache import normalize_question
+
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS visualization_code (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        instruction TEXT NOT NULL,
+        code TEXT NOT NULL,
+        explanation TEXT,
+        used_at REAL NOT NULL,
+        UNIQUE (kind, fingerprint, instruction)
+    )
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_instruction(instruction: str) -> str:
+    """Canonicalize a chart request: synonyms as in ``normalize_question``, single spaces, no final punctuation."""
+    return _WHITESPACE.sub(" ", normalize_question(instruction)).strip().rstrip(".?!").strip()
+
+
+def layout_fingerprint(df: pd.DataFrame) -> str:
+    """Hash a DataFrame's column names and dtypes, so frames with the same layout share a fingerprint."""
+    digest = hashlib.sha256()
+    for name, dtype in df.dtypes.items():
+        digest.update(f"|{name}:{dtype}".encode())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedCode:
+    """Stored code that matched a chart request."""
+
+    id: int
+    code: str
+    explanation: str | None
+
+
+class VisualizationCodeCache:
+    """Reuse plotting code that worked for the same request on the same column layout.
+
+    Entries are keyed by the kind of code (e.g. a ``create_visualization``
+    function or a script assigning a figure), the layout fingerprint of the
+    DataFrame and the normalized request. Only code that built a figure is
+    stored; callers evict an entry when its code fails on new data.
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 2000):
+        """Open (or create) the code store.
+
+        Args:
+            path: SQLite file to persist entries in, or ":memory:" for this process only
+            max_entries: Entries kept before the least recently used are evicted
+
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(_SCHEMA)
+
+    def lookup(self, kind: str, instruction: str, fingerprint: str) -> CachedCode | None:
+        """Find the code stored for a request on a column layout.
+
+        Args:
+            kind: The kind of code, e.g. "create_visualization"
+            instruction: The chart request
+            fingerprint: Layout fingerprint of the DataFrame (see ``layout_fingerprint``)
+
+        Returns:
+            The stored code, or None
+
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, code, explanation FROM visualization_code "
+                "WHERE kind = ? AND fingerprint = ? AND instruction = ?",
+                (kind, fingerprint, normalize_instruction(instruction)),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE visualization_code SET used_at = ? WHERE id = ?", (time.time(), row[0]))
+        return CachedCode(id=row[0], code=row[1], explanation=row[2])
+
+    def store(self, kind: str, instruction: str, fingerprint: str, code: str, explanation: str | None = None) -> None:
+        """Remember code that built a figure for a request."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO visualization_code "
+                "(kind, fingerprint, instruction, code, explanation, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, fingerprint, normalize_instruction(instruction), code, explanation, time.time()),
+            )
+            self._evict()
+
+    def evict(self, entry_id: int) -> None:
+        """Drop an entry, e.g. because its code no longer builds a figure."""
+        with self._lock:
+            self._conn.execute("DELETE FROM visualization_code WHERE id = ?", (entry_id,))
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM visualization_code")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM visualization_code").fetchone()[0]
+
+    def _evict(self) -> None:
+        excess = self._conn.execute("SELECT COUNT(*) FROM visualization_code").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM visualization_code WHERE id IN "
+                "(SELECT id FROM visualization_code ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+
+
+_code_cache = None
+
+
+def get_code_cache() -> VisualizationCodeCache:
+    """Get or create the shared code cache (persisted when ``CODE_CACHE_PATH`` is set)."""
+    global _code_cache
+    if _code_cache is None:
+        _code_cache = VisualizationCodeCache(os.environ.get("CODE_CACHE_PATH") or ":memory:")
+    return _code_cache
@@ -1,27 +1,28 @@
 import logging
 import os
 
+from collections.abc import Callable
 from typing import Any
 
 import dotenv
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 
-from langchain.chat_models.base import BaseChatModel
-from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
 
+from app.tools.code_cache import VisualizationCodeCache, get_code_cache, layout_fingerprint
+from app.tools.data_profiler import ApproximateProfileConfig, profile_dataframe
+from app.tools.llm_cache import SQLiteResponseCache, cache_stats, cache_stats_since, with_response_cache
+from app.tools.llm_steps import LLMSteps, arun_llm_steps, run_llm_steps
+from app.tools.sandbox import SandboxPool, run_figure_code
 
-# Add statsmodels for advanced statistical analysis
-try:
-    import statsmodels.api as sm
-
-    HAVE_STATSMODELS = True
-except ImportError:
-    HAVE_STATSMODELS = False
 
 dotenv.load_dotenv()
 
+# Kind of generated code this agent stores in the code cache: a script that assigns a figure
+_CODE_KIND = "visualization_code"
+
 
 class DataVisualizationAgent:
     """An agent that uses AI to create data visualizations from natural language instructions.
@@ -36,6 +37,12 @@ class DataVisualizationAgent:
         log: bool = False,
         log_path: str | None = None,
         system_prompt_template: str | None = None,
+        approximate_profile: ApproximateProfileConfig | None = None,
+        llm_cache: SQLiteResponseCache | None = None,
+        progress: Callable[[str], None] | None = None,
+        sandbox: SandboxPool | None = None,
+        code_cache: VisualizationCodeCache | None = None,
+        reuse_code: bool = True,
     ):
         """Initialize the DataVisualizationAgent.
 
@@ -44,9 +51,22 @@ class DataVisualizationAgent:
             log: Whether to log the agent's operations
             log_path: Path to store logs (if logging is enabled)
             system_prompt_template: Custom system prompt to override the default
+            approximate_profile: Summarize large DataFrames from a row sample instead of exact statistics
+            llm_cache: Response cache for LLM calls (defaults to the one configured by LLM_CACHE_PATH, if any)
+            progress: Called with a short message as each step completes (data profiled, figure built, ...)
+            sandbox: Worker pool that runs the generated code under time and memory limits;
+                the code runs in this process when None
+            code_cache: Store of code that built a figure (defaults to the shared one)
+            reuse_code: Whether code that worked for the same request on the same column layout is reused
 
         """
-        self.model = model
+        self.model = with_response_cache(model, llm_cache)
+        self.approximate_profile = approximate_profile
+        self.progress = progress
+        self.sandbox = sandbox
+        if code_cache is None and reuse_code:
+            code_cache = get_code_cache()
+        self.code_cache = code_cache if reuse_code else None
         self.log = log
         self.log_path = log_path if log_path else os.path.join(os.getcwd(), "logs/")
         self._setup_logging()
@@ -104,6 +124,9 @@ class DataVisualizationAgent:
     def _format_data_summary(self, df: pd.DataFrame) -> str:
         """Create a summary of the dataframe to give the LLM context.
 
+        The profile is memoized by DataFrame contents, so code-fix retries and
+        follow-up questions on the same data reuse it.
+
         Args:
             df: The pandas DataFrame to summarize
 
@@ -111,36 +134,7 @@ class DataVisualizationAgent:
             A string containing the data summary
 
         """
-        summary = []
-
-        # Basic dataframe info
-        summary.append(f"DataFrame Shape: {df.shape[0]} rows, {df.shape[1]} columns")
-
-        # Column information
-        summary.append("\nColumn Information:")
-        for col in df.columns:
-            dtype = df[col].dtype
-            missing = df[col].isna().sum()
-            missing_pct = missing / len(df) * 100
-
-            unique_values = df[col].nunique()
-            unique_pct = unique_values / len(df) * 100  # noqa: F841
-
-            if df[col].dtype in ["int64", "float64"]:
-                min_val = df[col].min()
-                max_val = df[col].max()
-                mean_val = df[col].mean()
-                value_info = f"min={min_val:.2f}, max={max_val:.2f}, mean={mean_val:.2f}"
-            else:
-                if unique_values <= 10:  # For categorical with few unique values
-                    value_counts = df[col].value_counts().head(5).to_dict()
-                    value_info = f"top values={value_counts}"
-                else:
-                    value_info = f"unique values={unique_values}"
-
-            summary.append(f"- {col}: {dtype}, missing={missing} ({missing_pct:.1f}%), {value_info}")
-
-        return "\n".join(summary)
+        return profile_dataframe(df, approximate=self.approximate_profile).to_summary()
 
     def generate_visualization(self, data: pd.DataFrame, instructions: str, max_retries: int = 3) -> dict[str, Any]:
         """Generate a visualization based on user instructions.
@@ -154,13 +148,43 @@ class DataVisualizationAgent:
             A dictionary containing the response from the agent
 
         """
+        return run_llm_steps(self.model, self._generate_visualization_steps(data, instructions, max_retries))
+
+    async def agenerate_visualization(
+        self, data: pd.DataFrame, instructions: str, max_retries: int = 3
+    ) -> dict[str, Any]:
+        """Async variant of ``generate_visualization``.
+
+        LLM calls are awaited with ``ainvoke``; profiling the data and running
+        the generated code happen in a worker thread.
+
+        Args:
+            data: The pandas DataFrame to visualize
+            instructions: Natural language instructions for the visualization
+            max_retries: Maximum number of attempts to generate working code
+
+        Returns:
+            A dictionary containing the response from the agent
+
+        """
+        return await arun_llm_steps(self.model, self._generate_visualization_steps(data, instructions, max_retries))
+
+    def _generate_visualization_steps(
+        self, data: pd.DataFrame, instructions: str, max_retries: int
+    ) -> LLMSteps[dict[str, Any]]:
+        """Run the pipeline shared by ``generate_visualization`` and ``agenerate_visualization``."""
         # Reset stored results
         self.response = {}
         self.visualization_code = None
         self.plotly_figure = None
+        cache_start = cache_stats(self.model)
+
+        if self._reuse_cached_code(data, instructions):
+            return self.response
 
         # Create data summary for context
         data_summary = self._format_data_summary(data)
+        self._report_progress("Data profiled")
 
         # Log the request
         if self.log:
@@ -184,7 +208,7 @@ class DataVisualizationAgent:
         ]
 
         # Get the initial response
-        llm_response = self.model.invoke(messages)
+        llm_response = yield messages
 
         # Try to extract JSON content
         try:
@@ -207,12 +231,51 @@ class DataVisualizationAgent:
             else:
                 self.visualization_code = ""
 
+        self._report_progress("Visualization code generated")
+
         # Execute the visualization code
-        return self._execute_visualization_code(data, max_retries)
+        response = yield from self._execute_visualization_code_steps(data, max_retries)
+        if response["success"] and self.code_cache is not None:
+            self.code_cache.store(
+                _CODE_KIND, instructions, layout_fingerprint(data), self.visualization_code, response.get("explanation")
+            )
+        if cache_start is not None:
+            response["llm_cache"] = cache_stats_since(self.model, cache_start)
+        return response
 
-    def _execute_visualization_code(  # noqa: C901
-        self, data: pd.DataFrame, max_retries: int
-    ) -> dict[str, Any]:
+    def _reuse_cached_code(self, data: pd.DataFrame, instructions: str) -> bool:
+        """Build the figure with code that worked for the same request and column layout, if it still works."""
+        if self.code_cache is None:
+            return False
+
+        match = self.code_cache.lookup(_CODE_KIND, instructions, layout_fingerprint(data))
+        if match is None:
+            return False
+
+        self.visualization_code = match.code
+        try:
+            figure = self._run_visualization_code(data)
+        except Exception as e:
+            if self.log:
+                self.logger.info(f"Cached visualization code failed: {e}")
+            figure = None
+        if not isinstance(figure, go.Figure):
+            # The new data does not suit the stored code; generate fresh code
+            self.code_cache.evict(match.id)
+            self.visualization_code = None
+            return False
+
+        self.plotly_figure = figure
+        self.response = {
+            "code": match.code,
+            "explanation": match.explanation or "",
+            "success": True,
+            "used_cached_code": True,
+        }
+        self._report_progress("Figure built from the code of an identical earlier request")
+        return True
+
+    def _execute_visualization_code(self, data: pd.DataFrame, max_retries: int) -> dict[str, Any]:
         """Execute the generated visualization code with retry logic for errors.
 
         Args:
@@ -223,39 +286,27 @@ class DataVisualizationAgent:
             The response dictionary with the final result
 
         """
+        return run_llm_steps(self.model, self._execute_visualization_code_steps(data, max_retries))
+
+    def _execute_visualization_code_steps(self, data: pd.DataFrame, max_retries: int) -> LLMSteps[dict[str, Any]]:
+        """Run ``_execute_visualization_code`` as steps, yielding each code-fix request."""
         retry_count = 0
         success = False
         error_message = ""
 
         while not success and retry_count < max_retries:
             try:
-                # Create a safe execution environment
-                local_vars = {
-                    "df": data,
-                    "px": px,
-                    "go": go,
-                    "pd": pd,
-                    "Figure": go.Figure,  # Add Figure directly to avoid confusion
-                }
-
-                # Add statsmodels if available
-                if HAVE_STATSMODELS:
-                    local_vars["sm"] = sm
-
-                # Execute the code
-                exec(self.visualization_code, globals(), local_vars)
-
-                # Look for a figure object in the local variables
-                for var_name, var_value in local_vars.items():  # noqa: B007
-                    if isinstance(var_value, go.Figure):
-                        self.plotly_figure = var_value
-                        success = True
-                        break
+                # Execute the code and look for the figure it builds
+                figure = self._run_visualization_code(data)
+                if isinstance(figure, go.Figure):
+                    self.plotly_figure = figure
+                    success = True
+                    self._report_progress("Figure built")
 
                 if not success:
                     error_message = "No Plotly figure found in the generated code output."
                     retry_count += 1
-                    self._request_code_fix(data, error_message)
+                    yield from self._request_code_fix_steps(data, error_message)
 
             except Exception as e:
                 error_message = str(e)
@@ -272,7 +323,7 @@ class DataVisualizationAgent:
                     elif "has no attribute 'Figure'" in error_message:
                         error_message += ". Use go.Figure() for creating figures, not px.Figure()."
 
-                    self._request_code_fix(data, error_message)
+                    yield from self._request_code_fix_steps(data, error_message)
 
         # Update the response with execution results
         self.response["success"] = success
@@ -281,6 +332,17 @@ class DataVisualizationAgent:
 
         return self.response
 
+    def _run_visualization_code(self, data: pd.DataFrame) -> go.Figure | None:
+        """Run the generated code on the data, in the sandbox pool if one is set."""
+        if self.sandbox is not None:
+            return self.sandbox.run(self.visualization_code, data)
+        return run_figure_code(self.visualization_code, data)
+
+    def _report_progress(self, message: str) -> None:
+        """Pass a progress message to the progress callback, if one is set."""
+        if self.progress is not None:
+            self.progress(message)
+
     def _request_code_fix(self, data: pd.DataFrame, error_message: str) -> None:
         """Request a fix for the visualization code that produced an error.
 
@@ -289,6 +351,11 @@ class DataVisualizationAgent:
             error_message: The error message from the failed execution
 
         """
+        run_llm_steps(self.model, self._request_code_fix_steps(data, error_message))
+
+    def _request_code_fix_steps(self, data: pd.DataFrame, error_message: str) -> LLMSteps[None]:
+        """Run ``_request_code_fix`` as steps, yielding the LLM request."""
+        self._report_progress(f"Visualization code failed, requesting a fix: {error_message}")
         data_summary = self._format_data_summary(data)
 
         messages = [
@@ -318,7 +385,7 @@ class DataVisualizationAgent:
         ]
 
         # Get the response for fixing the code
-        llm_response = self.model.invoke(messages)
+        llm_response = yield messages
 
         # Try to extract JSON content
         try:
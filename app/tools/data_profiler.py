@@ -0,0 +1,337 @@
+import hashlib
+import os
+import threading
+import weakref
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+# Columns profiled per worker task; small frames are profiled in one task
+COLUMNS_PER_TASK = 16
+
+# Rows hashed when fingerprinting a DataFrame
+FINGERPRINT_SAMPLE_ROWS = 1024
+
+_PROFILE_CACHE_SIZE = 32
+# Distinct frames remembered per fingerprint
+_FRAMES_PER_FINGERPRINT = 4
+_NUMERIC_DTYPES = ("int64", "float64")
+_MAX_CATEGORICAL_UNIQUE = 10
+_TOP_VALUES = 5
+_QUANTILES = (0.05, 0.5, 0.95)
+
+
+@dataclass
+class ColumnProfile:
+    """Summary statistics for a single DataFrame column."""
+
+    name: Any
+    dtype: Any
+    missing: int
+    unique: int
+    min: float | None = None
+    max: float | None = None
+    mean: float | None = None
+    top_values: dict[Any, int] | None = None
+    # Only set by approximate profiles
+    quantiles: dict[float, float] | None = None
+    top_values_margin: int | None = None
+
+
+@dataclass(frozen=True)
+class ApproximateProfileConfig:
+    """Cost and accuracy settings for approximate profiling of large DataFrames.
+
+    Every statistic is computed from one uniform random sample of rows, so the
+    cost depends on the sample size rather than the number of rows.
+    """
+
+    # Frames with fewer rows are profiled exactly
+    min_rows: int = 1_000_000
+    # Rows sampled; proportions are within ±1.96 * sqrt(0.25 / sample_size) at 95% confidence
+    sample_size: int = 100_000
+    seed: int | None = 0
+
+
+@dataclass
+class DataProfile:
+    """Summary statistics for a whole DataFrame."""
+
+    n_rows: int
+    n_columns: int
+    columns: list[ColumnProfile] = field(default_factory=list)
+    approximate: ApproximateProfileConfig | None = None
+
+    def to_summary(self) -> str:
+        """Render the profile as the data summary given to the LLM."""
+        summary = [f"DataFrame Shape: {self.n_rows} rows, {self.n_columns} columns"]
+        if self.approximate is not None:
+            summary.append(self._approximation_note())
+        summary.append("\nColumn Information:")
+
+        eq = "=" if self.approximate is None else "≈"
+        for col in self.columns:
+            missing_pct = col.missing / self.n_rows * 100 if self.n_rows else 0.0
+
+            if col.mean is not None:
+                value_info = f"min{eq}{col.min:.2f}, max{eq}{col.max:.2f}, mean{eq}{col.mean:.2f}"
+                if col.quantiles:
+                    value_info += ", " + ", ".join(f"p{q * 100:g}≈{v:.2f}" for q, v in col.quantiles.items())
+            elif col.top_values is not None and col.top_values_margin is not None:
+                value_info = f"top values≈{col.top_values} (±{col.top_values_margin} each)"
+            elif col.top_values is not None:
+                value_info = f"top values={col.top_values}"
+            elif self.approximate is not None:
+                value_info = f"unique values≈{col.unique}"
+            else:
+                value_info = f"unique values={col.unique}"
+
+            summary.append(f"- {col.name}: {col.dtype}, missing{eq}{col.missing} ({missing_pct:.1f}%), {value_info}")
+
+        return "\n".join(summary)
+
+    def _approximation_note(self) -> str:
+        """Describe how the approximate statistics were computed and their error bounds."""
+        sample_rows = min(self.approximate.sample_size, self.n_rows)
+        share_margin = 1.96 * np.sqrt(0.25 / sample_rows) * 100 if sample_rows else 0.0
+        return (
+            f"Approximate profile: every figure comes from a {sample_rows}-row random sample. "
+            f"Missing counts and top values are scaled to all rows (shares within ±{share_margin:.1f} percentage points "
+            "at 95% confidence, top value margins shown); means and percentiles are sample estimates; "
+            "min and max are the sample's extremes, so the full range may be wider; "
+            "unique counts are extrapolated with the Haas-Stokes estimator."
+        )
+
+
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """Cheaply identify a DataFrame's contents for memoization.
+
+    Combines the shape, column names, dtypes and a hash of an evenly spaced row
+    sample (always including the first and last rows), so the cost does not grow
+    with the number of rows.
+
+    Args:
+        df: The DataFrame to fingerprint
+
+    Returns:
+        A hex string identifying the DataFrame
+
+    """
+    n_rows = len(df)
+    positions = np.unique(np.linspace(0, n_rows - 1, num=min(n_rows, FINGERPRINT_SAMPLE_ROWS), dtype=np.int64))
+    sample_hash = pd.util.hash_pandas_object(df.iloc[positions], index=True).to_numpy()
+
+    layout = hash((df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes))))
+    return f"{layout & 0xFFFFFFFFFFFFFFFF:016x}{int(np.bitwise_xor.reduce(sample_hash, initial=0)):016x}"
+
+
+_digests: dict[int, tuple[str, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def _forget_digest(frame_id: int) -> None:
+    with _digests_lock:
+        _digests.pop(frame_id, None)
+
+
+def dataframe_digest(df: pd.DataFrame) -> str:
+    """Identify a DataFrame's full contents, so equal digests mean equal data.
+
+    Hashes the layout and every row; unlike ``dataframe_fingerprint`` two
+    frames that differ only in unsampled rows get different digests. The
+    digest is remembered for the frame object (and rechecked against its
+    sampled fingerprint), so retries on one frame hash it once.
+
+    Args:
+        df: The DataFrame to identify
+
+    Returns:
+        A hex string identifying the DataFrame's contents
+
+    """
+    fingerprint = dataframe_fingerprint(df)
+    with _digests_lock:
+        cached = _digests.get(id(df))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes)))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    value = digest.hexdigest()
+
+    with _digests_lock:
+        if id(df) not in _digests:
+            weakref.finalize(df, _forget_digest, id(df))
+        _digests[id(df)] = (fingerprint, value)
+    return value
+
+
+def _profile_numeric(series: pd.Series) -> ColumnProfile:
+    """Profile an int64 or float64 column, counting distinct values on a sorted copy.
+
+    Sorting is several times faster than hashing for counting distinct numbers.
+    """
+    values = np.sort(series.to_numpy())
+    # NaN sorts last
+    present = len(values) - int(np.count_nonzero(np.isnan(values))) if values.dtype.kind == "f" else len(values)
+    values = values[:present]
+    return ColumnProfile(
+        name=series.name,
+        dtype=series.dtype,
+        missing=len(series) - present,
+        unique=int(np.count_nonzero(values[1:] != values[:-1])) + 1 if present else 0,
+        min=float(series.min()),
+        max=float(series.max()),
+        mean=float(series.mean()),
+    )
+
+
+def _profile_other(series: pd.Series) -> ColumnProfile:
+    """Profile a non-numeric column, counting missing values only when the column has any."""
+    uniques = series.unique()
+    missing_values = int(np.count_nonzero(pd.isna(uniques)))
+    profile = ColumnProfile(name=series.name, dtype=series.dtype, missing=0, unique=len(uniques) - missing_values)
+    if profile.unique <= _MAX_CATEGORICAL_UNIQUE:
+        # Counting with missing values included also gives the missing count
+        counts = series.value_counts(dropna=False)
+        counts = counts[counts.index.notna()]
+        profile.missing = len(series) - int(counts.sum())
+        profile.top_values = counts.head(_TOP_VALUES).to_dict()
+    elif missing_values:
+        profile.missing = int(series.isna().sum())
+    return profile
+
+
+def _profile_columns(df: pd.DataFrame) -> list[ColumnProfile]:
+    """Profile a group of columns, one pass over the values of each."""
+    return [
+        _profile_numeric(series) if series.dtype in _NUMERIC_DTYPES else _profile_other(series)
+        for _, series in df.items()
+    ]
+
+
+def _compute_profile(df: pd.DataFrame, max_workers: int) -> DataProfile:
+    """Profile all columns, fanning column groups out to a thread pool on wide frames."""
+    groups = [df.iloc[:, i : i + COLUMNS_PER_TASK] for i in range(0, df.shape[1], COLUMNS_PER_TASK)]
+
+    if len(groups) <= 1 or max_workers <= 1:
+        columns = [profile for group in groups for profile in _profile_columns(group)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+            columns = [profile for profiles in executor.map(_profile_columns, groups) for profile in profiles]
+
+    return DataProfile(n_rows=df.shape[0], n_columns=df.shape[1], columns=columns)
+
+
+def _estimate_distinct(counts: np.ndarray, n_rows: int) -> int:
+    """Estimate the distinct values among ``n_rows`` rows from a sample's value counts (Haas-Stokes Duj1)."""
+    sampled = int(counts.sum())
+    if not sampled:
+        return 0
+    singletons = int(np.count_nonzero(counts == 1))
+    estimate = sampled * len(counts) / (sampled - singletons + singletons * sampled / n_rows)
+    return round(min(max(estimate, len(counts)), n_rows))
+
+
+def _profile_sample(series: pd.Series, n_rows: int) -> ColumnProfile:
+    """Profile a column from a row sample, scaling counts to ``n_rows`` rows."""
+    scale = n_rows / len(series)
+    counts = series.value_counts(sort=False)
+    missing = len(series) - int(counts.sum())
+    profile = ColumnProfile(
+        name=series.name,
+        dtype=series.dtype,
+        missing=round(missing * scale),
+        unique=_estimate_distinct(counts.to_numpy(), n_rows - round(missing * scale)),
+    )
+    if series.dtype in _NUMERIC_DTYPES:
+        profile.min, profile.max, profile.mean = float(series.min()), float(series.max()), float(series.mean())
+        profile.quantiles = {q: float(v) for q, v in series.quantile(list(_QUANTILES)).items()}
+    elif profile.unique <= _MAX_CATEGORICAL_UNIQUE:
+        top = counts.sort_values(ascending=False).head(_TOP_VALUES)
+        profile.top_values = {value: round(count * scale) for value, count in top.items()}
+        # 95% binomial margin for the most uncertain proportion among the top values
+        shares = top.to_numpy() / len(series)
+        profile.top_values_margin = round(
+            1.96 * float(np.sqrt(shares * (1 - shares) / len(series)).max(initial=0)) * n_rows
+        )
+    return profile
+
+
+def _compute_approximate_profile(df: pd.DataFrame, config: ApproximateProfileConfig) -> DataProfile:
+    """Profile every column from one uniform random sample of rows."""
+    rng = np.random.default_rng(config.seed)
+    positions = np.sort(rng.choice(len(df), size=min(config.sample_size, len(df)), replace=False))
+    sample = df.iloc[positions]
+    columns = [_profile_sample(series, len(df)) for _, series in sample.items()]
+    return DataProfile(n_rows=df.shape[0], n_columns=df.shape[1], columns=columns, approximate=config)
+
+
+_profiles: OrderedDict[tuple, list[tuple[weakref.ref, DataProfile]]] = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def profile_dataframe(
+    df: pd.DataFrame, max_workers: int | None = None, approximate: ApproximateProfileConfig | None = None
+) -> DataProfile:
+    """Profile a DataFrame, reusing the result for the same frame or an equal one.
+
+    Profiles are found by ``dataframe_fingerprint``, which costs the same for
+    any number of rows. A frame seen before is recognized by identity, so a
+    frame changed in place outside the sampled rows keeps its profile; only
+    when a different frame shares the fingerprint are the two compared in full,
+    and approximate profiles are never matched that way.
+
+    Args:
+        df: The DataFrame to profile
+        max_workers: Threads used for wide frames (defaults to the CPU count, capped at 8)
+        approximate: Use a row sample for frames with at least ``approximate.min_rows`` rows
+
+    Returns:
+        The column statistics of the DataFrame
+
+    """
+    if approximate is not None and (len(df) < approximate.min_rows or df.empty):
+        approximate = None
+
+    key = (dataframe_fingerprint(df), approximate)
+    with _profiles_lock:
+        entries = [(ref(), profile) for ref, profile in _profiles.get(key, ())]
+        if entries:
+            _profiles.move_to_end(key)
+
+    for frame, profile in entries:
+        if frame is df:
+            return profile
+    if approximate is None:
+        # An approximate profile is cheaper to recompute than comparing the frames in full
+        for frame, profile in entries:
+            if frame is not None and frame.equals(df):
+                _remember(key, df, profile)
+                return profile
+
+    max_workers = max_workers or min(8, os.cpu_count() or 1)
+    if approximate is not None:
+        profile = _compute_approximate_profile(df, approximate)
+    else:
+        profile = _compute_profile(df, max_workers)
+
+    _remember(key, df, profile)
+    return profile
+
+
+def _remember(key: tuple, df: pd.DataFrame, profile: DataProfile) -> None:
+    """Store the profile of a frame, dropping collected frames and the least recently used fingerprints."""
+    with _profiles_lock:
+        entries = [(ref, kept) for ref, kept in _profiles.get(key, ()) if ref() is not None]
+        _profiles[key] = [*entries[-(_FRAMES_PER_FINGERPRINT - 1) :], (weakref.ref(df), profile)]
+        _profiles.move_to_end(key)
+        while len(_profiles) > _PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+
+from app.tools.ingestion import read_dataset
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the sha256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """Parsed datasets keyed by file content, so each file is parsed once per process.
+
+    DataFrames stay in memory within a byte budget, least recently used
+    first out. Evicted frames are spilled to Parquet, so loading the same
+    content again (a new upload, another session) reads Parquet instead of
+    re-parsing the source file.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = 1024 * 1024 * 1024,
+        directory: str | None = None,
+        disk_budget: int = 4 * 1024 * 1024 * 1024,
+        loader: Callable[..., pd.DataFrame] = read_dataset,
+    ):
+        """Initialize the cache.
+
+        Args:
+            memory_budget: Bytes of DataFrames kept in memory
+            directory: Where evicted DataFrames are spilled as Parquet; None disables spilling
+            disk_budget: Bytes of Parquet files kept in the spill directory
+            loader: Parses a file path (and keyword options) into a DataFrame
+
+        """
+        self.memory_budget = memory_budget
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self.loader = loader
+        self._frames: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._memory_bytes = 0
+        # Content digests of already-seen files, so repeated prompts on one upload skip hashing
+        self._digests: dict[tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def load(self, path: str, **options: Any) -> pd.DataFrame:
+        """Return the DataFrame for a file, parsing it only if its content has not been seen.
+
+        Args:
+            path: Path of the file
+            **options: Loader options (e.g. ``sheet_name``); part of the cache key
+
+        Returns:
+            A shallow copy of the cached DataFrame, so column changes by the caller stay private
+
+        """
+        key = self._key(path, options)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                self._frames.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0].copy(deep=False)
+
+        df = self._read_spilled(key)
+        if df is not None:
+            self._count("disk_hits")
+        else:
+            self._count("misses")
+            df = self.loader(path, **options)
+
+        self._store(key, df)
+        return df.copy(deep=False)
+
+    def clear(self) -> None:
+        """Drop the in-memory DataFrames (spilled files are kept)."""
+        with self._lock:
+            self._frames.clear()
+            self._memory_bytes = 0
+            self._digests.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit counts and memory usage."""
+        with self._lock:
+            return {**self._stats, "entries": len(self._frames), "memory_bytes": self._memory_bytes}
+
+    def _key(self, path: str, options: dict[str, Any]) -> str:
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(file_id)
+        if digest is None:
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[file_id] = digest
+        suffix = ",".join(f"{name}={options[name]}" for name in sorted(options) if options[name] is not None)
+        if not suffix:
+            return digest
+        return hashlib.sha256(f"{digest}|{suffix}".encode()).hexdigest()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _store(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        evicted = []
+        with self._lock:
+            if key in self._frames:
+                return
+            self._frames[key] = (df, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_budget and len(self._frames) > 1:
+                old_key, (old_df, old_size) = self._frames.popitem(last=False)
+                self._memory_bytes -= old_size
+                evicted.append((old_key, old_df))
+        for old_key, old_df in evicted:
+            self._spill(old_key, old_df)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _spill(self, key: str, df: pd.DataFrame) -> None:
+        """Write an evicted DataFrame to Parquet, keeping the spill directory within its budget."""
+        if self.directory is None or os.path.exists(self._spill_path(key)):
+            return
+        partial = f"{self._spill_path(key)}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(partial)
+            os.replace(partial, self._spill_path(key))
+        except (pa.ArrowException, TypeError, ValueError, OSError):
+            # Columns Parquet cannot represent (mixed Python objects) are simply re-parsed next time
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        self._trim_directory()
+
+    def _read_spilled(self, key: str) -> pd.DataFrame | None:
+        if self.directory is None:
+            return None
+        path = self._spill_path(key)
+        try:
+            df = pd.read_parquet(path)
+            # Mark as recently used for the directory's LRU
+            os.utime(path)
+        except (pa.ArrowException, OSError):
+            return None
+        return df
+
+    def _trim_directory(self) -> None:
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_budget:
+                break
+            os.remove(path)
+            total -= size
+
+
+_dataset_cache = None
+
+
+def get_dataset_cache() -> DatasetCache:
+    """Get or create the shared dataset cache.
+
+    ``DATASET_CACHE_MAX_BYTES`` sets the in-memory budget and ``DATASET_CACHE_DIR``
+    the spill directory (a directory under the system temp dir by default).
+    """
+    global _dataset_cache
+    if _dataset_cache is None:
+        _dataset_cache = DatasetCache(
+            memory_budget=int(os.environ.get("DATASET_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))),
+            directory=os.environ.get("DATASET_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "dataset_cache"),
+        )
+    return _dataset_cache
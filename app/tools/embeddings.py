@@ -0,0 +1,73 @@
+import re
+import zlib
+
+import numpy as np
+
+
+# Splits snake_case, camelCase and ACRONYMS into separate words
+_WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+STOP_WORDS = frozenset(
+    {
+        "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "give", "how", "i", "in", "is", "it",
+        "list", "many", "me", "much", "of", "on", "or", "per", "show", "the", "their", "to", "what", "which",
+        "with",
+    }
+)  # fmt: skip
+
+DEFAULT_DIMENSION = 512
+
+
+def _stem(word: str) -> str:
+    """Strip the most common English plural endings."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str, drop_stop_words: bool = True) -> list[str]:
+    """Split text and identifiers into lowercase, lightly stemmed words.
+
+    Args:
+        text: Free text, table names or column names
+        drop_stop_words: Whether to remove filler words such as "the" or "show"
+
+    Returns:
+        The list of normalized tokens in order of appearance
+
+    """
+    tokens = [_stem(word.lower()) for word in _WORD_PATTERN.findall(text or "")]
+    if drop_stop_words:
+        tokens = [token for token in tokens if token not in STOP_WORDS]
+    return tokens
+
+
+def embed_text(text: str, dimension: int = DEFAULT_DIMENSION) -> np.ndarray:
+    """Embed text locally as an L2-normalized bag of hashed words and character trigrams.
+
+    Hashing uses CRC32 so vectors are stable across processes and can be stored.
+
+    Args:
+        text: The text to embed
+        dimension: Size of the embedding vector
+
+    Returns:
+        A float32 vector of unit length, or all zeros for empty text
+
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for token in tokenize(text):
+        vector[zlib.crc32(token.encode()) % dimension] += 2.0
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i : i + 3].encode()) % dimension] += 1.0
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Cosine similarity of two unit-length embeddings."""
+    return float(np.dot(a, b))
@@ -0,0 +1,219 @@
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+
+# calamine (Rust) parses workbooks many times faster than openpyxl
+try:
+    import python_calamine  # noqa: F401
+
+    HAVE_CALAMINE = True
+except ImportError:
+    HAVE_CALAMINE = False
+
+EXCEL_ENGINE = "calamine" if HAVE_CALAMINE else None
+
+_MANIFEST = "manifest.json"
+
+
+def _write_parquet(df: pd.DataFrame, path: str) -> bool:
+    """Write a parsed sheet to Parquet, atomically.
+
+    Parquet needs string column names and one type per column, so numeric
+    headers become strings. A sheet with a column mixing numbers and text is
+    not written, since Parquet could only keep it by changing its values.
+
+    Returns:
+        Whether the sheet was written
+
+    """
+    df.columns = [str(column) for column in df.columns]
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(partial)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        with contextlib.suppress(OSError):
+            os.remove(partial)
+        return False
+    os.replace(partial, path)
+    return True
+
+
+def _convert_sheet(path: str, sheet_name: str, engine: str | None, destination: str) -> bool:
+    """Parse one sheet of a workbook into a Parquet file (runs in a worker process)."""
+    return _write_parquet(pd.read_excel(path, sheet_name=sheet_name, engine=engine), destination)
+
+
+class ExcelCache:
+    """Excel workbooks converted once to one Parquet file per sheet, keyed by file content.
+
+    The first load of a workbook parses every sheet, in parallel worker
+    processes for multi-sheet workbooks; every later load of any sheet of
+    the same content (another path, another session) reads Parquet. Sheets
+    Parquet cannot store unchanged (a column mixing numbers and text) are
+    left out and read from the workbook.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_workers: int | None = None,
+        disk_budget: int = 4 * 1024 * 1024 * 1024,
+        engine: str | None = EXCEL_ENGINE,
+    ):
+        """Initialize the cache.
+
+        Args:
+            directory: Where converted workbooks are stored, one subdirectory per content digest
+            max_workers: Processes parsing sheets at once; defaults to the CPU count
+            disk_budget: Bytes of converted workbooks kept, least recently used first out
+            engine: pandas Excel engine; None lets pandas choose
+
+        """
+        self.directory = directory
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.disk_budget = disk_budget
+        self.engine = engine
+        self._manifests: dict[str, dict[str, str | None]] = {}
+        # Content digests of already-seen files, so repeated loads of one upload skip hashing
+        self._digests: dict[tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def sheet_path(self, path: str, sheet_name: str | None = None) -> str | None:
+        """Return the Parquet file holding one sheet of a workbook, converting the workbook if needed.
+
+        Args:
+            path: Path of the workbook
+            sheet_name: Name of the sheet; the first sheet by default
+
+        Returns:
+            Path of the sheet's Parquet file, or None if the sheet must be read from the workbook
+
+        Raises:
+            ValueError: If the workbook has no sheet of that name
+
+        """
+        sheets = self.convert(path)
+        if sheet_name is None:
+            sheet_name = next(iter(sheets))
+        if sheet_name not in sheets:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        return sheets[sheet_name]
+
+    def convert(self, path: str) -> dict[str, str | None]:
+        """Convert every sheet of a workbook to Parquet unless its content was converted before.
+
+        Args:
+            path: Path of the workbook
+
+        Returns:
+            Parquet file path per sheet name, in workbook order; None for sheets left out
+
+        """
+        digest = self._digest(path)
+        target = os.path.join(self.directory, digest)
+        with self._lock:
+            manifest = self._manifests.get(digest)
+        if manifest is None:
+            manifest = self._read_manifest(target)
+        if manifest is None:
+            manifest = self._convert(path, target)
+            self._trim_directory(keep=target)
+        else:
+            # Mark as recently used for the directory's LRU
+            os.utime(target)
+        with self._lock:
+            self._manifests[digest] = manifest
+        return {name: os.path.join(target, file_name) if file_name else None for name, file_name in manifest.items()}
+
+    def _digest(self, path: str) -> str:
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(file_id)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            with self._lock:
+                self._digests[file_id] = digest
+        return digest
+
+    @staticmethod
+    def _read_manifest(target: str) -> dict[str, str | None] | None:
+        try:
+            with open(os.path.join(target, _MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _convert(self, path: str, target: str) -> dict[str, str | None]:
+        with pd.ExcelFile(path, engine=self.engine) as workbook:
+            sheet_names = workbook.sheet_names
+        manifest = {name: f"{index}.parquet" for index, name in enumerate(sheet_names)}
+        os.makedirs(target, exist_ok=True)
+        jobs = [(path, name, self.engine, os.path.join(target, manifest[name])) for name in sheet_names]
+
+        workers = min(self.max_workers, len(jobs))
+        if workers > 1:
+            # Spawned workers avoid forking a process that runs threads (Gradio, the async tools)
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                written = [future.result() for future in [pool.submit(_convert_sheet, *job) for job in jobs]]
+        else:
+            written = [_convert_sheet(*job) for job in jobs]
+        manifest = {
+            name: file_name if ok else None for (name, file_name), ok in zip(manifest.items(), written, strict=True)
+        }
+
+        # The manifest is written last, so a workbook counts as converted only once every sheet is
+        partial = os.path.join(target, f"{_MANIFEST}.{os.getpid()}.tmp")
+        with open(partial, "w") as f:
+            json.dump(manifest, f)
+        os.replace(partial, os.path.join(target, _MANIFEST))
+        return manifest
+
+    def _trim_directory(self, keep: str) -> None:
+        workbooks = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path) and path != keep:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                workbooks.append((os.stat(path).st_mtime, size, path))
+        total = sum(size for _, size, _ in workbooks)
+        total += sum(entry.stat().st_size for entry in os.scandir(keep))
+        for _, size, path in sorted(workbooks):
+            if total <= self.disk_budget:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self._manifests.pop(os.path.basename(path), None)
+            total -= size
+
+
+_excel_cache = None
+
+
+def get_excel_cache() -> ExcelCache:
+    """Get or create the shared Excel conversion cache.
+
+    ``EXCEL_CACHE_DIR`` sets the directory (a directory under the system temp
+    dir by default) and ``EXCEL_CACHE_WORKERS`` the processes parsing sheets.
+    """
+    global _excel_cache
+    if _excel_cache is None:
+        workers = os.environ.get("EXCEL_CACHE_WORKERS")
+        _excel_cache = ExcelCache(
+            directory=os.environ.get("EXCEL_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "excel_cache"),
+            max_workers=int(workers) if workers else None,
+        )
+    return _excel_cache
@@ -0,0 +1,162 @@
+import os
+import tempfile
+
+from typing import Any
+
+import duckdb
+
+from langchain_core.language_models import BaseChatModel
+
+from app.tools.result_fetch import FetchedResult, fetch_arrow_batches
+from app.tools.schema_catalog import ColumnInfo, SchemaSnapshot, TableInfo
+from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+# DuckDB table functions that scan each format in place
+_FILE_READERS = {
+    ".csv": "read_csv_auto",
+    ".tsv": "read_csv_auto",
+    ".parquet": "read_parquet",
+    ".pq": "read_parquet",
+    ".jsonl": "read_json_auto",
+    ".ndjson": "read_json_auto",
+}
+
+OUT_OF_CORE_FORMAT_MESSAGE = "Out-of-core mode supports .csv, .tsv, .parquet and .jsonl files"
+
+
+def supports_out_of_core(path: str) -> bool:
+    """Return whether DuckDB can query a file in place, judging by its extension."""
+    return os.path.splitext(path)[1].lower() in _FILE_READERS
+
+
+def connect_file(
+    path: str,
+    table_name: str = "data",
+    memory_limit: str | None = None,
+    temp_directory: str | None = None,
+) -> duckdb.DuckDBPyConnection:
+    """Open an in-memory DuckDB database with a view over a data file.
+
+    Queries on the view stream the file; operators that outgrow
+    ``memory_limit`` spill to ``temp_directory``, so files larger than
+    memory can be aggregated.
+
+    Args:
+        path: Path of a CSV, TSV, Parquet or JSON Lines file
+        table_name: Name of the view
+        memory_limit: DuckDB memory limit (e.g. "2GB"); DuckDB's default when None
+        temp_directory: Where DuckDB spills; a directory under the system temp dir by default
+
+    Returns:
+        The DuckDB connection
+
+    Raises:
+        ValueError: If DuckDB cannot query the file format in place
+
+    """
+    reader = _FILE_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(OUT_OF_CORE_FORMAT_MESSAGE)
+
+    config = {"temp_directory": temp_directory or os.path.join(tempfile.gettempdir(), "duckdb_spill")}
+    if memory_limit:
+        config["memory_limit"] = memory_limit
+    connection = duckdb.connect(config=config)
+    literal = os.path.abspath(path).replace("'", "''")
+    identifier = table_name.replace('"', '""')
+    connection.execute(f"CREATE VIEW \"{identifier}\" AS SELECT * FROM {reader}('{literal}')")
+    return connection
+
+
+def describe_table(connection: duckdb.DuckDBPyConnection, table_name: str) -> SchemaSnapshot:
+    """Build the schema snapshot of one DuckDB table or view."""
+    rows = connection.execute(
+        "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = ? ORDER BY column_index",
+        [table_name],
+    ).fetchall()
+    columns = [ColumnInfo(name=name, type=data_type) for name, data_type in rows]
+    return SchemaSnapshot(tables={table_name: TableInfo(name=table_name, columns=columns)})
+
+
+class FileSQLAnalysisAgent(SQLDataAnalysisAgent):
+    """Analyze a data file larger than memory by querying it in place with DuckDB.
+
+    The file is registered as a DuckDB view and the LLM writes SQL that
+    aggregates it down to the rows the answer or chart needs. Only that
+    result is loaded into pandas and given to the visualization code.
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        data_path: str,
+        table_name: str = "data",
+        max_result_rows: int | None = 100_000,
+        memory_limit: str | None = None,
+        temp_directory: str | None = None,
+        **kwargs: Any,
+    ):
+        """Initialize the agent and register the file.
+
+        Args:
+            model: The chat model
+            data_path: Path of a CSV, TSV, Parquet or JSON Lines file
+            table_name: Name of the view the generated SQL queries
+            max_result_rows: Rows of a query result loaded into pandas; larger results are truncated
+            memory_limit: DuckDB memory limit (e.g. "2GB"); ``DUCKDB_MEMORY_LIMIT`` by default
+            temp_directory: Where DuckDB spills; ``DUCKDB_TEMP_DIR`` by default
+            **kwargs: Further ``SQLDataAnalysisAgent`` options
+
+        """
+        connection = connect_file(
+            data_path,
+            table_name,
+            memory_limit=memory_limit or os.environ.get("DUCKDB_MEMORY_LIMIT"),
+            temp_directory=temp_directory or os.environ.get("DUCKDB_TEMP_DIR"),
+        )
+        # Results are keyed by SQLAlchemy engine in the shared result cache, which this connection has none of
+        kwargs["cache_results"] = False
+        super().__init__(model, connection=connection, max_result_rows=max_result_rows, **kwargs)
+        self.data_path = data_path
+        self.table_name = table_name
+        self._snapshot = describe_table(connection, table_name)
+
+    def close(self) -> None:
+        """Close the DuckDB connection."""
+        self.connection.close()
+
+    def _fetch(self, sql_query: str) -> FetchedResult:
+        """Run a SQL query on its own cursor and fetch its result as Arrow batches within the caps."""
+        # A cursor per query lets the executor's threads take turns on one database
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql_query)
+            return fetch_arrow_batches(
+                cursor.fetch_record_batch(self.fetch_batch_rows),
+                max_rows=self.max_result_rows,
+                max_bytes=self.max_result_bytes,
+                dtype_backend=self.result_dtype_backend,
+            )
+        finally:
+            cursor.close()
+
+    def _rollback(self) -> None:
+        """Do nothing: each query runs on its own cursor, so a failed one leaves nothing open."""
+
+    def _schema_snapshot(self) -> SchemaSnapshot:
+        """Return the schema of the file's view."""
+        return self._snapshot
+
+    def _executor_key(self) -> str:
+        """Return the file's path, so queries on one file share a concurrency limit."""
+        return f"duckdb:{os.path.abspath(self.data_path)}"
+
+    def _query_guidance(self) -> str:
+        """Ask for DuckDB SQL that aggregates the file down to the rows the answer needs."""
+        limit = f", at most {self.max_result_rows} rows" if self.max_result_rows else ""
+        return f"""
+        "{self.table_name}" is a DuckDB view over the file {os.path.basename(self.data_path)}, which is too large
+        to load into memory. Write DuckDB SQL that aggregates in the query (GROUP BY, date_trunc, top-N with
+        ORDER BY ... LIMIT) so the result holds only the rows needed for the answer or chart{limit}.
+        """
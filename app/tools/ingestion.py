@@ -0,0 +1,182 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as pa_feather
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+
+from app.tools.excel_cache import EXCEL_ENGINE, get_excel_cache
+
+
+CSV_EXTENSIONS = (".csv", ".tsv")
+EXCEL_EXTENSIONS = (".xls", ".xlsx")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+FEATHER_EXTENSIONS = (".feather", ".arrow", ".ipc")
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+SUPPORTED_EXTENSIONS = CSV_EXTENSIONS + EXCEL_EXTENSIONS + PARQUET_EXTENSIONS + FEATHER_EXTENSIONS + JSONL_EXTENSIONS
+
+UNSUPPORTED_FORMAT_MESSAGE = "Unsupported file format. Please use .csv, .tsv, .xls, .xlsx, .parquet, .feather or .jsonl"
+
+# Bytes read up front to infer CSV column types for the whole file
+DEFAULT_SAMPLE_BYTES = 4 * 1024 * 1024
+# Bytes each parsing thread converts at a time
+DEFAULT_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def is_supported(path: str) -> bool:
+    """Return whether ``read_dataset`` can read a file, judging by its extension."""
+    return path.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def _to_pandas(table: pa.Table, dtype_backend: str | None) -> pd.DataFrame:
+    """Convert an Arrow table to pandas, keeping Arrow-backed columns for ``dtype_backend="pyarrow"``."""
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    # Release each Arrow column as soon as it is converted to halve peak memory
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+class _PandasOnlyError(Exception):
+    """Raised for CSV files the pyarrow path would read differently than ``pd.read_csv``."""
+
+
+def _check_column_names(names: list[str]) -> None:
+    """Reject header names pandas would rename: blank names become "Unnamed: i" and duplicates "a.1"."""
+    if not all(names) or len(set(names)) != len(names):
+        raise _PandasOnlyError("blank or duplicate column names")
+
+
+def _has_integer_overflow(column: pa.ChunkedArray) -> bool:
+    """Whether a column parsed as floats holds whole numbers outside the int64 range."""
+    values = column.to_numpy(zero_copy_only=False)
+    return bool(np.any((np.abs(values) >= 2.0**63) & (values == np.floor(values))))
+
+
+def _sample_column_types(path: str, delimiter: str, sample_bytes: int) -> dict[str, pa.DataType] | None:
+    """Infer CSV column types from the first ``sample_bytes`` of the file.
+
+    Dates and timestamps stay strings and all-empty columns become floats,
+    matching what ``pd.read_csv`` produces. Returns None when the sample
+    cannot be parsed on its own (e.g. a quoted field spans the cut) or has no
+    rows to infer from.
+
+    Raises:
+        _PandasOnlyError: If pandas would read the sample differently than the fast path can
+
+    """
+    with open(path, "rb") as f:
+        head = f.read(sample_bytes)
+        complete = len(head) < sample_bytes
+    if not complete:
+        head = head[: head.rfind(b"\n") + 1]
+    try:
+        sample = pa_csv.read_csv(
+            io.BytesIO(head),
+            read_options=pa_csv.ReadOptions(use_threads=False),
+            parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True),
+        )
+    except pa.ArrowInvalid:
+        return None
+
+    _check_column_names(sample.column_names)
+    if not sample.num_rows:
+        return None
+
+    column_types = {}
+    for field, column in zip(sample.schema, sample.columns, strict=True):
+        kind = field.type
+        if pa.types.is_null(kind):
+            kind = pa.float64()
+        elif pa.types.is_temporal(kind):
+            kind = pa.string()
+        elif pa.types.is_floating(kind) and _has_integer_overflow(column):
+            # pandas keeps integers past the int64 range exact, as uint64 or strings
+            raise _PandasOnlyError(field.name)
+        column_types[field.name] = kind
+    return column_types
+
+
+def read_csv(
+    path: str,
+    dtype_backend: str | None = None,
+    sample_bytes: int = DEFAULT_SAMPLE_BYTES,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> pd.DataFrame:
+    """Read a CSV (or TSV) file with the multithreaded pyarrow parser, with the result ``pd.read_csv`` gives.
+
+    Column types are inferred once from a sample and enforced for the whole
+    file. Files the fast path cannot type consistently (e.g. an integer
+    column that turns fractional past the sample), headers pandas renames
+    (blank or duplicate names) and integers past the int64 range are read
+    with pandas.
+
+    Args:
+        path: Path of the file
+        dtype_backend: "pyarrow" for Arrow-backed columns; NumPy dtypes otherwise
+        sample_bytes: Bytes read to infer column types
+        block_bytes: Bytes parsed per block and thread
+
+    Returns:
+        The DataFrame
+
+    """
+    delimiter = "\t" if path.lower().endswith(".tsv") else ","
+    options = {"dtype_backend": dtype_backend} if dtype_backend else {}
+    try:
+        column_types = _sample_column_types(path, delimiter, sample_bytes)
+        with pa.memory_map(path) as source:
+            table = pa_csv.read_csv(
+                source,
+                read_options=pa_csv.ReadOptions(use_threads=True, block_size=block_bytes),
+                parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+                convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+            )
+        _check_column_names(table.column_names)
+    except (pa.ArrowInvalid, _PandasOnlyError):
+        return pd.read_csv(path, sep=delimiter, **options)
+    return _to_pandas(table, dtype_backend)
+
+
+def read_dataset(path: str, sheet_name: str | None = None, dtype_backend: str | None = None) -> pd.DataFrame:
+    """Read a data file into a DataFrame, choosing the reader by extension.
+
+    CSV and TSV use the multithreaded pyarrow parser; Parquet, Feather/Arrow
+    IPC and JSON Lines are read through memory-mapped files. Excel workbooks
+    are converted to Parquet once per content, and sheets read from there
+    unless a column mixes numbers and text.
+
+    Args:
+        path: Path of the file
+        sheet_name: Sheet to read from an Excel workbook (the first by default)
+        dtype_backend: "pyarrow" for Arrow-backed columns; NumPy dtypes otherwise
+
+    Returns:
+        The DataFrame
+
+    Raises:
+        ValueError: If the file format is not supported
+
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return read_csv(path, dtype_backend=dtype_backend)
+    if extension in PARQUET_EXTENSIONS:
+        return _to_pandas(pq.read_table(path, memory_map=True), dtype_backend)
+    if extension in FEATHER_EXTENSIONS:
+        return _to_pandas(pa_feather.read_table(path, memory_map=True), dtype_backend)
+    if extension in JSONL_EXTENSIONS:
+        with pa.memory_map(path) as source:
+            return _to_pandas(pa_json.read_json(source), dtype_backend)
+    if extension in EXCEL_EXTENSIONS:
+        sheet_path = get_excel_cache().sheet_path(path, sheet_name)
+        if sheet_path is None:
+            # A column mixes numbers and text, which only the workbook keeps as they are
+            options = {"dtype_backend": dtype_backend} if dtype_backend else {}
+            return pd.read_excel(path, sheet_name=sheet_name or 0, engine=EXCEL_ENGINE, **options)
+        return _to_pandas(pq.read_table(sheet_path, memory_map=True), dtype_backend)
+    raise ValueError(UNSUPPORTED_FORMAT_MESSAGE)
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from typing import Any
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+"""
+
+
+def _normalize_input(prompt: Any) -> Any:
+    """Turn a prompt (string, message or message list) into JSON-serializable data."""
+    if isinstance(prompt, BaseMessage):
+        return message_to_dict(prompt)
+    if isinstance(prompt, list | tuple):
+        return [_normalize_input(item) for item in prompt]
+    if hasattr(prompt, "to_messages"):
+        return _normalize_input(prompt.to_messages())
+    return prompt
+
+
+def _model_identity(model: Any) -> dict[str, Any]:
+    """Describe the model and its generation parameters for the cache key."""
+    try:
+        params = dict(model._identifying_params)
+    except (AttributeError, TypeError, ValueError):
+        params = {}
+    return {"type": type(model).__name__, "params": params}
+
+
+def response_cache_key(model: Any, prompt: Any, **kwargs: Any) -> str:
+    """Hash the exact prompt, model and call parameters into a cache key.
+
+    Args:
+        model: The chat model that would answer the prompt
+        prompt: A string, message or list of messages
+        **kwargs: Extra arguments passed to ``invoke``
+
+    Returns:
+        A hex sha256 digest
+
+    """
+    payload = {"model": _model_identity(model), "input": _normalize_input(prompt), "kwargs": kwargs}
+    encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseCache:
+    """On-disk store of chat model responses with TTL and size-based LRU eviction."""
+
+    def __init__(self, path: str, ttl: float | None = 7 * 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        """Open (or create) the cache database.
+
+        Args:
+            path: SQLite file to store responses in
+            ttl: Seconds a response stays valid; None keeps responses until evicted
+            max_bytes: Total size of stored responses above which the least recently used are evicted
+
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def get(self, key: str) -> str | None:
+        """Return the stored value for a key, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value, evicting the least recently used entries when over the size budget."""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+
+class CachedChatModel:
+    """Wrap a chat model so identical calls are answered from a response cache.
+
+    Only ``invoke`` and ``ainvoke`` are cached; every other attribute is taken
+    from the wrapped model. Hit and miss counts are kept for reporting.
+    """
+
+    def __init__(self, model: Any, cache: SQLiteResponseCache):
+        self.model = model
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counts so far."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def invoke(self, prompt: Any, config: Any = None, **kwargs: Any) -> BaseMessage:
+        """Return the cached response for this exact call, or call the model and store its response."""
+        key = response_cache_key(self.model, prompt, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = self.model.invoke(prompt, config, **kwargs)
+        self._store(key, response)
+        return response
+
+    async def ainvoke(self, prompt: Any, config: Any = None, **kwargs: Any) -> BaseMessage:
+        """Async counterpart of ``invoke``."""
+        key = response_cache_key(self.model, prompt, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = await self.model.ainvoke(prompt, config, **kwargs)
+        self._store(key, response)
+        return response
+
+    def _lookup(self, key: str) -> BaseMessage | None:
+        value = self.cache.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return messages_from_dict([json.loads(value)])[0]
+
+    def _store(self, key: str, response: Any) -> None:
+        if isinstance(response, BaseMessage):
+            self.cache.put(key, json.dumps(message_to_dict(response)))
+
+
+def cache_stats(model: Any) -> dict[str, int] | None:
+    """Return the hit and miss counts of a cached model, or None for an uncached one."""
+    return model.stats() if isinstance(model, CachedChatModel) else None
+
+
+def cache_stats_since(model: Any, start: dict[str, int] | None) -> dict[str, int] | None:
+    """Return the hits and misses of a cached model since an earlier ``cache_stats`` snapshot."""
+    if start is None or not isinstance(model, CachedChatModel):
+        return None
+    now = model.stats()
+    return {name: now[name] - start[name] for name in now}
+
+
+_response_cache = None
+
+
+def get_response_cache() -> SQLiteResponseCache | None:
+    """Get the shared response cache configured by ``LLM_CACHE_PATH``, if any.
+
+    ``LLM_CACHE_TTL`` (seconds) and ``LLM_CACHE_MAX_BYTES`` tune expiry and size.
+    """
+    global _response_cache
+    path = os.environ.get("LLM_CACHE_PATH")
+    if not path:
+        return None
+    if _response_cache is None or _response_cache.path != path:
+        ttl = os.environ.get("LLM_CACHE_TTL")
+        _response_cache = SQLiteResponseCache(
+            path,
+            ttl=float(ttl) if ttl else 7 * 24 * 3600,
+            max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        )
+    return _response_cache
+
+
+def with_response_cache(model: Any, cache: SQLiteResponseCache | None = None) -> Any:
+    """Wrap a chat model with the given (or shared) response cache.
+
+    Args:
+        model: The chat model to wrap
+        cache: Cache to use instead of the one configured by ``LLM_CACHE_PATH``
+
+    Returns:
+        A CachedChatModel, or the model unchanged when no cache is configured
+
+    """
+    if isinstance(model, CachedChatModel):
+        return model
+    if cache is None:
+        cache = get_response_cache()
+    if cache is None:
+        return model
+    return CachedChatModel(model, cache)
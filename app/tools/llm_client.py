@@ -0,0 +1,406 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from collections.abc import AsyncIterator, Iterator
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from typing import Any
+
+import openai
+
+from langchain_openai import ChatOpenAI
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.providers.openai import OpenAIProvider
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import Usage
+
+
+# Errors worth retrying: rate limits, overloaded or unreachable servers
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Tokens reserved for a response before its actual usage is known
+_DEFAULT_COMPLETION_TOKENS = 1000
+
+
+def estimate_tokens(prompt: Any) -> int:
+    """Roughly estimate the tokens of a prompt (about four characters per token)."""
+    if isinstance(prompt, list | tuple):
+        return sum(estimate_tokens(item) for item in prompt)
+    content = getattr(prompt, "content", prompt)
+    return max(1, len(str(content)) // 4)
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by all callers.
+
+    Callers reserve capacity up front and wait until it is available, in
+    arrival order; the buckets may go into debt so waits are computed once
+    instead of polled. Works for threads and coroutines alike.
+    """
+
+    def __init__(self, requests_per_minute: float | None = None, tokens_per_minute: float | None = None):
+        """Initialize the buckets, full.
+
+        Args:
+            requests_per_minute: Requests allowed per minute, or None for no limit
+            tokens_per_minute: Prompt and completion tokens allowed per minute, or None for no limit
+
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._updated = time.monotonic()
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._waiting = 0
+        self._in_flight = 0
+        self._counters = {"requests": 0, "retries": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """Take one request and ``tokens`` tokens from the buckets.
+
+        Args:
+            tokens: Estimated tokens of the call
+
+        Returns:
+            Seconds to wait before the call may start
+
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            delay = 0.0
+            if self.requests_per_minute:
+                self._requests -= 1
+                delay = max(delay, -self._requests * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                # A call larger than the whole bucket waits for a full bucket rather than forever
+                self._tokens -= min(tokens, self.tokens_per_minute)
+                delay = max(delay, -self._tokens * 60 / self.tokens_per_minute)
+            self._counters["requests"] += 1
+            self._counters["wait_seconds"] += delay
+            return delay
+
+    def adjust(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once a call's actual usage is known."""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + estimated - actual)
+
+    def record(self, name: str) -> None:
+        """Increment one of the cumulative counters."""
+        with self._lock:
+            self._counters[name] += 1
+
+    @contextmanager
+    def waiting(self) -> Iterator[None]:
+        """Count the caller in the queue depth while it waits for capacity or a retry."""
+        with self._lock:
+            self._waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    @contextmanager
+    def in_flight(self) -> Iterator[None]:
+        """Count the caller as in flight while its call runs."""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def metrics(self) -> dict[str, float]:
+        """Return the queue depth, calls in flight and cumulative counters."""
+        with self._lock:
+            return {"queue_depth": self._waiting, "in_flight": self._in_flight, **self._counters}
+
+
+class RateLimitedChatModel:
+    """Wrap a chat model so its calls respect a shared rate limiter and are retried with backoff.
+
+    Only ``invoke`` and ``ainvoke`` are limited; every other attribute is taken
+    from the wrapped model. Retries use full-jitter exponential backoff and
+    honour the server's ``Retry-After`` header.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        limiter: RateLimiter,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        completion_tokens: int = _DEFAULT_COMPLETION_TOKENS,
+    ):
+        self.model = model
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    def invoke(self, prompt: Any, config: Any = None, **kwargs: Any) -> Any:
+        """Call the model once the rate limit allows, retrying transient failures."""
+        estimated = estimate_tokens(prompt) + self.completion_tokens
+        attempt = 0
+        while True:
+            with self.limiter.waiting():
+                time.sleep(self.limiter.reserve(estimated))
+            try:
+                with self.limiter.in_flight():
+                    response = self.model.invoke(prompt, config, **kwargs)
+            except _RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                with self.limiter.waiting():
+                    time.sleep(self._backoff(e, attempt))
+                attempt += 1
+                continue
+            self.limiter.adjust(estimated, self._usage(response, estimated))
+            return response
+
+    async def ainvoke(self, prompt: Any, config: Any = None, **kwargs: Any) -> Any:
+        """Async counterpart of ``invoke``."""
+        estimated = estimate_tokens(prompt) + self.completion_tokens
+        attempt = 0
+        while True:
+            with self.limiter.waiting():
+                await asyncio.sleep(self.limiter.reserve(estimated))
+            try:
+                with self.limiter.in_flight():
+                    response = await self.model.ainvoke(prompt, config, **kwargs)
+            except _RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                with self.limiter.waiting():
+                    await asyncio.sleep(self._backoff(e, attempt))
+                attempt += 1
+                continue
+            self.limiter.adjust(estimated, self._usage(response, estimated))
+            return response
+
+    def _backoff(self, error: Exception, attempt: int) -> float:
+        """Seconds to wait before retrying: the server's Retry-After, else full-jitter exponential backoff."""
+        return _backoff(self.limiter, error, attempt, self.base_delay, self.max_delay)
+
+    @staticmethod
+    def _usage(response: Any, default: int) -> int:
+        usage = getattr(response, "usage_metadata", None) or {}
+        return usage.get("total_tokens") or default
+
+
+class RateLimitedModel(WrapperModel):
+    """Wrap a pydantic-ai model so its requests share the rate limiter and backoff of ``RateLimitedChatModel``.
+
+    A request (or the start of a streamed one) waits for capacity and is
+    retried on rate limits and transient server errors; a stream is not
+    retried once it has started.
+    """
+
+    def __init__(
+        self,
+        wrapped: Model,
+        limiter: RateLimiter,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        completion_tokens: int = _DEFAULT_COMPLETION_TOKENS,
+    ):
+        super().__init__(wrapped)
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[ModelResponse, Usage]:
+        """Send a request once the rate limit allows, retrying transient failures."""
+        estimated = estimate_tokens([str(message) for message in messages]) + self.completion_tokens
+        attempt = 0
+        while True:
+            with self.limiter.waiting():
+                await asyncio.sleep(self.limiter.reserve(estimated))
+            try:
+                with self.limiter.in_flight():
+                    response, usage = await self.wrapped.request(messages, model_settings, model_request_parameters)
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                with self.limiter.waiting():
+                    await asyncio.sleep(_backoff(self.limiter, e, attempt, self.base_delay, self.max_delay))
+                attempt += 1
+                continue
+            self.limiter.adjust(estimated, usage.total_tokens or estimated)
+            return response, usage
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        """Start a streamed request once the rate limit allows, retrying failures to start it."""
+        estimated = estimate_tokens([str(message) for message in messages]) + self.completion_tokens
+        attempt = 0
+        while True:
+            with self.limiter.waiting():
+                await asyncio.sleep(self.limiter.reserve(estimated))
+            stack = AsyncExitStack()
+            try:
+                response = await stack.enter_async_context(
+                    self.wrapped.request_stream(messages, model_settings, model_request_parameters)
+                )
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                with self.limiter.waiting():
+                    await asyncio.sleep(_backoff(self.limiter, e, attempt, self.base_delay, self.max_delay))
+                attempt += 1
+                continue
+            break
+
+        async with stack:
+            with self.limiter.in_flight():
+                yield response
+        self.limiter.adjust(estimated, response.usage().total_tokens or estimated)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether an error is a rate limit or transient failure, as raised by OpenAI or wrapped by pydantic-ai."""
+    if isinstance(error, ModelHTTPError):
+        return isinstance(error.__cause__, _RETRYABLE_ERRORS)
+    return isinstance(error, _RETRYABLE_ERRORS)
+
+
+def _backoff(limiter: RateLimiter, error: Exception, attempt: int, base_delay: float, max_delay: float) -> float:
+    """Seconds to wait before retrying: the server's Retry-After, else full-jitter exponential backoff."""
+    limiter.record("retries")
+    cause = error.__cause__ if isinstance(error, ModelHTTPError) else error
+    if isinstance(cause, openai.RateLimitError):
+        limiter.record("rate_limited")
+        retry_after = _retry_after(cause)
+        if retry_after is not None:
+            return min(retry_after, max_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Read the Retry-After header of a rate-limit response, in seconds."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+_limiter = None
+_chat_models: dict[str, RateLimitedChatModel] = {}
+_agent_models: dict[str, RateLimitedModel] = {}
+_chat_models_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create the shared rate limiter.
+
+    ``LLM_REQUESTS_PER_MINUTE`` and ``LLM_TOKENS_PER_MINUTE`` set the limits; unset means unlimited.
+    """
+    global _limiter
+    if _limiter is None:
+        requests_per_minute = os.environ.get("LLM_REQUESTS_PER_MINUTE")
+        tokens_per_minute = os.environ.get("LLM_TOKENS_PER_MINUTE")
+        _limiter = RateLimiter(
+            requests_per_minute=float(requests_per_minute) if requests_per_minute else None,
+            tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+        )
+    return _limiter
+
+
+def get_chat_model(model_name: str = "gpt-4o") -> RateLimitedChatModel:
+    """Get the shared, rate-limited chat model for a model name.
+
+    One client per model is reused across requests, so its HTTP connections
+    stay alive between calls. Retries are done by the wrapper
+    (``LLM_MAX_RETRIES``, default 5), not by the OpenAI client.
+
+    Args:
+        model_name: The OpenAI model name
+
+    Returns:
+        The shared chat model
+
+    """
+    with _chat_models_lock:
+        model = _chat_models.get(model_name)
+        if model is None:
+            model = _chat_models[model_name] = RateLimitedChatModel(
+                ChatOpenAI(model_name=model_name, max_retries=0),
+                get_rate_limiter(),
+                max_retries=int(os.environ.get("LLM_MAX_RETRIES", "5")),
+            )
+        return model
+
+
+def get_agent_model(model_name: str = "gpt-4o") -> RateLimitedModel:
+    """Get the shared, rate-limited pydantic-ai model for a model name.
+
+    Requests share the limiter of ``get_chat_model`` and are retried by the
+    wrapper (``LLM_MAX_RETRIES``, default 5), not by the OpenAI client.
+
+    Args:
+        model_name: The OpenAI model name
+
+    Returns:
+        The shared pydantic-ai model
+
+    """
+    with _chat_models_lock:
+        model = _agent_models.get(model_name)
+        if model is None:
+            provider = OpenAIProvider(openai_client=openai.AsyncOpenAI(max_retries=0))
+            model = _agent_models[model_name] = RateLimitedModel(
+                OpenAIModel(model_name, provider=provider),
+                get_rate_limiter(),
+                max_retries=int(os.environ.get("LLM_MAX_RETRIES", "5")),
+            )
+        return model
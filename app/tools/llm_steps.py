@@ -0,0 +1,64 @@
+import asyncio
+
+from collections.abc import Awaitable, Callable, Generator
+from typing import Any
+
+
+# An agent pipeline written once for both sync and async callers: it yields the
+# input of each LLM call, receives the model's response, and returns its result
+type LLMSteps[T] = Generator[Any, Any, T]
+
+
+def run_llm_steps[T](model: Any, steps: LLMSteps[T]) -> T:
+    """Drive a pipeline synchronously, answering each LLM request with ``model.invoke``.
+
+    Args:
+        model: The chat model
+        steps: The pipeline generator
+
+    Returns:
+        The pipeline's return value
+
+    """
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(model.invoke(request))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_llm_steps[T](
+    model: Any,
+    steps: LLMSteps[T],
+    run_blocking: Callable[[Callable[[], Any]], Awaitable[Any]] | None = None,
+) -> T:
+    """Drive a pipeline asynchronously, awaiting each LLM request with ``model.ainvoke``.
+
+    The pipeline's own work between LLM calls (profiling, SQL, executing
+    generated code) is blocking, so it runs off the event loop through
+    ``run_blocking``; many sessions can then wait on the LLM concurrently.
+
+    Args:
+        model: The chat model
+        steps: The pipeline generator
+        run_blocking: Runs a blocking callable and awaits its result; defaults to ``asyncio.to_thread``
+
+    Returns:
+        The pipeline's return value
+
+    """
+    run_blocking = run_blocking or asyncio.to_thread
+
+    def advance(response: Any, first: bool) -> tuple[bool, Any]:
+        # StopIteration cannot cross a future, so the outcome is returned as (done, value)
+        try:
+            return False, next(steps) if first else steps.send(response)
+        except StopIteration as stop:
+            return True, stop.value
+
+    done, value = await run_blocking(lambda: advance(None, True))
+    while not done:
+        response = await model.ainvoke(value)
+        done, value = await run_blocking(lambda response=response: advance(response, False))
+    return value
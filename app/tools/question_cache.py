@@ -0,0 +1,234 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.tools.embeddings import embed_text
+
+
+# Phrasings of the same intent that a bag-of-words embedding would otherwise keep apart
+_PHRASE_SYNONYMS = [
+    (re.compile(r"\bhow many\b"), "count"),
+    (re.compile(r"\bnumber of\b"), "count"),
+    (re.compile(r"\b(best|highest|most|largest|biggest|leading)\b"), "top"),
+    (re.compile(r"\b(worst|lowest|least|smallest|fewest)\b"), "bottom"),
+    (re.compile(r"\b(selling|sold|sells|sell)\b"), "sales"),
+    (re.compile(r"\b(monthly)\b"), "month"),
+    (re.compile(r"\b(yearly|annual|annually)\b"), "year"),
+    (re.compile(r"\b(weekly)\b"), "week"),
+    (re.compile(r"\b(daily)\b"), "day"),
+    (re.compile(r"\b(avg|mean)\b"), "average"),
+]
+
+# Numbers change the meaning of otherwise identical questions ("top 5" vs "top 10")
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+# Negations, exclusions, time bounds, comparisons and sort directions flip a question's meaning
+# while barely moving its embedding ("customers who never placed orders" vs "customers who placed orders")
+_QUALIFIER_PATTERN = re.compile(
+    r"\b(?:not|no|never|none|nor|without|except|excluding|exclude|excludes|only|before|after|since|until"
+    r"|above|below|over|under|more|less|greater|fewer|top|bottom|first|last|earliest|latest|oldest|newest"
+    r"|asc|ascending|desc|descending|increasing|decreasing|min|minimum|max|maximum)\b|n't\b"
+)
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS question_sql (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fingerprint TEXT NOT NULL,
+        question TEXT NOT NULL,
+        numbers TEXT NOT NULL,
+        embedding BLOB NOT NULL,
+        sql TEXT NOT NULL,
+        used_at REAL NOT NULL,
+        UNIQUE (fingerprint, question)
+    )
+"""
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and map common synonyms to one canonical word."""
+    text = question.lower()
+    for pattern, replacement in _PHRASE_SYNONYMS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def question_numbers(question: str) -> str:
+    """Return the numbers in a question as a canonical string."""
+    return ",".join(sorted(_NUMBER_PATTERN.findall(question)))
+
+
+def question_qualifiers(question: str) -> str:
+    """Return the negation, polarity and ordering words of a question as a canonical string."""
+    words = _QUALIFIER_PATTERN.findall(normalize_question(question))
+    return ",".join(sorted("not" if word == "n't" else word for word in words))
+
+
+@dataclass(frozen=True)
+class CachedQuery:
+    """A stored query that matched a new question."""
+
+    id: int
+    question: str
+    sql: str
+    similarity: float
+
+
+@dataclass
+class _Entries:
+    """In-memory mirror of the stored questions for one schema fingerprint."""
+
+    ids: list[int]
+    questions: list[str]
+    numbers: list[str]
+    qualifiers: list[str]
+    sqls: list[str]
+    vectors: np.ndarray
+
+
+class QuestionSQLCache:
+    """Reuse the SQL of earlier successful questions for similar new questions.
+
+    Questions are embedded locally (see ``embed_text``) and only compared with
+    questions asked against a schema with the same fingerprint. A match also
+    requires the same numbers and the same negation, polarity and ordering
+    words (see ``question_qualifiers``) in both questions.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        threshold: float = 0.95,
+        max_entries: int = 5000,
+        embed: Callable[[str], np.ndarray] = embed_text,
+    ):
+        """Open (or create) the question store.
+
+        Args:
+            path: SQLite file to persist entries in, or ":memory:" for this process only
+            threshold: Minimum cosine similarity for a stored question to match
+            max_entries: Entries kept before the least recently used are evicted
+            embed: Local embedding function returning unit-length vectors
+
+        """
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embed = embed
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entries] = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(_SCHEMA)
+
+    def _vector(self, question: str) -> np.ndarray:
+        return np.asarray(self.embed(normalize_question(question)), dtype=np.float32)
+
+    def _load(self, fingerprint: str) -> _Entries:
+        entries = self._entries.get(fingerprint)
+        if entries is None:
+            rows = self._conn.execute(
+                "SELECT id, question, numbers, sql, embedding FROM question_sql WHERE fingerprint = ?", (fingerprint,)
+            ).fetchall()
+            entries = _Entries(
+                ids=[row[0] for row in rows],
+                questions=[row[1] for row in rows],
+                numbers=[row[2] for row in rows],
+                qualifiers=[question_qualifiers(row[1]) for row in rows],
+                sqls=[row[3] for row in rows],
+                vectors=np.array([np.frombuffer(row[4], dtype=np.float32) for row in rows], dtype=np.float32),
+            )
+            self._entries[fingerprint] = entries
+        return entries
+
+    def lookup(self, question: str, fingerprint: str) -> CachedQuery | None:
+        """Find the most similar stored question for the same schema.
+
+        Args:
+            question: The new question
+            fingerprint: Fingerprint of the schema the question is asked against
+
+        Returns:
+            The best match above the similarity threshold, or None
+
+        """
+        vector = self._vector(question)
+        numbers = question_numbers(question)
+        qualifiers = question_qualifiers(question)
+        with self._lock:
+            entries = self._load(fingerprint)
+            if not entries.ids:
+                return None
+
+            similarities = entries.vectors @ vector
+            mismatched = [
+                n != numbers or q != qualifiers for n, q in zip(entries.numbers, entries.qualifiers, strict=True)
+            ]
+            similarities[mismatched] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            self._conn.execute("UPDATE question_sql SET used_at = ? WHERE id = ?", (time.time(), entries.ids[best]))
+            return CachedQuery(
+                id=entries.ids[best],
+                question=entries.questions[best],
+                sql=entries.sqls[best],
+                similarity=float(similarities[best]),
+            )
+
+    def store(self, question: str, fingerprint: str, sql: str) -> None:
+        """Remember the SQL that successfully answered a question."""
+        vector = self._vector(question)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO question_sql (fingerprint, question, numbers, embedding, sql, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, question, question_numbers(question), vector.tobytes(), sql, time.time()),
+            )
+            self._evict()
+            # Reload the mirror on next lookup
+            self._entries.pop(fingerprint, None)
+
+    def evict(self, entry_id: int) -> None:
+        """Drop an entry, e.g. because its SQL no longer runs."""
+        with self._lock:
+            self._conn.execute("DELETE FROM question_sql WHERE id = ?", (entry_id,))
+            self._entries.clear()
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM question_sql")
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM question_sql").fetchone()[0]
+
+    def _evict(self) -> None:
+        excess = self._conn.execute("SELECT COUNT(*) FROM question_sql").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM question_sql WHERE id IN (SELECT id FROM question_sql ORDER BY used_at LIMIT ?)", (excess,)
+            )
+            self._entries.clear()
+
+
+_question_cache = None
+
+
+def get_question_cache() -> QuestionSQLCache:
+    """Get or create the shared question cache (persisted when ``SQL_CACHE_PATH`` is set)."""
+    global _question_cache
+    if _question_cache is None:
+        _question_cache = QuestionSQLCache(os.environ.get("SQL_CACHE_PATH") or ":memory:")
+    return _question_cache
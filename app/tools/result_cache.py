@@ -0,0 +1,481 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlalchemy as sql
+
+from app.tools.schema_catalog import engine_cache_key
+
+
+# Per-table change markers read in one round-trip. Dialects without an entry
+# have no markers (except file-backed SQLite, which uses the file's stat); a
+# NULL marker means the database cannot tell whether the table changed.
+# PostgreSQL has none: the pg_stat_user_tables counters are flushed
+# asynchronously and frozen for the rest of a transaction, so they can miss writes.
+_TABLE_MARKER_QUERIES = {
+    # InnoDB keeps UPDATE_TIME in memory only, so it is NULL after a restart until the next write
+    "mysql": """
+        SELECT TABLE_NAME, UPDATE_TIME
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE()
+    """,
+}
+_TABLE_MARKER_QUERIES["mariadb"] = _TABLE_MARKER_QUERIES["mysql"]
+
+# Marker used for every table when a single value covers the whole database
+_DATABASE_MARKER = "*"
+
+_METADATA_KEY = b"result_cache"
+
+_STRING_OR_COMMENT = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_TABLE_REFERENCE = re.compile(
+    r"\b(?:from|join|update|into)\s+((?:[\w$]+|\"[^\"]+\"|`[^`]+`|\[[^\]]+\])(?:\s*\.\s*(?:[\w$]+|\"[^\"]+\"|`[^`]+`|\[[^\]]+\]))*)",
+    re.IGNORECASE,
+)
+_CTE_NAME = re.compile(r"(?:\bwith(?:\s+recursive)?|,)\s*([\w$]+)\s*(?:\([^)]*\))?\s+as\s*\(", re.IGNORECASE)
+_WRITE_KEYWORDS = re.compile(
+    r"\b(insert|update|delete|merge|create|drop|alter|truncate|grant|revoke|vacuum|attach|into)\b", re.IGNORECASE
+)
+# Functions that advance a sequence, which is a write even inside a SELECT
+_SEQUENCE_FUNCTIONS = re.compile(r"\b(nextval|setval)\s*\(", re.IGNORECASE)
+# Functions whose result changes from one call to the next, so queries using them are never cached
+_VOLATILE_FUNCTIONS = re.compile(
+    r"\b(?:(?:random|rand|uuid|gen_random_uuid|uuid_generate_v4|newid|now|getdate|getutcdate|sysdatetime"
+    r"|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday|unix_timestamp|utc_timestamp"
+    r"|currval|lastval|last_insert_id|last_insert_rowid|changes)\s*\("
+    r"|(?:current_timestamp|current_date|current_time|localtimestamp|localtime|sysdate)\b)",
+    re.IGNORECASE,
+)
+
+
+def _mask_literals(sql_query: str) -> tuple[str, list[str]]:
+    """Replace quoted strings and comments with placeholders; comments are dropped."""
+    literals: list[str] = []
+
+    def substitute(match: re.Match) -> str:
+        text = match.group(0)
+        if text.startswith(("--", "/*")):
+            return " "
+        literals.append(text)
+        return f"\x00{len(literals) - 1}\x00"
+
+    return _STRING_OR_COMMENT.sub(substitute, sql_query), literals
+
+
+def normalize_sql(sql_query: str) -> str:
+    """Canonicalize SQL text so formatting and keyword case do not change its cache key.
+
+    Comments are removed, whitespace is collapsed and unquoted text is
+    lowercased; quoted strings and identifiers are kept as written.
+    """
+    masked, literals = _mask_literals(sql_query)
+    masked = " ".join(masked.split()).rstrip("; ").lower()
+    return re.sub("\x00(\\d+)\x00", lambda m: literals[int(m.group(1))], masked)
+
+
+def _unquote(identifier: str) -> str:
+    identifier = identifier.strip()
+    if identifier[:1] in '"`[' and len(identifier) > 1:
+        identifier = identifier[1:-1]
+    return identifier.lower()
+
+
+def referenced_tables(sql_query: str) -> frozenset[str]:
+    """Return the (unqualified, lowercase) names of the tables a query reads or writes.
+
+    Names defined by common table expressions are excluded.
+
+    Args:
+        sql_query: The SQL text
+
+    Returns:
+        The table names found after FROM, JOIN, UPDATE and INTO
+
+    """
+    masked, literals = _mask_literals(sql_query)
+    # Quoted identifiers are part of table references, so put them back (but not string literals)
+    masked = re.sub(
+        "\x00(\\d+)\x00",
+        lambda m: literals[int(m.group(1))] if not literals[int(m.group(1))].startswith("'") else "''",
+        masked,
+    )
+    ctes = {_unquote(name) for name in _CTE_NAME.findall(masked)}
+    tables = set()
+    for reference in _TABLE_REFERENCE.findall(masked):
+        name = _unquote(re.split(r"\s*\.\s*", reference)[-1])
+        if name not in ctes:
+            tables.add(name)
+    return frozenset(tables)
+
+
+def is_read_only(sql_query: str) -> bool:
+    """Check whether a query only reads data (no writes, ``SELECT ... INTO`` or sequence calls)."""
+    masked, _ = _mask_literals(sql_query)
+    words = masked.split(maxsplit=1)
+    if not words or words[0].lower() not in ("select", "with", "values"):
+        return False
+    return _WRITE_KEYWORDS.search(masked) is None and _SEQUENCE_FUNCTIONS.search(masked) is None
+
+
+def is_cacheable(sql_query: str) -> bool:
+    """Check whether a query's result may be cached: it only reads data and calls no volatile function."""
+    if not is_read_only(sql_query):
+        return False
+    masked, _ = _mask_literals(sql_query)
+    return _VOLATILE_FUNCTIONS.search(masked) is None
+
+
+@dataclass
+class _Entry:
+    """One cached result, held in memory, on disk or both."""
+
+    key: str
+    engine_key: str
+    tables: frozenset[str]
+    created_at: float
+    markers: dict[str, Any]
+    nbytes: int
+    table: pa.Table | None = None
+    path: str | None = None
+
+
+class ResultCache:
+    """Process-wide cache of SQL query results.
+
+    Results are keyed by normalized SQL plus engine identity and kept as Arrow
+    tables in memory; least recently used entries spill to Parquet files when a
+    directory is configured. Entries are invalidated per table by TTL, by change
+    markers read from the database, or manually with ``invalidate``. Results from
+    databases without reliable change markers (PostgreSQL, in-memory SQLite,
+    DuckDB, SQL Server, ...) are only cached when ``cache_unmarked`` opts in to
+    the TTL alone.
+    """
+
+    def __init__(
+        self,
+        ttl: float | None = 300.0,
+        memory_budget: int = 256 * 1024 * 1024,
+        directory: str | None = None,
+        disk_budget: int = 2 * 1024 * 1024 * 1024,
+        max_entry_bytes: int | None = None,
+        cache_unmarked: bool = False,
+    ):
+        """Initialize the cache.
+
+        Args:
+            ttl: Seconds a result stays valid; ``None`` relies on change markers and manual invalidation
+            memory_budget: Bytes of Arrow data kept in memory
+            directory: Directory for Parquet spill files; ``None`` keeps results in memory only
+            disk_budget: Bytes of Parquet files kept in ``directory``
+            max_entry_bytes: Larger results are not cached (defaults to the memory budget)
+            cache_unmarked: Cache results whose tables have no change markers, trusting the TTL to expire them
+
+        """
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self.max_entry_bytes = max_entry_bytes or memory_budget
+        self.cache_unmarked = cache_unmarked
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_directory()
+
+    @staticmethod
+    def cache_key(engine: sql.engine.Engine, sql_query: str) -> str:
+        """Key of a query's result: its normalized SQL on one database."""
+        payload = f"{engine_cache_key(engine)}\n{normalize_sql(sql_query)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, connection: sql.engine.base.Connection, sql_query: str) -> pd.DataFrame | None:
+        """Return the cached result of a query, or None if it is missing or stale.
+
+        Args:
+            connection: The connection the query would run on
+            sql_query: The SQL text
+
+        Returns:
+            A DataFrame with the cached result, or None
+
+        """
+        if not is_cacheable(sql_query):
+            return None
+
+        key = self.cache_key(connection.engine, sql_query)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not self._is_fresh(entry, connection):
+            if entry is not None:
+                with self._lock:
+                    self._drop(entry)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            table = entry.table
+            if table is None and entry.path is not None:
+                try:
+                    table = pq.read_table(entry.path, memory_map=True)
+                except (OSError, pa.ArrowException):
+                    self._drop(entry)
+                    self.misses += 1
+                    return None
+                self._promote(entry, table)
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return table.to_pandas()
+
+    def put(self, connection: sql.engine.base.Connection, sql_query: str, df: pd.DataFrame) -> bool:
+        """Cache the result of a read-only query.
+
+        Write statements are not cached; instead they invalidate the tables they touch.
+        Queries calling volatile functions, and queries on tables without change
+        markers (unless ``cache_unmarked`` is set), are not cached either.
+
+        Args:
+            connection: The connection the query ran on
+            sql_query: The SQL text
+            df: The query result
+
+        Returns:
+            Whether the result was cached
+
+        """
+        engine = connection.engine
+        tables = referenced_tables(sql_query)
+        if not is_read_only(sql_query):
+            self.invalidate(tables=tables or None, engine=engine)
+            return False
+        if not is_cacheable(sql_query):
+            return False
+
+        markers = self._read_markers(connection, tables)
+        if not self.cache_unmarked and (not markers or any(value is None for value in markers.values())):
+            return False
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowException, TypeError, ValueError):
+            # Mixed-type object columns have no Arrow equivalent
+            return False
+        if table.nbytes > self.max_entry_bytes:
+            return False
+
+        entry = _Entry(
+            key=self.cache_key(engine, sql_query),
+            engine_key=engine_cache_key(engine),
+            tables=tables,
+            created_at=time.time(),
+            markers=markers,
+            nbytes=table.nbytes,
+        )
+        with self._lock:
+            existing = self._entries.get(entry.key)
+            if existing is not None:
+                self._drop(existing)
+            self._entries[entry.key] = entry
+            self._promote(entry, table)
+        return True
+
+    def invalidate(
+        self, tables: set[str] | frozenset[str] | None = None, engine: sql.engine.Engine | None = None
+    ) -> int:
+        """Drop cached results that read any of the given tables.
+
+        Args:
+            tables: Table names to invalidate; ``None`` matches every table
+            engine: Only invalidate results from this database; ``None`` matches every database
+
+        Returns:
+            The number of entries dropped
+
+        """
+        names = {name.lower() for name in tables} if tables is not None else None
+        engine_key = engine_cache_key(engine) if engine is not None else None
+        with self._lock:
+            stale = [
+                entry
+                for entry in self._entries.values()
+                if (engine_key is None or entry.engine_key == engine_key)
+                and (names is None or not entry.tables or entry.tables & names)
+            ]
+            for entry in stale:
+                self._drop(entry)
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        self.invalidate()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit and miss counts and current memory and disk usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _is_fresh(self, entry: _Entry, connection: sql.engine.base.Connection) -> bool:
+        if self.ttl is not None and time.time() - entry.created_at > self.ttl:
+            return False
+        if not entry.markers:
+            return True
+        return self._read_markers(connection, entry.tables) == entry.markers
+
+    @staticmethod
+    def _read_markers(connection: sql.engine.base.Connection, tables: frozenset[str]) -> dict[str, Any]:
+        """Read the change markers of the given tables (empty if the database has none)."""
+        engine = connection.engine
+        url = getattr(engine, "url", None)
+        dialect_name = getattr(getattr(engine, "dialect", None), "name", None)
+
+        if dialect_name == "sqlite" and url is not None and url.database not in (None, "", ":memory:"):
+            # Any committed write changes the database file or its write-ahead log
+            stats = []
+            for path in (url.database, f"{url.database}-wal"):
+                try:
+                    stat = os.stat(path)
+                    stats.append([stat.st_mtime_ns, stat.st_size])
+                except OSError:
+                    stats.append(None)
+            return {_DATABASE_MARKER: stats}
+
+        query = _TABLE_MARKER_QUERIES.get(dialect_name)
+        if query is None or not tables:
+            return {}
+        try:
+            rows = connection.execute(sql.text(query)).fetchall()
+        except sql.exc.SQLAlchemyError:
+            connection.rollback()
+            return {}
+        markers = {str(name).lower(): str(value) for name, value in rows if value is not None}
+        return {name: markers.get(name) for name in sorted(tables)}
+
+    def _promote(self, entry: _Entry, table: pa.Table) -> None:
+        """Hold an entry's table in memory, spilling or evicting others to stay within budget."""
+        if entry.table is None:
+            entry.table = table
+            entry.nbytes = table.nbytes
+            self._memory_bytes += entry.nbytes
+
+        for victim in list(self._entries.values()):
+            if self._memory_bytes <= self.memory_budget:
+                break
+            if victim is entry or victim.table is None:
+                continue
+            if self.directory and victim.path is None:
+                self._spill(victim)
+            victim.table = None
+            self._memory_bytes -= victim.nbytes
+            if victim.path is None:
+                self._drop(victim)
+
+        for victim in list(self._entries.values()):
+            if self._disk_bytes <= self.disk_budget:
+                break
+            if victim.path is not None and victim.table is None:
+                self._drop(victim)
+
+    def _spill(self, entry: _Entry) -> None:
+        """Write an entry to a Parquet file with its metadata, so other processes can reuse it."""
+        path = os.path.join(self.directory, f"{entry.key}.parquet")
+        metadata = {
+            "engine_key": entry.engine_key,
+            "tables": sorted(entry.tables),
+            "created_at": entry.created_at,
+            "markers": entry.markers,
+        }
+        table = entry.table.replace_schema_metadata(
+            {**(entry.table.schema.metadata or {}), _METADATA_KEY: json.dumps(metadata, default=str).encode()}
+        )
+        try:
+            pq.write_table(table, path)
+        except (OSError, pa.ArrowException):
+            return
+        entry.path = path
+        self._disk_bytes += os.path.getsize(path)
+
+    def _drop(self, entry: _Entry) -> None:
+        """Remove an entry from memory, disk and the index."""
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+        if entry.table is not None:
+            self._memory_bytes -= entry.nbytes
+            entry.table = None
+        if entry.path is not None:
+            try:
+                self._disk_bytes -= os.path.getsize(entry.path)
+                os.remove(entry.path)
+            except OSError:
+                pass
+            entry.path = None
+
+    def _load_directory(self) -> None:
+        """Index Parquet files spilled by earlier processes, oldest first."""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                schema = pq.read_schema(path)
+                metadata = json.loads(schema.metadata[_METADATA_KEY])
+                files.append((os.path.getmtime(path), path, metadata))
+            except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+                continue
+
+        for _, path, metadata in sorted(files, key=lambda item: item[0]):
+            key = os.path.basename(path)[: -len(".parquet")]
+            self._entries[key] = _Entry(
+                key=key,
+                engine_key=metadata["engine_key"],
+                tables=frozenset(metadata["tables"]),
+                created_at=metadata["created_at"],
+                markers=metadata["markers"],
+                nbytes=0,
+                path=path,
+            )
+            self._disk_bytes += os.path.getsize(path)
+
+
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get or create the shared result cache.
+
+    Results spill to ``RESULT_CACHE_DIR`` when set; ``RESULT_CACHE_UNMARKED=1``
+    also caches results from databases without change markers for
+    ``RESULT_CACHE_TTL`` seconds.
+    """
+    global _result_cache
+    if _result_cache is None:
+        ttl = os.environ.get("RESULT_CACHE_TTL")
+        _result_cache = ResultCache(
+            ttl=float(ttl) if ttl else 300.0,
+            directory=os.environ.get("RESULT_CACHE_DIR") or None,
+            cache_unmarked=os.environ.get("RESULT_CACHE_UNMARKED", "0") == "1",
+        )
+    return _result_cache
@@ -0,0 +1,268 @@
+import contextlib
+
+from dataclasses import dataclass
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+import sqlalchemy as sql
+
+from app.tools.result_cache import is_read_only
+
+
+# Errors of a native reader that cannot represent a result (e.g. mixed types in one SQLite column)
+try:
+    import adbc_driver_manager
+
+    _NATIVE_READER_ERRORS = (pa.ArrowException, adbc_driver_manager.DataError, adbc_driver_manager.NotSupportedError)
+except ImportError:
+    _NATIVE_READER_ERRORS = (pa.ArrowException,)
+
+DEFAULT_BATCH_ROWS = 10_000
+
+
+@dataclass
+class FetchedResult:
+    """A query result assembled from streamed batches."""
+
+    data: pd.DataFrame
+    truncated: bool = False
+    n_rows: int = 0
+    nbytes: int = 0
+    # "arrow" when a driver produced Arrow batches natively, "tuples" otherwise
+    reader: str = "tuples"
+    # Rows changed by a statement that returns no result set (INSERT, UPDATE, DDL, ...); None for queries
+    rows_affected: int | None = None
+
+
+def _rows_to_table(rows: list[Any], columns: list[str]) -> pa.Table:
+    """Transpose a batch of row tuples into an Arrow table, one array per column."""
+    if not rows:
+        return pa.table([pa.nulls(0)] * len(columns), names=columns)
+    # Duplicate column names are legal in SQL results, so build by position
+    return pa.Table.from_arrays([pa.array(values) for values in zip(*rows, strict=True)], names=columns)
+
+
+def _align_column_dtype(frames: list[pd.DataFrame], position: int) -> None:
+    """Give a column one dtype across batches before they are concatenated.
+
+    All-NULL batches take the dtype of the others; columns typed differently
+    across batches become Python objects, as ``fetchall()`` would give.
+    """
+    dtypes = {frame.dtypes[position] for frame in frames if frame[position].notna().any()}
+    target = dtypes.pop() if len(dtypes) == 1 else object
+    for frame in frames:
+        if frame.dtypes[position] != target:
+            try:
+                frame[position] = frame[position].astype(target)
+            except (TypeError, ValueError):
+                target = object
+                break
+    else:
+        return
+    for frame in frames:
+        frame[position] = frame[position].astype(object)
+
+
+def _arrow_to_pandas(table: pa.Table, dtype_backend: str | None) -> pd.DataFrame:
+    """Convert an Arrow table to pandas, keeping Arrow-backed columns for ``dtype_backend="pyarrow"``."""
+    return table.to_pandas(types_mapper=pd.ArrowDtype if dtype_backend == "pyarrow" else None)
+
+
+def _to_pandas(
+    batches: list[pa.Table | pd.DataFrame], columns: list[str], dtype_backend: str | None = None
+) -> pd.DataFrame:
+    """Combine converted batches into one DataFrame."""
+    if not batches:
+        return pd.DataFrame(columns=columns)
+
+    if all(isinstance(batch, pa.Table) for batch in batches):
+        try:
+            # All-NULL batches have a null type that later batches refine
+            data = _arrow_to_pandas(pa.concat_tables(batches, promote_options="permissive"), dtype_backend)
+            data.columns = columns
+            return data
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+
+    frames = [batch.to_pandas() if isinstance(batch, pa.Table) else batch for batch in batches]
+    for frame in frames:
+        frame.columns = range(len(columns))
+    for position in range(len(columns)):
+        _align_column_dtype(frames, position)
+    data = pd.concat(frames, ignore_index=True)
+    data.columns = columns
+    if dtype_backend == "pyarrow":
+        data = data.convert_dtypes(dtype_backend="pyarrow")
+    return data
+
+
+def _open_native_reader(
+    connection: sql.engine.base.Connection, sql_query: str, batch_rows: int, stack: contextlib.ExitStack
+) -> pa.RecordBatchReader | None:
+    """Run a query through the connection's own driver if it returns Arrow batches natively.
+
+    DuckDB connections produce Arrow batches themselves, as do ADBC drivers
+    used as an engine's DBAPI (e.g. through ``create_engine(..., creator=)``).
+    The query runs on the pooled DBAPI connection behind ``connection``, so it
+    sees the session's state (search_path, temporary tables, uncommitted rows).
+    """
+    dialect_name = getattr(getattr(connection.engine, "dialect", None), "name", None)
+    if dialect_name == "duckdb":
+        cursor = connection.connection.cursor()
+        stack.callback(cursor.close)
+        cursor.execute(sql_query)
+        return cursor.fetch_record_batch(batch_rows)
+
+    dbapi_connection = connection.connection.dbapi_connection
+    if not type(dbapi_connection).__module__.startswith("adbc_driver_"):
+        return None
+    cursor = dbapi_connection.cursor()
+    stack.callback(cursor.close)
+    cursor.execute(sql_query)
+    return cursor.fetch_record_batch()
+
+
+def fetch_arrow_batches(
+    reader: pa.RecordBatchReader,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    dtype_backend: str | None = None,
+) -> FetchedResult:
+    """Build a DataFrame from a stream of Arrow record batches, honouring row and byte caps.
+
+    Args:
+        reader: The Arrow batch stream of a query result
+        max_rows: Stop after this many rows
+        max_bytes: Stop once the batches exceed this many bytes
+        dtype_backend: "pyarrow" for Arrow-backed columns; NumPy dtypes otherwise
+
+    Returns:
+        The DataFrame and whether it was truncated by a cap
+
+    """
+    batches: list[pa.RecordBatch] = []
+    n_rows = nbytes = 0
+    truncated = False
+    for batch in reader:
+        if max_rows is not None and n_rows + batch.num_rows > max_rows:
+            batch = batch.slice(0, max_rows - n_rows)
+            truncated = True
+        batches.append(batch)
+        n_rows += batch.num_rows
+        nbytes += batch.nbytes
+        if truncated or (max_bytes is not None and nbytes >= max_bytes):
+            break
+
+    cap_reached = (max_rows is not None and n_rows >= max_rows) or (max_bytes is not None and nbytes >= max_bytes)
+    if cap_reached and not truncated:
+        try:
+            truncated = reader.read_next_batch().num_rows > 0
+        except StopIteration:
+            truncated = False
+
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    return FetchedResult(
+        data=_arrow_to_pandas(table, dtype_backend), truncated=truncated, n_rows=n_rows, nbytes=nbytes, reader="arrow"
+    )
+
+
+def fetch_dataframe(
+    connection: sql.engine.base.Connection,
+    sql_query: str,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    native: bool = True,
+    dtype_backend: str | None = None,
+) -> FetchedResult:
+    """Run a query and build its DataFrame from columnar batches.
+
+    Drivers that produce Arrow batches natively (DuckDB, or ADBC as the
+    engine's DBAPI) are used first; a query whose result they cannot represent
+    is read again as tuples. Otherwise rows are streamed with a server-side
+    cursor where the driver supports it (``stream_results``/``yield_per``), so
+    at most one batch of Python tuples is alive at a time; each batch is
+    converted to Arrow arrays immediately.
+
+    Args:
+        connection: An open SQLAlchemy connection
+        sql_query: The SQL text
+        batch_rows: Rows fetched and converted per batch
+        max_rows: Stop after this many rows
+        max_bytes: Stop once the converted batches exceed this many bytes
+        native: Whether to use a native Arrow reader when one is available
+        dtype_backend: "pyarrow" for Arrow-backed columns; NumPy dtypes otherwise
+
+    Returns:
+        The DataFrame and whether it was truncated by a cap
+
+    """
+    if native:
+        try:
+            with contextlib.ExitStack() as stack:
+                reader = _open_native_reader(connection, sql_query, batch_rows, stack)
+                if reader is not None:
+                    return fetch_arrow_batches(
+                        reader, max_rows=max_rows, max_bytes=max_bytes, dtype_backend=dtype_backend
+                    )
+        except _NATIVE_READER_ERRORS:
+            # Running the statement again is only safe when it does not write
+            if not is_read_only(sql_query):
+                raise
+
+    return _fetch_rows(connection, sql_query, batch_rows, max_rows, max_bytes, dtype_backend)
+
+
+def _fetch_rows(
+    connection: sql.engine.base.Connection,
+    sql_query: str,
+    batch_rows: int,
+    max_rows: int | None,
+    max_bytes: int | None,
+    dtype_backend: str | None,
+) -> FetchedResult:
+    """Stream row tuples through the SQLAlchemy result, converting each batch to Arrow."""
+    statement = sql.text(sql_query)
+    result = connection.execute(statement, execution_options={"stream_results": True, "yield_per": batch_rows})
+    if not result.returns_rows:
+        # Statements without a result set report only how many rows they changed (-1 if the driver cannot tell)
+        rows_affected = result.rowcount
+        result.close()
+        return FetchedResult(data=pd.DataFrame({"rows_affected": [rows_affected]}), rows_affected=rows_affected)
+    columns = list(map(str, result.keys()))
+
+    batches: list[pa.Table | pd.DataFrame] = []
+    n_rows = nbytes = 0
+    truncated = False
+    try:
+        for partition in result.partitions(batch_rows):
+            rows = list(partition)
+            if max_rows is not None and n_rows + len(rows) > max_rows:
+                rows = rows[: max_rows - n_rows]
+                truncated = True
+
+            try:
+                batch = _rows_to_table(rows, columns)
+                batch_bytes = batch.nbytes
+            except (pa.ArrowException, TypeError, ValueError, OverflowError):
+                # Values Arrow cannot type (mixed Python types, huge integers) stay as Python objects
+                batch = pd.DataFrame.from_records(rows, columns=range(len(columns)))
+                batch_bytes = int(batch.memory_usage(deep=True, index=False).sum())
+            batches.append(batch)
+            n_rows += len(rows)
+            nbytes += batch_bytes
+
+            if truncated or (max_bytes is not None and nbytes >= max_bytes):
+                break
+
+        cap_reached = (max_rows is not None and n_rows >= max_rows) or (max_bytes is not None and nbytes >= max_bytes)
+        if cap_reached and not truncated:
+            # The cap was reached on a batch boundary; the result is truncated only if rows remain
+            truncated = result.fetchone() is not None
+    finally:
+        result.close()
+
+    return FetchedResult(
+        data=_to_pandas(batches, columns, dtype_backend), truncated=truncated, n_rows=n_rows, nbytes=nbytes
+    )
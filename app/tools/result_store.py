@@ -0,0 +1,100 @@
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from typing import Any
+
+
+class ResultStore:
+    """Server-side store of full tool results, referenced by compact handles.
+
+    Tools hand the LLM a short id instead of their payload (data samples,
+    SQL, code); the payload is looked up again when the final response is
+    assembled. Entries expire after ``ttl`` seconds and the least recently
+    stored are dropped beyond ``max_entries``.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 256):
+        """Initialize an empty store.
+
+        Args:
+            ttl: Seconds an entry is kept
+            max_entries: Entries kept before the oldest are dropped
+
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, payload: dict[str, Any]) -> str:
+        """Store a payload and return its id."""
+        result_id = uuid.uuid4().hex[:12]
+        now = time.monotonic()
+        with self._lock:
+            self._entries[result_id] = (now, payload)
+            self._evict(now)
+        return result_id
+
+    def get(self, result_id: str) -> dict[str, Any] | None:
+        """Return the payload stored under an id, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            stored_at, payload = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[result_id]
+                return None
+            return payload
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            result_id, (stored_at, _) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - stored_at <= self.ttl:
+                break
+            del self._entries[result_id]
+
+
+def result_handle(result_id: str, result: dict[str, Any]) -> dict[str, Any]:
+    """Build the compact view of a tool result that is given to the LLM.
+
+    Args:
+        result_id: Id of the full result in the store
+        result: The full tool result
+
+    Returns:
+        The success flag, message, row and column counts and whether a visualization was saved
+
+    """
+    handle = {
+        "success": result.get("success", False),
+        "message": result.get("message", ""),
+        "result_id": result_id,
+        "has_visualization": bool(result.get("visualization_path")),
+    }
+    shape = (result.get("data_summary") or {}).get("shape")
+    if shape:
+        handle["rows"], handle["columns"] = shape
+    return handle
+
+
+_result_store = None
+
+
+def get_result_store() -> ResultStore:
+    """Get or create the shared result store."""
+    global _result_store
+    if _result_store is None:
+        _result_store = ResultStore()
+    return _result_store
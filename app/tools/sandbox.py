@@ -0,0 +1,362 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from app.tools.shared_frames import SharedFrameStore, attach_frame
+
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the RSS watchdog still applies
+    resource = None
+
+# Modules imported once by the fork server, so every worker starts with them loaded
+_PRELOAD = ["app.tools.sandbox", "plotly.express", "statsmodels.api"]
+
+# Seconds a new worker may take to import its modules before it counts as failed
+_STARTUP_TIMEOUT = 120.0
+# Seconds between checks of a running worker's memory and deadline
+_POLL_INTERVAL = 0.05
+# Shared frames a worker keeps attached, so code-fix retries on one frame reuse it
+_ATTACHED_FRAMES = 2
+
+
+class SandboxError(Exception):
+    """Generated code failed in a sandbox worker: it raised, timed out, ran out of memory or crashed."""
+
+
+def _code_namespace(code: str, data: pd.DataFrame) -> dict[str, Any]:
+    """Build the names generated plotting code may use."""
+    # Imported here rather than with the module, so the command line starts without it
+    import plotly.express as px
+
+    namespace = {"df": data, "pd": pd, "np": np, "px": px, "go": go, "Figure": go.Figure}
+    # statsmodels and matplotlib are slow to import, so only code that uses them pays for it
+    if "sm." in code:
+        try:
+            import statsmodels.api as sm
+
+            namespace["sm"] = sm
+        except ImportError:
+            pass
+    if "plt." in code:
+        try:
+            import matplotlib.pyplot as plt
+
+            namespace["plt"] = plt
+        except ImportError:
+            pass
+    return namespace
+
+
+def run_figure_code(code: str, data: pd.DataFrame, function_name: str | None = None) -> Any:
+    """Execute generated plotting code on a DataFrame in the current process.
+
+    Args:
+        code: The generated Python code; it sees the DataFrame as ``df``
+        data: The DataFrame
+        function_name: A function the code defines, called with the DataFrame;
+            without one, the first Plotly figure the code assigns is returned
+
+    Returns:
+        The function's return value, or the figure found (None if there is none)
+
+    Raises:
+        ValueError: If the code does not define ``function_name``
+
+    """
+    namespace = _code_namespace(code, data)
+    exec(code, namespace)
+
+    if function_name is not None:
+        function = namespace.get(function_name)
+        if not callable(function):
+            raise ValueError(f"Could not find {function_name} function after execution")
+        return function(data)
+
+    for value in namespace.values():
+        if isinstance(value, go.Figure):
+            return value
+    return None
+
+
+def _memory_usage(pid: int) -> tuple[int, int, int] | None:
+    """Read a process's virtual, resident and shared resident memory in bytes from /proc."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            size, resident, shared = (int(pages) * os.sysconf("SC_PAGE_SIZE") for pages in f.read().split()[:3])
+    except (OSError, ValueError):
+        return None
+    return size, resident, shared
+
+
+def _limit_address_space(limit: int | None) -> None:
+    """Cap the worker's address space so oversized allocations fail with MemoryError instead of swapping."""
+    if resource is None or limit is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _attach(path: str, attached: OrderedDict[str, tuple[pd.DataFrame, int]], limit: int | None) -> pd.DataFrame:
+    """Attach to a shared frame, reusing it if the worker already has it attached.
+
+    Args:
+        path: Path of the published frame
+        attached: The worker's attached frames and their file sizes, least recently used first
+        limit: The worker's address space limit without frames, or None if it has none
+
+    """
+    entry = attached.get(path)
+    if entry is None:
+        while len(attached) >= _ATTACHED_FRAMES:
+            attached.popitem(last=False)
+        size = os.path.getsize(path)
+        if limit is not None:
+            # The mappings count toward the address space, so the limit makes room for the frames attached now
+            _limit_address_space(limit + size + sum(frame_size for _, frame_size in attached.values()))
+        entry = attached[path] = (attach_frame(path), size)
+    attached.move_to_end(path)
+    # A shallow copy under copy-on-write: the code's edits copy the columns they touch and never
+    # reach the read-only mapping or the frame kept for the next attempt
+    return entry[0].copy(deep=False)
+
+
+def _worker_main(connection: Any, max_memory: int) -> None:
+    """Serve code execution requests until the pool closes the connection (runs in a worker process)."""
+    pd.set_option("mode.copy_on_write", True)
+    # The limit is set from the size at startup, so later frames raise and lower it rather than ratchet it up
+    usage = _memory_usage(os.getpid())
+    limit = usage[0] + max_memory if usage is not None else None
+    _limit_address_space(limit)
+    attached: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+    connection.send(("ready",))
+    while True:
+        try:
+            code, frame, function_name = connection.recv()
+        except EOFError:
+            return
+        try:
+            data = _attach(frame, attached, limit) if isinstance(frame, str) else frame
+            result = run_figure_code(code, data, function_name)
+            reply = ("figure", result.to_json()) if isinstance(result, go.Figure) else ("none",)
+        except Exception as e:
+            reply = ("error", str(e) or type(e).__name__)
+        connection.send(reply)
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe."""
+
+    def __init__(self, context: Any, max_memory: int):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_connection, max_memory), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.ready = False
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class SandboxPool:
+    """Pre-started worker processes that run generated code under a time and memory limit.
+
+    Workers are forked from a server process that has pandas, numpy, plotly
+    (and statsmodels, if installed) imported, so they start warm. Code that
+    exceeds its wall-clock time or resident memory is killed with its worker,
+    and a fresh worker takes its place; the server process is never blocked.
+
+    DataFrames reach the workers through a ``SharedFrameStore``: each frame is
+    written once per content digest and workers map it instead of receiving a
+    pickled copy, so code-fix retries and later questions on the same data
+    send only a path.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 30.0,
+        max_memory: int = 1024 * 1024 * 1024,
+        start_method: str | None = None,
+        shared_memory: int = 2 * 1024 * 1024 * 1024,
+    ):
+        """Initialize the pool; workers start on first use, or earlier with ``start``.
+
+        Args:
+            size: Worker processes; at most this many executions run at once
+            timeout: Seconds an execution may run before it is killed
+            max_memory: Bytes of private resident memory a worker may use; shared frames do not count
+            start_method: multiprocessing start method; "forkserver" where available
+            shared_memory: Bytes of DataFrames kept published for the workers; 0 pickles each frame instead
+
+        """
+        self.size = size
+        self.timeout = timeout
+        self.max_memory = max_memory
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            self._context.set_forkserver_preload(_PRELOAD)
+        self.frames = SharedFrameStore(budget=shared_memory) if shared_memory > 0 else None
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self.restarts = 0
+
+    def run(self, code: str, data: pd.DataFrame, function_name: str | None = None, timeout: float | None = None) -> Any:
+        """Execute generated plotting code in a worker, waiting for a free one.
+
+        Args:
+            code: The generated Python code; it sees the DataFrame as ``df``
+            data: The DataFrame
+            function_name: A function the code defines, called with the DataFrame
+            timeout: Seconds the execution may run; the pool's timeout by default
+
+        Returns:
+            The Plotly figure the code built, or None if it built none
+
+        Raises:
+            SandboxError: If the code raised, timed out, exceeded the memory limit or crashed its worker
+
+        """
+        self.start()
+        # Frames that cannot be stored as Arrow are pickled to the worker instead
+        path = self.frames.publish(data) if self.frames is not None else None
+        worker = self._idle.get()
+        try:
+            kind, *payload = self._call(
+                worker, (code, path or data, function_name), self.timeout if timeout is None else timeout
+            )
+        except BaseException:
+            self._replace(worker)
+            raise
+        finally:
+            if path is not None:
+                self.frames.release(path)
+        self._idle.put(worker)
+
+        if kind == "error":
+            raise SandboxError(payload[0])
+        if kind == "figure":
+            return pio.from_json(payload[0])
+        return None
+
+    def close(self) -> None:
+        """Stop every worker and remove the published frames."""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, set()
+        for worker in workers:
+            worker.kill()
+        if self.frames is not None:
+            self.frames.close()
+
+    def start(self) -> None:
+        """Start the workers now, so the first execution does not wait for the fork server and its imports.
+
+        Does nothing if the workers are already running.
+
+        Raises:
+            SandboxError: If the pool is closed
+
+        """
+        with self._lock:
+            if self._closed:
+                raise SandboxError("Sandbox pool is closed")
+            if self._started:
+                return
+            self._started = True
+            for _ in range(self.size):
+                self._add_worker()
+
+    def _add_worker(self) -> None:
+        """Start a worker and make it available (caller holds the lock)."""
+        worker = _Worker(self._context, self.max_memory)
+        self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        """Kill a worker whose execution did not complete and start a fresh one in its place."""
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            self.restarts += 1
+            if not self._closed:
+                self._add_worker()
+
+    def _call(self, worker: _Worker, request: tuple[str, str | pd.DataFrame, str | None], timeout: float) -> tuple:
+        """Send a request to a worker and wait for its reply within the time and memory limits."""
+        if not worker.ready:
+            if not worker.connection.poll(_STARTUP_TIMEOUT):
+                raise SandboxError("Sandbox worker failed to start")
+            self._receive(worker)
+            worker.ready = True
+
+        try:
+            worker.connection.send(request)
+        except OSError as e:
+            raise SandboxError("Sandbox worker crashed while running the code") from e
+        deadline = time.monotonic() + timeout
+        while not worker.connection.poll(_POLL_INTERVAL):
+            if not worker.process.is_alive():
+                raise SandboxError("Sandbox worker crashed while running the code")
+            # Pages of mapped shared frames are resident too; only the worker's own memory counts
+            usage = _memory_usage(worker.process.pid)
+            if usage is not None and usage[1] - usage[2] > self.max_memory:
+                raise SandboxError(f"Code exceeded the memory limit of {self.max_memory // (1024 * 1024)} MB")
+            if time.monotonic() > deadline:
+                raise SandboxError(f"Code timed out after {timeout:g} seconds")
+        return self._receive(worker)
+
+    @staticmethod
+    def _receive(worker: _Worker) -> tuple:
+        try:
+            return worker.connection.recv()
+        except (EOFError, OSError) as e:
+            raise SandboxError("Sandbox worker crashed while running the code") from e
+
+
+_sandbox_pool = None
+
+
+def get_sandbox_pool() -> SandboxPool | None:
+    """Get or create the shared sandbox pool, or None when sandboxing is disabled.
+
+    ``SANDBOX_WORKERS`` sets the worker processes (0 runs generated code in
+    the server process), ``SANDBOX_TIMEOUT`` the seconds an execution may run,
+    ``SANDBOX_MAX_MEMORY_MB`` the resident memory a worker may use and
+    ``SANDBOX_SHARED_MEMORY_MB`` the DataFrames kept published for the workers.
+    """
+    global _sandbox_pool
+    size = int(os.environ.get("SANDBOX_WORKERS", "2"))
+    if size <= 0:
+        return None
+    if _sandbox_pool is None:
+        _sandbox_pool = SandboxPool(
+            size=size,
+            timeout=float(os.environ.get("SANDBOX_TIMEOUT", "30")),
+            max_memory=int(os.environ.get("SANDBOX_MAX_MEMORY_MB", "1024")) * 1024 * 1024,
+            shared_memory=int(os.environ.get("SANDBOX_SHARED_MEMORY_MB", "2048")) * 1024 * 1024,
+        )
+        # Published frames live in shared memory, which outlives the process unless removed
+        atexit.register(_sandbox_pool.close)
+    return _sandbox_pool
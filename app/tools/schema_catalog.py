@@ -0,0 +1,296 @@
+import hashlib
+import threading
+import time
+
+from dataclasses import dataclass, field
+from typing import Any
+
+import sqlalchemy as sql
+
+
+# One round-trip per dialect that returns every column of every table in the
+# current schema. Rows are normalized to table name, column name, data type,
+# column comment, table comment, referred table and referred column.
+_BULK_SCHEMA_QUERIES = {
+    "sqlite": """
+        SELECT m.name, p.name, p.type, NULL, NULL, fk."table", fk."to"
+        FROM sqlite_master AS m
+        JOIN pragma_table_info(m.name) AS p
+        LEFT JOIN pragma_foreign_key_list(m.name) AS fk ON fk."from" = p.name
+        WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%'
+        ORDER BY m.name, p.cid
+    """,
+    "postgresql": """
+        SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod),
+               col_description(c.oid, a.attnum), obj_description(c.oid, 'pg_class'),
+               rc.relname, ra.attname
+        FROM pg_class AS c
+        JOIN pg_namespace AS n ON n.oid = c.relnamespace
+        JOIN pg_attribute AS a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        LEFT JOIN pg_constraint AS fk
+            ON fk.conrelid = c.oid AND fk.contype = 'f' AND a.attnum = ANY (fk.conkey)
+        LEFT JOIN pg_class AS rc ON rc.oid = fk.confrelid
+        LEFT JOIN pg_attribute AS ra
+            ON ra.attrelid = fk.confrelid AND ra.attnum = fk.confkey[array_position(fk.conkey, a.attnum)]
+        WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+        ORDER BY c.relname, a.attnum
+    """,
+    "mysql": """
+        SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, NULLIF(c.COLUMN_COMMENT, ''),
+               NULLIF(t.TABLE_COMMENT, ''), k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME
+        FROM information_schema.COLUMNS AS c
+        JOIN information_schema.TABLES AS t
+            ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        LEFT JOIN information_schema.KEY_COLUMN_USAGE AS k
+            ON k.TABLE_SCHEMA = c.TABLE_SCHEMA AND k.TABLE_NAME = c.TABLE_NAME
+            AND k.COLUMN_NAME = c.COLUMN_NAME AND k.REFERENCED_TABLE_NAME IS NOT NULL
+        WHERE c.TABLE_SCHEMA = DATABASE()
+        ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+    """,
+    "duckdb": """
+        SELECT c.table_name, c.column_name, c.data_type, c.comment, t.comment, NULL, NULL
+        FROM duckdb_columns() AS c
+        JOIN duckdb_tables() AS t ON t.table_oid = c.table_oid
+        WHERE c.schema_name = current_schema()
+        ORDER BY c.table_name, c.column_index
+    """,
+}
+_BULK_SCHEMA_QUERIES["mariadb"] = _BULK_SCHEMA_QUERIES["mysql"]
+
+# Cheap change markers: a single small row that changes whenever DDL runs.
+# Dialects without an entry fall back to the catalog TTL.
+_SCHEMA_VERSION_QUERIES = {
+    "sqlite": "PRAGMA schema_version",
+    "postgresql": """
+        SELECT md5(string_agg(c.oid::text || ':' || c.xmin::text, ',' ORDER BY c.oid))
+        FROM pg_class AS c
+        JOIN pg_namespace AS n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+    """,
+    "mysql": """
+        SELECT COUNT(*), SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE)))
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """,
+    "mssql": "SELECT COUNT(*), MAX(modify_date) FROM sys.objects WHERE type IN ('U', 'V')",
+}
+_SCHEMA_VERSION_QUERIES["mariadb"] = _SCHEMA_VERSION_QUERIES["mysql"]
+
+
+@dataclass(frozen=True)
+class ColumnInfo:
+    """A single reflected column."""
+
+    name: str
+    type: str
+    comment: str | None = None
+
+
+@dataclass(frozen=True)
+class ForeignKey:
+    """A single-column foreign key reference."""
+
+    column: str
+    referred_table: str
+    referred_column: str | None = None
+
+
+@dataclass
+class TableInfo:
+    """A reflected table or view with its columns and outgoing foreign keys."""
+
+    name: str
+    columns: list[ColumnInfo] = field(default_factory=list)
+    foreign_keys: list[ForeignKey] = field(default_factory=list)
+    comment: str | None = None
+
+
+@dataclass
+class SchemaSnapshot:
+    """The reflected schema of one database at one point in time."""
+
+    tables: dict[str, TableInfo]
+    version: Any = None
+    reflected_at: float = field(default_factory=time.monotonic)
+    fingerprint: str = ""
+    # Search index over the tables, built on first use by ``get_schema_index``
+    index: Any = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not self.fingerprint:
+            self.fingerprint = self._compute_fingerprint()
+
+    def _compute_fingerprint(self) -> str:
+        """Hash table, column and type names so equal layouts share a fingerprint."""
+        digest = hashlib.sha256()
+        for table_name in sorted(self.tables):
+            digest.update(table_name.encode())
+            for column in self.tables[table_name].columns:
+                digest.update(f"|{column.name}:{column.type}".encode())
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    def to_prompt(self) -> str:
+        """Render the schema in the plain text layout used by the SQL prompts."""
+        schema_info = []
+        for table in self.tables.values():
+            col_info = [f"    - {col.name}: {col.type}" for col in table.columns]
+            schema_info.append(f"Table: {table.name}\nColumns:\n" + "\n".join(col_info))
+
+        return "\n\n".join(schema_info)
+
+
+def engine_cache_key(engine: sql.engine.Engine) -> str:
+    """Return the key used to share per-database state between agent instances.
+
+    In-memory SQLite databases are private to their engine, so the engine
+    identity is part of their key.
+    """
+    url = getattr(engine, "url", None)
+    if url is None:
+        return f"engine-{id(engine)}"
+
+    key = url.render_as_string(hide_password=True)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        key = f"{key}#{id(engine)}"
+    return key
+
+
+class SchemaCatalog:
+    """Process-wide cache of reflected database schemas.
+
+    Each database is reflected with a single bulk catalog query where the
+    dialect supports it. Cached snapshots are revalidated with a cheap
+    schema-version probe, or by TTL for dialects without one.
+    """
+
+    def __init__(self, ttl: float | None = 300.0):
+        """Initialize the catalog.
+
+        Args:
+            ttl: Seconds a snapshot is trusted when the dialect has no version
+                probe. ``None`` keeps such snapshots until invalidated.
+
+        """
+        self.ttl = ttl
+        self._snapshots: dict[str, SchemaSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def get_schema(self, connection: sql.engine.base.Connection) -> SchemaSnapshot:
+        """Return the schema for the connection's database, reflecting only when it changed.
+
+        Args:
+            connection: An open SQLAlchemy connection
+
+        Returns:
+            The cached or freshly reflected schema snapshot
+
+        """
+        engine = connection.engine
+        key = engine_cache_key(engine)
+        dialect_name = self._dialect_name(engine)
+        version = self._probe_version(connection, dialect_name)
+
+        with self._lock:
+            cached = self._snapshots.get(key)
+        if cached is not None and self._is_fresh(cached, version):
+            return cached
+
+        snapshot = self._reflect(connection, dialect_name, version)
+        with self._lock:
+            self._snapshots[key] = snapshot
+        return snapshot
+
+    def invalidate(self, engine: sql.engine.Engine | None = None) -> None:
+        """Drop the cached snapshot for one engine, or for every engine if none is given."""
+        with self._lock:
+            if engine is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(engine_cache_key(engine), None)
+
+    def _is_fresh(self, snapshot: SchemaSnapshot, version: Any) -> bool:
+        """Check whether a cached snapshot still describes the database."""
+        if version is not None:
+            return snapshot.version == version
+        if self.ttl is None:
+            return True
+        return time.monotonic() - snapshot.reflected_at < self.ttl
+
+    @staticmethod
+    def _dialect_name(engine: sql.engine.Engine) -> str | None:
+        dialect = getattr(engine, "dialect", None)
+        return getattr(dialect, "name", None)
+
+    @staticmethod
+    def _probe_version(connection: sql.engine.base.Connection, dialect_name: str | None) -> Any:
+        """Read the dialect's schema-version marker, or ``None`` if it has none."""
+        query = _SCHEMA_VERSION_QUERIES.get(dialect_name)
+        if query is None:
+            return None
+
+        try:
+            row = connection.execute(sql.text(query)).first()
+        except sql.exc.SQLAlchemyError:
+            connection.rollback()
+            return None
+        return tuple(row) if row is not None else None
+
+    def _reflect(
+        self, connection: sql.engine.base.Connection, dialect_name: str | None, version: Any
+    ) -> SchemaSnapshot:
+        """Reflect the whole schema, preferring the dialect's bulk query."""
+        query = _BULK_SCHEMA_QUERIES.get(dialect_name)
+        if query is not None:
+            try:
+                rows = connection.execute(sql.text(query)).fetchall()
+                return SchemaSnapshot(tables=self._tables_from_rows(rows), version=version)
+            except sql.exc.SQLAlchemyError:
+                connection.rollback()
+
+        return SchemaSnapshot(tables=self._reflect_with_inspector(connection), version=version)
+
+    @staticmethod
+    def _tables_from_rows(rows: list[Any]) -> dict[str, TableInfo]:
+        """Group flat catalog rows into tables."""
+        tables: dict[str, TableInfo] = {}
+        for table_name, column_name, data_type, column_comment, table_comment, referred_table, referred_column in rows:
+            table = tables.get(table_name)
+            if table is None:
+                table = tables[table_name] = TableInfo(name=table_name, comment=table_comment)
+
+            # A column that is part of several foreign keys appears once per key
+            if not table.columns or table.columns[-1].name != column_name:
+                table.columns.append(ColumnInfo(name=column_name, type=str(data_type or ""), comment=column_comment))
+
+            if referred_table:
+                table.foreign_keys.append(
+                    ForeignKey(column=column_name, referred_table=referred_table, referred_column=referred_column)
+                )
+        return tables
+
+    @staticmethod
+    def _reflect_with_inspector(connection: sql.engine.base.Connection) -> dict[str, TableInfo]:
+        """Reflect table by table through the SQLAlchemy inspector for dialects without a bulk query."""
+        inspector = sql.inspect(connection.engine)
+
+        tables: dict[str, TableInfo] = {}
+        for table_name in inspector.get_table_names():
+            columns = [
+                ColumnInfo(name=col["name"], type=str(col["type"]), comment=col.get("comment"))
+                for col in inspector.get_columns(table_name)
+            ]
+            tables[table_name] = TableInfo(name=table_name, columns=columns)
+        return tables
+
+
+# Global catalog instance
+_catalog = None
+
+
+def get_schema_catalog() -> SchemaCatalog:
+    """Get or create the shared schema catalog."""
+    global _catalog
+    if _catalog is None:
+        _catalog = SchemaCatalog()
+    return _catalog
@@ -0,0 +1,205 @@
+import math
+
+from collections import Counter
+
+from app.tools.embeddings import cosine_similarity, embed_text, tokenize
+from app.tools.schema_catalog import SchemaSnapshot, TableInfo
+
+
+# Identifier-heavy DDL averages roughly three characters per token; erring on
+# the high side keeps the rendered schema inside the budget.
+CHARS_PER_TOKEN = 3
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+# Weight of the embedding similarity relative to the normalized BM25 score
+_SEMANTIC_WEIGHT = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservatively estimate the number of LLM tokens in a piece of text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def render_table_ddl(table: TableInfo, max_columns: int | None = None) -> str:
+    """Render a table as a compact one-line DDL-like signature.
+
+    Example: ``orders(id INTEGER, customer_id INTEGER -> customers.id, total REAL) -- Order headers``
+
+    Args:
+        table: The table to render
+        max_columns: Keep only the first N columns, marking the rest as elided
+
+    Returns:
+        The compact table signature
+
+    """
+    references = {fk.column: fk for fk in table.foreign_keys}
+    columns = table.columns if max_columns is None else table.columns[:max_columns]
+
+    parts = []
+    for column in columns:
+        part = f"{column.name} {column.type}".strip()
+        fk = references.get(column.name)
+        if fk is not None:
+            part += f" -> {fk.referred_table}" + (f".{fk.referred_column}" if fk.referred_column else "")
+        if column.comment:
+            part += f" /* {column.comment} */"
+        parts.append(part)
+    if len(columns) < len(table.columns):
+        parts.append(f"... {len(table.columns) - len(columns)} more")
+
+    line = f"{table.name}({', '.join(parts)})"
+    if table.comment:
+        line += f" -- {table.comment}"
+    return line
+
+
+class SchemaIndex:
+    """Local lexical and semantic index over table names, column names and comments.
+
+    Tables are scored with BM25 over identifier tokens plus the cosine similarity
+    of hashed n-gram embeddings, so questions match tables even when they use a
+    different word form than the schema.
+    """
+
+    def __init__(self, snapshot: SchemaSnapshot):
+        self.snapshot = snapshot
+        self._documents: dict[str, Counter] = {}
+        self._embeddings = {}
+        self._neighbours: dict[str, set[str]] = {name: set() for name in snapshot.tables}
+
+        for name, table in snapshot.tables.items():
+            text = " ".join(
+                [name, table.comment or ""] + [f"{column.name} {column.comment or ''}" for column in table.columns]
+            )
+            # Table names are the strongest signal, so they count twice
+            self._documents[name] = Counter(tokenize(text) + tokenize(name))
+            self._embeddings[name] = embed_text(text)
+
+            for fk in table.foreign_keys:
+                if fk.referred_table in self._neighbours:
+                    self._neighbours[name].add(fk.referred_table)
+                    self._neighbours[fk.referred_table].add(name)
+
+        self._average_length = (
+            sum(sum(doc.values()) for doc in self._documents.values()) / len(self._documents) if self._documents else 0
+        )
+        self._document_frequency = Counter(token for doc in self._documents.values() for token in doc)
+
+    def rank(self, question: str) -> list[tuple[str, float]]:
+        """Score every table against a question.
+
+        Args:
+            question: The user's natural language question
+
+        Returns:
+            ``(table_name, score)`` pairs, best match first
+
+        """
+        query_tokens = set(tokenize(question))
+        query_embedding = embed_text(question)
+        n_documents = len(self._documents)
+
+        lexical = {}
+        for name, doc in self._documents.items():
+            length = sum(doc.values())
+            score = 0.0
+            for token in query_tokens:
+                frequency = doc.get(token, 0)
+                if not frequency:
+                    continue
+                df = self._document_frequency[token]
+                idf = math.log(1 + (n_documents - df + 0.5) / (df + 0.5))
+                norm = _K1 * (1 - _B + _B * length / (self._average_length or 1))
+                score += idf * frequency * (_K1 + 1) / (frequency + norm)
+            lexical[name] = score
+
+        best_lexical = max(lexical.values(), default=0.0) or 1.0
+        scores = {
+            name: lexical[name] / best_lexical
+            + _SEMANTIC_WEIGHT * cosine_similarity(query_embedding, self._embeddings[name])
+            for name in self._documents
+        }
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def select_tables(self, question: str, top_k: int = 8) -> list[str]:
+        """Pick the top-K tables for a question plus their foreign-key neighbours.
+
+        Args:
+            question: The user's natural language question
+            top_k: Number of directly matched tables to keep
+
+        Returns:
+            Table names in relevance order, each neighbour following the first table that pulled it in
+
+        """
+        return self._select([name for name, _ in self.rank(question)], top_k)
+
+    def _select(self, ranked: list[str], top_k: int) -> list[str]:
+        """Expand the top-K of a ranking with foreign-key neighbours."""
+        position = {name: i for i, name in enumerate(ranked)}
+        selected: dict[str, None] = {}
+        for name in ranked[:top_k]:
+            selected.setdefault(name)
+            for neighbour in sorted(self._neighbours[name], key=position.__getitem__):
+                selected.setdefault(neighbour)
+        return list(selected)
+
+    def render(self, question: str, top_k: int = 8, token_budget: int = 2000) -> str:
+        """Render the schema section of a SQL prompt for a question.
+
+        The whole schema is used when it fits in the budget; otherwise only the
+        selected tables are emitted, in relevance order, until the budget is spent.
+
+        Args:
+            question: The user's natural language question
+            top_k: Number of directly matched tables to keep for wide schemas
+            token_budget: Hard upper bound on the estimated tokens of the result
+
+        Returns:
+            Compact DDL lines, one per table
+
+        """
+        ranked = [name for name, _ in self.rank(question)]
+        full = "\n".join(render_table_ddl(self.snapshot.tables[name]) for name in ranked)
+        if estimate_tokens(full) <= token_budget:
+            return full
+
+        lines: list[str] = []
+        used = 0
+        for name in self._select(ranked, top_k):
+            table = self.snapshot.tables[name]
+            line = render_table_ddl(table)
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                if lines:
+                    continue
+                # Always emit the best match, trimmed to the columns that fit
+                line = self._trim_to_budget(table, token_budget)
+                cost = estimate_tokens(line) + 1
+            lines.append(line)
+            used += cost
+        return "\n".join(lines)
+
+    @staticmethod
+    def _trim_to_budget(table: TableInfo, token_budget: int) -> str:
+        """Drop trailing columns until the table signature fits the budget."""
+        for max_columns in range(len(table.columns), -1, -1):
+            line = render_table_ddl(table, max_columns=max_columns)
+            if estimate_tokens(line) < token_budget:
+                return line
+        return table.name[: token_budget * CHARS_PER_TOKEN]
+
+
+def get_schema_index(snapshot: SchemaSnapshot) -> SchemaIndex:
+    """Get the index for a schema snapshot, building it on first use and keeping it on the snapshot.
+
+    The index renders foreign keys and comments, so it is tied to the snapshot
+    it was built from rather than shared by schemas with the same layout.
+    """
+    if snapshot.index is None:
+        snapshot.index = SchemaIndex(snapshot)
+    return snapshot.index
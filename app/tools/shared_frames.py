@@ -0,0 +1,143 @@
+import contextlib
+import os
+import tempfile
+import threading
+
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from app.tools.data_profiler import dataframe_digest
+
+
+# Errors pyarrow raises for DataFrames it cannot store as Arrow (e.g. object columns of mixed types)
+_CONVERSION_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+
+def _default_directory() -> str:
+    """Prefer /dev/shm, so published frames live in memory rather than on disk."""
+    base = "/dev/shm" if os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, "data_analyst_frames")
+
+
+def attach_frame(path: str) -> pd.DataFrame:
+    """Open a published frame as a DataFrame backed by the memory-mapped file.
+
+    Numeric, boolean and datetime columns without nulls are read-only views
+    of the mapping, so attaching them copies nothing; other columns (strings,
+    columns with nulls) are converted as pandas needs.
+
+    Args:
+        path: Path of a file written by ``SharedFrameStore.publish``
+
+    Returns:
+        The DataFrame
+
+    """
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+class SharedFrameStore:
+    """DataFrames published as memory-mapped Arrow IPC files for worker processes.
+
+    Each DataFrame is written once per content digest, uncompressed, so any
+    number of processes can map the file and attach to it without the frame
+    being pickled or copied. Files stay within a byte budget, least recently
+    used first out; files in use by a running execution are never removed.
+    """
+
+    def __init__(self, directory: str | None = None, budget: int = 2 * 1024 * 1024 * 1024):
+        """Initialize the store.
+
+        Args:
+            directory: Where frames are written; a directory in /dev/shm (or the system temp dir) by default
+            budget: Bytes of published frames kept
+
+        """
+        self.directory = directory or _default_directory()
+        self.budget = budget
+        self._files: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._pins: dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def publish(self, data: pd.DataFrame) -> str | None:
+        """Write a DataFrame to a shared file, unless a frame with the same contents is already published.
+
+        The file is pinned until ``release`` is called with the returned path.
+
+        Args:
+            data: The DataFrame
+
+        Returns:
+            Path of the file, or None if the DataFrame cannot be stored as Arrow
+
+        """
+        digest = dataframe_digest(data)
+        with self._lock:
+            entry = self._files.get(digest)
+            if entry is None:
+                entry = self._write(digest, data)
+                if entry is None:
+                    return None
+                self._files[digest] = entry
+                self._bytes += entry[1]
+            self._files.move_to_end(digest)
+            path = entry[0]
+            self._pins[path] = self._pins.get(path, 0) + 1
+            self._trim()
+        return path
+
+    def release(self, path: str) -> None:
+        """Unpin a file returned by ``publish``."""
+        with self._lock:
+            count = self._pins.pop(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+
+    def close(self) -> None:
+        """Remove every published file."""
+        with self._lock:
+            files, self._files = self._files, OrderedDict()
+            self._bytes = 0
+        for path, _ in files.values():
+            self._remove(path)
+
+    def _write(self, digest: str, data: pd.DataFrame) -> tuple[str, int] | None:
+        """Write a DataFrame as an uncompressed Arrow IPC file, returning its path and size."""
+        try:
+            table = pa.Table.from_pandas(data)
+        except _CONVERSION_ERRORS:
+            return None
+
+        # The process id keeps servers sharing the directory from removing each other's files
+        path = os.path.join(self.directory, f"{os.getpid()}-{digest}.arrow")
+        temp_path = f"{path}.tmp"
+        try:
+            with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, path)
+        except OSError:
+            self._remove(temp_path)
+            return None
+        return path, os.path.getsize(path)
+
+    def _trim(self) -> None:
+        """Remove unpinned files, oldest first, until the store is within its budget (caller holds the lock)."""
+        for digest, (path, size) in list(self._files.items()):
+            if self._bytes <= self.budget:
+                return
+            if path in self._pins:
+                continue
+            del self._files[digest]
+            self._bytes -= size
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        with contextlib.suppress(OSError):
+            os.remove(path)
@@ -1,6 +1,8 @@
+import asyncio
 import os
 import re
 
+from collections.abc import Callable
 from typing import Any
 
 import dotenv
@@ -9,11 +11,24 @@ import plotly.graph_objects as go
 import sqlalchemy as sql
 
 from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
+
+from app.database import get_database_executor, get_engine_registry
+from app.tools.code_cache import VisualizationCodeCache, get_code_cache, layout_fingerprint
+from app.tools.llm_cache import SQLiteResponseCache, cache_stats, cache_stats_since, with_response_cache
+from app.tools.llm_steps import LLMSteps, arun_llm_steps, run_llm_steps
+from app.tools.question_cache import QuestionSQLCache, get_question_cache
+from app.tools.result_cache import ResultCache, get_result_cache, is_read_only, referenced_tables
+from app.tools.result_fetch import DEFAULT_BATCH_ROWS, FetchedResult, fetch_dataframe
+from app.tools.sandbox import SandboxPool, run_figure_code
+from app.tools.schema_catalog import SchemaCatalog, SchemaSnapshot, engine_cache_key, get_schema_catalog
+from app.tools.schema_index import get_schema_index
 
 
 dotenv.load_dotenv()
 
+# Kind of generated code this agent stores in the code cache: a create_visualization function
+_CODE_KIND = "create_visualization"
+
 
 class SQLDataAnalysisAgent:
     """A single agent that handles SQL database querying and data visualization."""
@@ -27,21 +42,72 @@ class SQLDataAnalysisAgent:
         log: bool = False,
         log_path: str = None,
         verbose: bool = False,
+        schema_catalog: SchemaCatalog | None = None,
+        schema_top_k: int = 8,
+        schema_token_budget: int = 2000,
+        max_sql_attempts: int = 3,
+        llm_cache: SQLiteResponseCache | None = None,
+        question_cache: QuestionSQLCache | None = None,
+        reuse_sql: bool = True,
+        result_cache: ResultCache | None = None,
+        cache_results: bool = True,
+        max_result_rows: int | None = None,
+        max_result_bytes: int | None = 512 * 1024 * 1024,
+        fetch_batch_rows: int = DEFAULT_BATCH_ROWS,
+        result_dtype_backend: str | None = None,
+        progress: Callable[[str], None] | None = None,
+        sandbox: SandboxPool | None = None,
+        code_cache: VisualizationCodeCache | None = None,
+        reuse_code: bool = True,
     ):
         """Initialize the SQL Data Analysis Agent."""
-        self.model = model
+        # Responses are cached when llm_cache is given or LLM_CACHE_PATH is set
+        self.model = with_response_cache(model, llm_cache)
         self.n_samples = n_samples
         self.log = log
         self.log_path = log_path
         self.verbose = verbose
+        self.schema_catalog = schema_catalog or get_schema_catalog()
+        self.schema_top_k = schema_top_k
+        self.schema_token_budget = schema_token_budget
+        self.max_sql_attempts = max(1, max_sql_attempts)
+        # SQL of earlier successful questions is reused for similar ones unless reuse_sql is False
+        if question_cache is None and reuse_sql:
+            question_cache = get_question_cache()
+        self.question_cache = question_cache if reuse_sql else None
+        # Results of read-only queries are shared across sessions unless cache_results is False
+        if result_cache is None and cache_results:
+            result_cache = get_result_cache()
+        self.result_cache = result_cache if cache_results else None
+        # Results are streamed in batches and cut off at these caps
+        self.max_result_rows = max_result_rows
+        self.max_result_bytes = max_result_bytes
+        self.fetch_batch_rows = fetch_batch_rows
+        # "pyarrow" keeps query results in Arrow-backed columns
+        self.result_dtype_backend = result_dtype_backend
+        # Called with a short message as each step completes (schema loaded, SQL generated, ...)
+        self.progress = progress
+        # Generated visualization code runs in this worker pool, under time and memory limits, when given
+        self.sandbox = sandbox
+        # Visualization functions that built a figure are reused for the same request and column layout
+        if code_cache is None and reuse_code:
+            code_cache = get_code_cache()
+        self.code_cache = code_cache if reuse_code else None
 
         # State management
         self._state = {
             "sql_query_code": None,
+            "sql_attempts": 0,
+            "used_cached_sql": False,
+            "cached_sql_question": None,
+            "used_cached_result": False,
+            "data_truncated": False,
             "sql_database_function": None,
             "data_sql": None,
             "data_visualization_function": None,
+            "used_cached_code": False,
             "plotly_graph": None,
+            "llm_cache": None,
             "error": None,
         }
 
@@ -51,8 +117,9 @@ class SQLDataAnalysisAgent:
 
         self.connection = connection
         if connection is None:
-            engine = sql.create_engine(engine_url)
-            self.connection = engine.connect()
+            self.connection = get_engine_registry().get_engine(engine_url).connect()
+        # Event loop of a running ainvoke_agent; database work is sent to the database executor through it
+        self._database_loop: asyncio.AbstractEventLoop | None = None
 
         # Create log directory if needed
         if self.log and self.log_path:
@@ -60,12 +127,31 @@ class SQLDataAnalysisAgent:
 
     def invoke_agent(self, user_instructions: str, auto_display: bool = True) -> dict[str, Any]:
         """Process user instructions and generate responses."""
+        return run_llm_steps(self.model, self._agent_steps(user_instructions, auto_display))
+
+    async def ainvoke_agent(self, user_instructions: str, auto_display: bool = True) -> dict[str, Any]:
+        """Async variant of ``invoke_agent``.
+
+        LLM calls are awaited with ``ainvoke`` and the work between them runs
+        in a worker thread. Only the database work (schema, queries, result
+        cache checks) takes a slot of the database on the shared database
+        executor, so slow chart code cannot hold up other queries.
+        """
+        self._database_loop = asyncio.get_running_loop()
+        try:
+            return await arun_llm_steps(self.model, self._agent_steps(user_instructions, auto_display))
+        finally:
+            self._database_loop = None
+
+    def _agent_steps(self, user_instructions: str, auto_display: bool) -> LLMSteps[dict[str, Any]]:
+        """Run the analysis pipeline shared by ``invoke_agent`` and ``ainvoke_agent``."""
         # Reset state for new query
         self._reset_state()
+        cache_start = cache_stats(self.model)
 
         # Determine analysis type and execute steps
         analysis_type = self._determine_analysis_type(user_instructions)
-        self._generate_and_execute_sql(user_instructions, analysis_type)
+        yield from self._generate_and_execute_sql_steps(user_instructions, analysis_type)
 
         # Create visualization if needed
         if (
@@ -73,7 +159,9 @@ class SQLDataAnalysisAgent:
             and self._state["data_sql"] is not None
             and not isinstance(self._state["data_sql"], str)
         ):
-            self._generate_visualization(user_instructions)
+            yield from self._generate_visualization_steps(user_instructions)
+
+        self._state["llm_cache"] = cache_stats_since(self.model, cache_start)
 
         # Auto-display results if requested
         if auto_display:
@@ -81,7 +169,7 @@ class SQLDataAnalysisAgent:
 
         return self._state
 
-    def display_results(self):
+    def display_results(self):  # noqa: C901
         """Display only metrics and visualizations."""
         # Check for errors first
         if self._state.get("error"):
@@ -96,6 +184,10 @@ class SQLDataAnalysisAgent:
                 return
 
             print("\n--- Data Metrics ---")
+            if self._state.get("data_truncated"):
+                print("(Result truncated at the configured row/byte cap)")
+            if self._state.get("used_cached_sql"):
+                print(f"(Reused the SQL of a similar earlier question: {self._state['cached_sql_question']!r})")
 
             # Show basic DataFrame information
             print(f"Shape: {df.shape[0]} rows × {df.shape[1]} columns")
@@ -162,92 +254,210 @@ class SQLDataAnalysisAgent:
         # If no code block found, return the entire response
         return response.strip()
 
-    def _generate_and_execute_sql(self, user_instructions: str, analysis_type: dict[str, bool]) -> None:  # noqa: ARG002
-        """Generate SQL query based on user instructions and execute it."""
-        tables_info = self._get_database_schema()
+    def _generate_and_execute_sql(self, user_instructions: str, analysis_type: dict[str, bool]) -> None:
+        """Generate SQL query based on user instructions and execute it, repairing it from database errors."""
+        run_llm_steps(self.model, self._generate_and_execute_sql_steps(user_instructions, analysis_type))
+
+    def _generate_and_execute_sql_steps(
+        self,
+        user_instructions: str,
+        analysis_type: dict[str, bool],  # noqa: ARG002
+    ) -> LLMSteps[None]:
+        """Run ``_generate_and_execute_sql`` as steps, yielding each LLM request."""
+        if self._reuse_cached_sql(user_instructions):
+            return
+
+        tables_info = self._get_database_schema(user_instructions)
+        self._report_progress("Schema loaded")
 
         # Generate SQL query using LLM
         sql_prompt = f"""
-        You are an expert SQL developer. Given the following database schema:
+        You are an expert SQL developer. Given the following database schema, one table per line
+        as name(column type, ...), where "->" marks a foreign key reference:
 
         {tables_info}
 
         Generate a SQL query to answer this question:
         {user_instructions}
-
+        {self._query_guidance()}
         Return ONLY the SQL query without any explanations or markdown formatting.
         Do not include backticks (```) or 'sql' at the beginning or end.
         """
 
-        sql_result = self.model.invoke(sql_prompt)
+        sql_result = yield sql_prompt
         sql_query = self._extract_code_from_response(sql_result.content)
-        self._state["sql_query_code"] = sql_query
 
-        # Log the SQL query
-        if self.verbose:
-            print(f"Generated SQL Query: {sql_query}")
+        # Execute first; only a failed query costs further round-trips to repair it
+        for attempt in range(1, self.max_sql_attempts + 1):
+            self._state["sql_query_code"] = sql_query
+            self._state["sql_attempts"] = attempt
 
-        # Generate Python function that executes this SQL
-        function_prompt = f"""
-        Create a Python function that executes the following SQL query using SQLAlchemy and returns a pandas DataFrame:
+            if self.verbose:
+                print(f"Generated SQL Query (attempt {attempt}): {sql_query}")
+            self._report_progress(f"SQL generated (attempt {attempt})")
+
+            db_error = self._on_database(self._execute_sql, sql_query)
+            if db_error is None:
+                # Only queries are worth replaying for similar questions, never writes
+                if self.question_cache is not None and is_read_only(sql_query):
+                    self.question_cache.store(user_instructions, self._schema_fingerprint(), sql_query)
+                return
 
-        ```sql
-        {sql_query}
-        ```
+            if attempt < self.max_sql_attempts:
+                sql_query = yield from self._repair_sql(user_instructions, tables_info, sql_query, db_error)
 
-        The function should:
-        1. Be named 'execute_sql_query'
-        2. Accept a SQLAlchemy connection object as its only parameter
-        3. Execute the SQL query directly using connection.execute()
-        4. Return the results as a pandas DataFrame using pd.DataFrame(result.fetchall(), columns=result.keys())
+        error_msg = f"SQL execution failed after {self.max_sql_attempts} attempt(s): {db_error}"
+        self._state["error"] = error_msg
+        self._state["data_sql"] = pd.DataFrame({"Error": [error_msg]})
 
-        Return ONLY the Python code without any explanations or markdown. Do not include backticks.
-        """
+    def _execute_sql(self, sql_query: str) -> str | None:
+        """Run a SQL query into the state's DataFrame, returning the database error if it fails."""
+        if self.result_cache is not None:
+            cached = self.result_cache.get(self.connection, sql_query)
+            if cached is not None:
+                self._state["data_sql"] = cached
+                self._state["used_cached_result"] = True
+                self._report_progress(f"Rows fetched: {len(cached)} (cached result)")
+                return None
 
-        function_result = self.model.invoke(function_prompt)
-        sql_function = self._extract_code_from_response(function_result.content)
-        self._state["sql_database_function"] = sql_function
+        try:
+            fetched = self._fetch(sql_query)
+        except sql.exc.ResourceClosedError:
+            # The statement ran but produced no result set to read; that is not an error to repair
+            fetched = FetchedResult(data=pd.DataFrame({"rows_affected": [-1]}), rows_affected=-1)
+        except Exception as e:
+            self._rollback()
+            # Report the driver's message rather than SQLAlchemy's wrapper around it
+            return str(getattr(e, "orig", None) or e)
+
+        self._state["data_sql"] = fetched.data
+        self._state["data_truncated"] = fetched.truncated
+        if fetched.rows_affected is not None:
+            self._report_progress(f"Rows affected: {fetched.rows_affected}")
+            # A statement without a result set may have written; drop the cached results of what it touched
+            if self.result_cache is not None:
+                self.result_cache.invalidate(tables=referenced_tables(sql_query) or None, engine=self.connection.engine)
+            return None
+
+        self._report_progress(f"Rows fetched: {fetched.n_rows}" + (" (truncated)" if fetched.truncated else ""))
+        if fetched.truncated and self.verbose:
+            print(f"Result truncated to {fetched.n_rows} rows ({fetched.nbytes} bytes)")
+        # A truncated result depends on this agent's caps, so it is not shared
+        if self.result_cache is not None and not fetched.truncated:
+            self.result_cache.put(self.connection, sql_query, fetched.data)
+        return None
+
+    def _fetch(self, sql_query: str) -> FetchedResult:
+        """Run a SQL query and fetch its result within the row and byte caps."""
+        return fetch_dataframe(
+            self.connection,
+            sql_query,
+            batch_rows=self.fetch_batch_rows,
+            max_rows=self.max_result_rows,
+            max_bytes=self.max_result_bytes,
+            dtype_backend=self.result_dtype_backend,
+        )
+
+    def _reuse_cached_sql(self, user_instructions: str) -> bool:
+        """Answer the question with the SQL of a similar earlier question, if one runs successfully."""
+        if self.question_cache is None:
+            return False
+
+        match = self.question_cache.lookup(user_instructions, self._schema_fingerprint())
+        if match is None:
+            return False
 
         if self.verbose:
-            print(f"Generated Function: {sql_function}")
+            print(f"Reusing SQL from similar question {match.question!r} (similarity {match.similarity:.2f})")
+        self._report_progress("Reusing the SQL of a similar earlier question")
+
+        if self._on_database(self._execute_sql, match.sql) is not None:
+            # The schema or data changed under the stored query; generate a fresh one
+            self.question_cache.evict(match.id)
+            return False
+
+        self._state.update(
+            {
+                "sql_query_code": match.sql,
+                "sql_attempts": 0,
+                "used_cached_sql": True,
+                "cached_sql_question": match.question,
+            }
+        )
+        return True
+
+    def _schema_snapshot(self) -> SchemaSnapshot:
+        """Return the connected database's schema from the shared schema catalog."""
+        return self._on_database(self.schema_catalog.get_schema, self.connection)
+
+    def _schema_fingerprint(self) -> str:
+        """Fingerprint of the connected database's schema."""
+        return self._schema_snapshot().fingerprint
+
+    def _executor_key(self) -> str:
+        """Return the key under which this agent's database work is limited on the database executor."""
+        return engine_cache_key(self.connection.engine)
+
+    def _on_database[T](self, func: Callable[..., T], *args: Any) -> T:
+        """Run database work in place, or on the shared database executor while ``ainvoke_agent`` runs."""
+        if self._database_loop is None:
+            return func(*args)
+        work = get_database_executor().run(self._executor_key(), func, *args)
+        return asyncio.run_coroutine_threadsafe(work, self._database_loop).result()
+
+    def _query_guidance(self) -> str:
+        """Return extra instructions for the SQL generation prompt (none for a plain database)."""
+        return ""
+
+    def _repair_sql(self, user_instructions: str, tables_info: str, sql_query: str, db_error: str) -> LLMSteps[str]:
+        """Ask the LLM to correct a SQL query given the database error it raised."""
+        repair_prompt = f"""
+        You are an expert SQL developer. The following SQL query failed.
+
+        Database schema, one table per line as name(column type, ...), where "->" marks a foreign key reference:
 
-        # Execute the SQL query directly for more control and better error handling
-        try:
-            # Direct execution approach
-            result = self.connection.execute(sql.text(sql_query))
-            df = pd.DataFrame(result.fetchall(), columns=result.keys())
-            self._state["data_sql"] = df
-        except Exception as direct_error:
-            try:
-                # Fallback to LLM-generated function if direct execution fails
-                local_namespace = {"pd": pd, "sql": sql}
+        {tables_info}
 
-                # Validate the function before execution
-                if "execute_sql_query" not in sql_function:
-                    raise ValueError("Function name 'execute_sql_query' not found in generated code")
+        Question:
+        {user_instructions}
 
-                # Execute the function code to define it
-                exec(sql_function, globals(), local_namespace)
+        Failed query:
+        {sql_query}
 
-                # Get the function from the namespace
-                execute_sql_query = local_namespace.get("execute_sql_query")
-                if not execute_sql_query:
-                    raise ValueError("Could not find execute_sql_query function after execution")
+        Database error:
+        {db_error}
+
+        Return ONLY the corrected SQL query without any explanations or markdown formatting.
+        Do not include backticks (```) or 'sql' at the beginning or end.
+        """
+        repair_result = yield repair_prompt
+        return self._extract_code_from_response(repair_result.content)
 
-                # Call the function with the connection
-                df = execute_sql_query(self.connection)
-                self._state["data_sql"] = df
-            except Exception as e:
-                error_msg = f"SQL execution failed: {str(e)}\nOriginal error: {str(direct_error)}"
-                self._state["error"] = error_msg
-                self._state["data_sql"] = pd.DataFrame({"Error": [error_msg]})
+    def _report_progress(self, message: str) -> None:
+        """Pass a progress message to the progress callback, if one is set."""
+        if self.progress is not None:
+            self.progress(message)
+
+    def _rollback(self) -> None:
+        """Roll back a failed statement so the connection can run the next attempt."""
+        try:
+            self.connection.rollback()
+        except sql.exc.SQLAlchemyError as e:
+            if self.verbose:
+                print(f"Rollback failed: {e}")
 
     def _generate_visualization(self, user_instructions: str) -> None:
         """Generate visualization based on query results and user instructions."""
+        run_llm_steps(self.model, self._generate_visualization_steps(user_instructions))
+
+    def _generate_visualization_steps(self, user_instructions: str) -> LLMSteps[None]:
+        """Run ``_generate_visualization`` as steps, yielding the LLM request."""
         if self._state["data_sql"] is None or isinstance(self._state["data_sql"], str):
             return
 
         df = self._state["data_sql"]
+        if self._reuse_cached_visualization(user_instructions, df):
+            return
 
         # Generate visualization code using LLM
         vis_prompt = f"""
@@ -275,82 +485,93 @@ class SQLDataAnalysisAgent:
         Do not include backticks (```) or 'python' at the beginning or end.
         """
 
-        vis_result = self.model.invoke(vis_prompt)
+        vis_result = yield vis_prompt
         vis_function = self._extract_code_from_response(vis_result.content)
         self._state["data_visualization_function"] = vis_function
+        self._report_progress("Visualization code generated")
 
         if self.verbose:
             print(f"Generated Visualization Function: {vis_function}")
 
         # Execute the visualization function
         try:
-            # Set up environment
-            local_namespace = {"pd": pd, "go": go, "np": None, "plt": None}
-
-            # Import optional dependencies
-            try:
-                import plotly.express as px
-
-                local_namespace["px"] = px
-            except ImportError:
-                pass
-
-            try:
-                import numpy as np
-
-                local_namespace["np"] = np
-            except ImportError:
-                pass
-
-            try:
-                import matplotlib.pyplot as plt
-
-                local_namespace["plt"] = plt
-            except ImportError:
-                pass
-
             # Validate function before execution
             if "create_visualization" not in vis_function:
                 raise ValueError("Function name 'create_visualization' not found in generated code")
 
-            # Execute the function code to define it
-            exec(vis_function, globals(), local_namespace)
-
-            # Get the function from the namespace
-            create_visualization = local_namespace.get("create_visualization")
-            if not create_visualization:
-                raise ValueError("Could not find create_visualization function after execution")
-
-            # Call the function with the DataFrame
-            fig = create_visualization(df)
-            self._state["plotly_graph"] = fig
+            self._state["plotly_graph"] = self._build_figure(vis_function, df)
+            self._report_progress("Figure built")
         except Exception as e:
             error_msg = f"Visualization creation failed: {str(e)}"
             self._state["error"] = error_msg
             if self.verbose:
                 print(error_msg)
+            return
 
-    def _get_database_schema(self) -> str:
-        """Get database schema information."""
-        inspector = sql.inspect(self.connection.engine)
-        tables = inspector.get_table_names()
+        if self.code_cache is not None:
+            self.code_cache.store(_CODE_KIND, user_instructions, layout_fingerprint(df), vis_function)
 
-        schema_info = []
-        for table in tables:
-            columns = inspector.get_columns(table)
-            col_info = [f"    - {col['name']}: {col['type']}" for col in columns]
-            schema_info.append(f"Table: {table}\nColumns:\n" + "\n".join(col_info))
+    def _reuse_cached_visualization(self, user_instructions: str, df: pd.DataFrame) -> bool:
+        """Build the figure with a function that worked for the same request and column layout, if it still works."""
+        if self.code_cache is None:
+            return False
 
-        return "\n\n".join(schema_info)
+        match = self.code_cache.lookup(_CODE_KIND, user_instructions, layout_fingerprint(df))
+        if match is None:
+            return False
+
+        try:
+            fig = self._build_figure(match.code, df)
+        except Exception as e:
+            if self.verbose:
+                print(f"Cached visualization function failed: {e}")
+            # The new result does not suit the stored function; generate a fresh one
+            self.code_cache.evict(match.id)
+            return False
+
+        self._state.update({"data_visualization_function": match.code, "used_cached_code": True, "plotly_graph": fig})
+        self._report_progress("Figure built from the function of an identical earlier request")
+        return True
+
+    def _build_figure(self, vis_function: str, df: pd.DataFrame) -> go.Figure:
+        """Define the visualization function and call it with the DataFrame, in the sandbox pool if one is set."""
+        if self.sandbox is not None:
+            fig = self.sandbox.run(vis_function, df, function_name="create_visualization")
+        else:
+            fig = run_figure_code(vis_function, df, function_name="create_visualization")
+        if not isinstance(fig, go.Figure):
+            raise TypeError("create_visualization did not return a Plotly figure")
+        return fig
+
+    def _get_database_schema(self, user_instructions: str | None = None) -> str:
+        """Get database schema information from the shared schema catalog.
+
+        With user instructions, only the relevant tables are rendered in compact
+        DDL form within the schema token budget; otherwise the full schema is listed.
+        """
+        snapshot = self._schema_snapshot()
+        if user_instructions is None:
+            return snapshot.to_prompt()
+
+        return get_schema_index(snapshot).render(
+            user_instructions, top_k=self.schema_top_k, token_budget=self.schema_token_budget
+        )
 
     def _reset_state(self) -> None:
         """Reset the agent state for a new query."""
         self._state = {
             "sql_query_code": None,
+            "sql_attempts": 0,
+            "used_cached_sql": False,
+            "cached_sql_question": None,
+            "used_cached_result": False,
+            "data_truncated": False,
             "sql_database_function": None,
             "data_sql": None,
             "data_visualization_function": None,
+            "used_cached_code": False,
             "plotly_graph": None,
+            "llm_cache": None,
             "error": None,
         }
 
@@ -381,7 +602,7 @@ class SQLDataAnalysisAgent:
         return sql_code
 
     def get_sql_database_function(self, markdown: bool = False) -> str:
-        """Get the SQL database function."""
+        """Get the SQL database function (no longer generated; SQL is executed directly)."""
         function_code = self._state.get("sql_database_function")
         if function_code and markdown:
             return f"```python\n{function_code}\n```"
@@ -409,6 +630,8 @@ class SQLDataAnalysisAgent:
 
 # Example usage
 if __name__ == "__main__":
+    from langchain_openai import ChatOpenAI
+
     # Setup
     os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY")  # Replace with your API key
 
@@ -0,0 +1,99 @@
+"""Compare the default pandas readers with the shared ingestion module on large files.
+
+Writes a CSV of roughly the requested size, plus the same table as Parquet,
+Feather and JSON Lines, then times each reader:
+
+    python benchmarks/bench_ingestion.py --size-gb 1
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+import pyarrow.feather as pa_feather
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.tools.ingestion import read_dataset
+
+
+_SELECT_ROWS = """
+    SELECT
+        i AS id,
+        i % 1000 AS customer_id,
+        (i % 12) + 1 AS month,
+        DATE '2020-01-01' + CAST(i % 1500 AS INTEGER) AS order_date,
+        CAST(i * 0.37 AS DOUBLE) AS amount,
+        CAST((i % 7) * 1.5 AS DOUBLE) AS discount,
+        'region_' || (i % 13) AS region,
+        'sku_' || (i % 5000) AS sku,
+        CASE WHEN i % 10 = 0 THEN NULL ELSE 'note ' || (i % 50) END AS note
+    FROM range({rows}) AS t(i)
+"""
+
+# Measured size of one CSV row of the table above
+_CSV_BYTES_PER_ROW = 64
+
+
+def build_fixtures(directory: str, rows: int, formats: list[str]) -> dict[str, str]:
+    """Write the benchmark table in each format and return the file paths."""
+    paths = {}
+    with duckdb.connect() as connection:
+        connection.execute(f"CREATE TABLE sales AS {_SELECT_ROWS.format(rows=rows)}")
+        paths["csv"] = os.path.join(directory, "sales.csv")
+        connection.execute(f"COPY sales TO '{paths['csv']}' (HEADER, DELIMITER ',')")
+        if "parquet" in formats:
+            paths["parquet"] = os.path.join(directory, "sales.parquet")
+            connection.execute(f"COPY sales TO '{paths['parquet']}' (FORMAT PARQUET)")
+        if "jsonl" in formats:
+            paths["jsonl"] = os.path.join(directory, "sales.jsonl")
+            connection.execute(f"COPY sales TO '{paths['jsonl']}' (FORMAT JSON)")
+        if "feather" in formats:
+            paths["feather"] = os.path.join(directory, "sales.feather")
+            pa_feather.write_feather(connection.execute("SELECT * FROM sales").arrow(), paths["feather"])
+    return paths
+
+
+def time_reader(name: str, read, repeat: int) -> None:
+    """Print the best wall time of a reader over several runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = read()
+        best = min(best, time.perf_counter() - start)
+        del frame
+    print(f"{name:<44} {best:8.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-gb", type=float, default=1.0, help="Approximate size of the CSV file")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--formats", nargs="*", default=["parquet", "feather", "jsonl"])
+    args = parser.parse_args()
+
+    rows = int(args.size_gb * 1024**3 / _CSV_BYTES_PER_ROW)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_fixtures(directory, rows, args.formats)
+        for name, path in paths.items():
+            print(f"{name:<8} {os.path.getsize(path) / 1024**3:6.2f} GB  {path}")
+        print(f"{rows} rows, {os.cpu_count()} CPUs")
+
+        time_reader("csv: pd.read_csv (current)", lambda: pd.read_csv(paths["csv"]), args.repeat)
+        time_reader("csv: read_dataset", lambda: read_dataset(paths["csv"]), args.repeat)
+        time_reader(
+            "csv: read_dataset(dtype_backend=pyarrow)",
+            lambda: read_dataset(paths["csv"], dtype_backend="pyarrow"),
+            args.repeat,
+        )
+        for name in args.formats:
+            time_reader(f"{name}: read_dataset", lambda name=name: read_dataset(paths[name]), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
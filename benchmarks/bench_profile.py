@@ -0,0 +1,83 @@
+"""Compare the per-column data summary the agents used to build with ``profile_dataframe``.
+
+Builds a frame with numeric, low-cardinality and free-text columns, then times
+the old summary loop, the first exact profile, a repeated profile of the same
+frame, a profile of an equal copy and the first approximate profile:
+
+    python benchmarks/bench_profile.py --rows 5000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.tools import data_profiler
+from app.tools.data_profiler import ApproximateProfileConfig, profile_dataframe
+
+
+def build_frame(rows: int) -> pd.DataFrame:
+    """Build a frame like an uploaded sales table: ids, amounts, a region and a sparse note."""
+    rng = np.random.default_rng(0)
+    note = pd.Series(np.char.add("note ", (np.arange(rows) % 50).astype(str)), dtype=object)
+    note[rng.random(rows) < 0.1] = None
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows, dtype=np.int64),
+            "amount": rng.gamma(2.0, 50.0, size=rows),
+            "region": pd.Series(np.char.add("region_", (np.arange(rows) % 7).astype(str)), dtype=object),
+            "note": note,
+        }
+    )
+
+
+def previous_summary(df: pd.DataFrame) -> str:
+    """Summarize columns with the loop the agents ran before ``profile_dataframe`` existed."""
+    summary = [f"DataFrame Shape: {df.shape[0]} rows, {df.shape[1]} columns", "\nColumn Information:"]
+    for col in df.columns:
+        missing = df[col].isna().sum()
+        unique_values = df[col].nunique()
+        if df[col].dtype in ["int64", "float64"]:
+            value_info = f"min={df[col].min():.2f}, max={df[col].max():.2f}, mean={df[col].mean():.2f}"
+        elif unique_values <= 10:
+            value_info = f"top values={df[col].value_counts().head(5).to_dict()}"
+        else:
+            value_info = f"unique values={unique_values}"
+        summary.append(f"- {col}: {df[col].dtype}, missing={missing} ({missing / len(df) * 100:.1f}%), {value_info}")
+    return "\n".join(summary)
+
+
+def time_call(name: str, call) -> None:
+    """Print the wall time of one call."""
+    start = time.perf_counter()
+    call()
+    print(f"{name:<44} {time.perf_counter() - start:8.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    df = build_frame(args.rows)
+    print(f"{args.rows} rows x {df.shape[1]} columns, {os.cpu_count()} CPUs")
+
+    time_call("previous summary loop", lambda: previous_summary(df))
+    time_call("profile_dataframe: first call", lambda: profile_dataframe(df).to_summary())
+    time_call("profile_dataframe: same frame again", lambda: profile_dataframe(df).to_summary())
+    copy = df.copy()
+    time_call("profile_dataframe: equal copy", lambda: profile_dataframe(copy).to_summary())
+
+    data_profiler._profiles.clear()
+    config = ApproximateProfileConfig(min_rows=1)
+    time_call("profile_dataframe(approximate): first call", lambda: profile_dataframe(df, approximate=config))
+
+
+if __name__ == "__main__":
+    main()
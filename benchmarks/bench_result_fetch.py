@@ -0,0 +1,132 @@
+"""Compare ways of materializing a large SQL result as a pandas DataFrame.
+
+Builds a local SQLite file and a DuckDB file with the same wide table, then
+times each reader on ``SELECT *``:
+
+    python benchmarks/bench_result_fetch.py --rows 2000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+import sqlalchemy as sql
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.tools.result_fetch import fetch_arrow_batches, fetch_dataframe
+
+
+try:
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+
+    HAVE_ADBC_SQLITE = True
+except ImportError:
+    HAVE_ADBC_SQLITE = False
+
+
+_CREATE_TABLE = """
+    CREATE TABLE sales AS
+    SELECT
+        i AS id,
+        i % 1000 AS customer_id,
+        i % 97 AS product_id,
+        (i % 12) + 1 AS month,
+        (i % 28) + 1 AS day,
+        i * 0.37 AS amount,
+        i * 0.05 AS tax,
+        (i % 7) * 1.5 AS discount,
+        'region_' || (i % 13) AS region,
+        'channel_' || (i % 5) AS channel,
+        'sku_' || (i % 5000) AS sku,
+        CASE WHEN i % 10 = 0 THEN NULL ELSE 'note ' || (i % 50) END AS note
+    FROM {source}
+"""
+
+
+def build_fixtures(directory: str, rows: int) -> tuple[str, str]:
+    """Create the SQLite and DuckDB databases holding the benchmark table."""
+    duckdb_path = os.path.join(directory, "bench.duckdb")
+    sqlite_path = os.path.join(directory, "bench.sqlite")
+
+    with duckdb.connect(duckdb_path) as connection:
+        connection.execute(_CREATE_TABLE.format(source=f"(SELECT range AS i FROM range({rows}))"))
+        frame = connection.execute("SELECT * FROM sales").fetch_df()
+
+    engine = sql.create_engine(f"sqlite:///{sqlite_path}")
+    frame.to_sql("sales", engine, index=False, chunksize=100_000)
+    engine.dispose()
+    return sqlite_path, duckdb_path
+
+
+def time_reader(name: str, read, repeat: int) -> None:
+    """Print the best wall time of a reader over several runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = read()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<44} {best:8.2f}s  {frame.shape[0]:>10} rows x {frame.shape[1]} cols")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_path, duckdb_path = build_fixtures(directory, args.rows)
+        query = "SELECT * FROM sales"
+
+        engine = sql.create_engine(f"sqlite:///{sqlite_path}")
+        with engine.connect() as connection:
+
+            def tuples() -> pd.DataFrame:
+                result = connection.execute(sql.text(query))
+                return pd.DataFrame(result.fetchall(), columns=result.keys())
+
+            time_reader("sqlite: fetchall() tuples", tuples, args.repeat)
+            time_reader(
+                "sqlite: streamed tuples -> Arrow",
+                lambda: fetch_dataframe(connection, query, native=False).data,
+                args.repeat,
+            )
+            time_reader(
+                "sqlite: pd.read_sql(dtype_backend=pyarrow)",
+                lambda: pd.read_sql(sql.text(query), connection, dtype_backend="pyarrow"),
+                args.repeat,
+            )
+        engine.dispose()
+
+        if HAVE_ADBC_SQLITE:
+            # ADBC as the engine's DBAPI, so queries run on pooled connections
+            engine = sql.create_engine("sqlite://", creator=lambda: adbc_sqlite.connect(sqlite_path))
+            with engine.connect() as connection:
+                time_reader("sqlite: ADBC Arrow batches", lambda: fetch_dataframe(connection, query).data, args.repeat)
+            engine.dispose()
+        else:
+            print(f"{'sqlite: ADBC Arrow batches':<44} skipped (adbc-driver-sqlite not installed)")
+
+        with duckdb.connect(duckdb_path, read_only=True) as connection:
+            time_reader(
+                "duckdb: fetchall() tuples",
+                lambda: pd.DataFrame(
+                    connection.execute(query).fetchall(), columns=[d[0] for d in connection.description]
+                ),
+                args.repeat,
+            )
+            time_reader(
+                "duckdb: native Arrow batches",
+                lambda: fetch_arrow_batches(connection.execute(query).fetch_record_batch(100_000)).data,
+                args.repeat,
+            )
+
+
+if __name__ == "__main__":
+    main()
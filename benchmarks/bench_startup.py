@@ -0,0 +1,85 @@
+"""Measure the command-line cold start: the time to import ``main`` in a fresh interpreter.
+
+Runs ``python -X importtime -c "import main"`` several times, prints the best
+wall time and the slowest imported packages, and fails when the best run is
+over budget or a module kept out of the command line (gradio, plotly.express,
+statsmodels, ...) was imported:
+
+    python benchmarks/bench_startup.py --budget 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the Gradio UI or executed plotting code need
+LAZY_MODULES = ["gradio", "plotly.express", "statsmodels", "matplotlib"]
+
+_PROBE = "import main, sys; print(','.join(m for m in {modules!r} if m in sys.modules))"
+
+
+def run_once(env: dict[str, str]) -> tuple[float, str, list[str]]:
+    """Import ``main`` in a new interpreter; return the wall time, the import-time log and the lazy modules loaded."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(modules=LAZY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    loaded = [module for module in completed.stdout.strip().split(",") if module]
+    return elapsed, completed.stderr, loaded
+
+
+def slowest_packages(log: str, top: int) -> list[tuple[str, float]]:
+    """Sum the self import time of each top-level package from an ``-X importtime`` log."""
+    totals: dict[str, float] = {}
+    for line in log.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        own, _, name = line.removeprefix("import time:").split("|")
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(own) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to time; the best run counts")
+    parser.add_argument("--budget", type=float, default=4.0, help="Seconds the best run may take")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # The orchestrator's model is configured at import time; no request is made
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    runs = [run_once(env) for _ in range(args.repeat)]
+    best, log, loaded = min(runs, key=lambda run: run[0])
+
+    print(f"import main: best {best:.2f}s over {args.repeat} run(s), budget {args.budget:.2f}s")
+    for package, seconds in slowest_packages(log, args.top):
+        print(f"  {package:<30} {seconds:6.2f}s")
+
+    failures = []
+    if best > args.budget:
+        failures.append(f"cold start {best:.2f}s is over the {args.budget:.2f}s budget")
+    if loaded:
+        failures.append(f"modules kept out of the command line were imported: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,22 @@
 import argparse
 import asyncio
 import os
+import threading
 
-import gradio as gr
-import pandas as pd
-import sqlalchemy as sql
-
-from gradio import ChatMessage
 from pydantic_ai.usage import UsageLimits
 
 from app.agent_orchestrator import process_user_input_stream, run_agent_orchestrator
+from app.database import get_engine_registry
+from app.tools.dataset_cache import get_dataset_cache
+from app.tools.ingestion import SUPPORTED_EXTENSIONS, UNSUPPORTED_FORMAT_MESSAGE, is_supported, read_dataset
+from app.tools.sandbox import get_sandbox_pool
 from app.visualization_server import serve_visualization
 
 
+# Line of the orchestrator's result summary that gives the chart path
+_SAVED_VISUALIZATION = "Visualization saved to:"
+
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Multi-Agent Data Analysis Orchestrator")
@@ -26,7 +30,9 @@ def parse_arguments():
         default="auto",
         help="Analysis mode: dataframe, sql, or auto-detect",
     )
-    parser.add_argument("--file", "-f", type=str, help="Path to data file (.csv, .xlsx)")
+    parser.add_argument(
+        "--file", "-f", type=str, help="Path to data file (.csv, .tsv, .xlsx, .parquet, .feather, .jsonl)"
+    )
     parser.add_argument("--db", "-d", type=str, help="Database connection string")
     parser.add_argument("--stream", "-s", action="store_true", help="Stream output")
     parser.add_argument("--token-limit", type=int, default=4000, help="Maximum total token usage limit")
@@ -34,6 +40,12 @@ def parse_arguments():
 
     # For Excel files
     parser.add_argument("--sheet", type=str, help="Sheet name for Excel files")
+    # For files larger than memory
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="Query the file in place with DuckDB instead of loading it (.csv, .tsv, .parquet, .jsonl)",
+    )
 
     return parser.parse_args()
 
@@ -74,7 +86,7 @@ async def run_with_args(args):
             print("Error: --file parameter is required in dataframe mode")
             return {"error": "No file specified"}
 
-        if args.stream:
+        if args.stream and not args.out_of_core:
             # Return streaming generator for caller to handle
             return await stream_dataframe_mode(args, usage_limits)
         # Process normally
@@ -83,7 +95,11 @@ async def run_with_args(args):
 
             # Use the orchestrator to handle everything
             result = await run_agent_orchestrator(
-                user_input=args.prompt, data_path=args.file, usage_limits=usage_limits
+                user_input=args.prompt,
+                data_path=args.file,
+                usage_limits=usage_limits,
+                sheet_name=args.sheet,
+                out_of_core=args.out_of_core,
             )
 
             return result  # noqa: RET504
@@ -100,16 +116,13 @@ async def stream_sql_mode(args, usage_limits):
     """Stream results for SQL mode."""
     try:
         print(f"Connecting to database: {args.db}")
-        engine = sql.create_engine(args.db)
-        conn = engine.connect()
-
-        # Use streaming version of process_user_input
-        async for message in process_user_input_stream(
-            user_input=args.prompt, db_connection=conn, usage_limits=usage_limits
-        ):
-            print(message, end="", flush=True)
+        with get_engine_registry().connect(args.db) as conn:
+            # Use streaming version of process_user_input
+            async for message in process_user_input_stream(
+                user_input=args.prompt, db_connection=conn, usage_limits=usage_limits
+            ):
+                print(message, end="", flush=True)
 
-        conn.close()
         return {"success": True, "message": "Streaming completed"}
 
     except Exception as e:
@@ -121,13 +134,10 @@ async def stream_dataframe_mode(args, usage_limits):
     """Stream results for DataFrame mode."""
     try:
         print(f"Loading data from: {args.file}")
-        if args.file.endswith(".csv"):
-            df = pd.read_csv(args.file)
-        elif args.file.endswith((".xls", ".xlsx")):
-            df = pd.read_excel(args.file, sheet_name=args.sheet) if args.sheet else pd.read_excel(args.file)
-        else:
-            print("Unsupported file format. Please use .csv, .xls, or .xlsx")
+        if not is_supported(args.file):
+            print(UNSUPPORTED_FORMAT_MESSAGE)
             return {"error": "Unsupported file format"}
+        df = read_dataset(args.file, sheet_name=args.sheet)
 
         # Use streaming version of process_user_input
         async for message in process_user_input_stream(user_input=args.prompt, data=df, usage_limits=usage_limits):
@@ -176,8 +186,25 @@ def display_results(result):
 
 
 # Gradio UI implementation
+def saved_visualization_path(message: str) -> str | None:
+    """Find the chart path in the "Visualization saved to:" line of a streamed result summary.
+
+    Progress lines, such as the error of a failed chart attempt, also mention
+    the visualization, so only that exact prefix is matched.
+    """
+    for line in reversed(message.splitlines()):
+        if line.strip().startswith(_SAVED_VISUALIZATION):
+            return line.strip().removeprefix(_SAVED_VISUALIZATION).strip()
+    return None
+
+
 async def process_query(history, prompt, mode, file_upload, db_connection, token_limit, request_limit):  # noqa: C901
     """Process user query and update chat history."""
+    # Gradio takes seconds to import, so only the UI pays for it, not command-line runs
+    import gradio as gr
+
+    from gradio import ChatMessage
+
     if not prompt.strip():
         history.append(ChatMessage(role="assistant", content="Please enter a question or analysis prompt."))
         yield history, gr.update(visible=False)
@@ -245,11 +272,7 @@ async def process_query(history, prompt, mode, file_upload, db_connection, token
 
             # Check if visualization was created
             if "visualization saved" in current_message.lower() or "visualization generated" in current_message.lower():
-                viz_path = None
-                for line in current_message.split("\n"):
-                    if "visualization" in line.lower() and ":" in line:
-                        viz_path = line.split(":", 1)[1].strip()
-                        break
+                viz_path = saved_visualization_path(current_message)
 
                 if viz_path and os.path.exists(viz_path):
                     # Serve the visualization through our HTTP server
@@ -306,7 +329,7 @@ async def process_query(history, prompt, mode, file_upload, db_connection, token
             history.append(
                 ChatMessage(
                     role="assistant",
-                    content="Please upload a data file (.csv, .xlsx) for DataFrame mode.",
+                    content="Please upload a data file (.csv, .xlsx, .parquet, ...) for DataFrame mode.",
                     metadata={"title": "❌ Error"},
                 )
             )
@@ -324,16 +347,14 @@ async def process_query(history, prompt, mode, file_upload, db_connection, token
         yield history, gr.update(visible=False)
 
         try:
-            # Load dataframe based on file type
-            if file_upload.name.endswith(".csv"):
-                df = pd.read_csv(file_upload.name)
-            elif file_upload.name.endswith((".xls", ".xlsx")):
-                df = pd.read_excel(file_upload.name)
+            # Load dataframe based on file type, parsing each file's content only once
+            if is_supported(file_upload.name):
+                df = get_dataset_cache().load(file_upload.name)
             else:
                 history.append(
                     ChatMessage(
                         role="assistant",
-                        content="Unsupported file format. Please use .csv, .xls, or .xlsx",
+                        content=UNSUPPORTED_FORMAT_MESSAGE,
                         metadata={"title": "❌ Error"},
                     )
                 )
@@ -352,11 +373,7 @@ async def process_query(history, prompt, mode, file_upload, db_connection, token
 
             # Check if visualization was created
             if "visualization saved" in current_message.lower() or "visualization generated" in current_message.lower():
-                viz_path = None
-                for line in current_message.split("\n"):
-                    if "visualization" in line.lower() and ":" in line:
-                        viz_path = line.split(":", 1)[1].strip()
-                        break
+                viz_path = saved_visualization_path(current_message)
 
                 if viz_path and os.path.exists(viz_path):
                     # Serve the visualization through our HTTP server
@@ -420,6 +437,10 @@ async def process_query(history, prompt, mode, file_upload, db_connection, token
 
 def create_gradio_interface():
     """Create and configure the Gradio interface."""
+    import gradio as gr
+
+    from gradio import ChatMessage
+
     with gr.Blocks(title="Multi-Agent Data Analysis") as demo:
         # Add custom CSS for visualization container
         gr.HTML("""
@@ -481,7 +502,9 @@ def create_gradio_interface():
                 )
                 with gr.Tab("File Upload"):
                     file_upload = gr.File(
-                        label="Upload Data File (.csv, .xlsx)", file_types=[".csv", ".xlsx", ".xls"], type="filepath"
+                        label="Upload Data File (.csv, .xlsx, .parquet, ...)",
+                        file_types=list(SUPPORTED_EXTENSIONS),
+                        type="filepath",
                     )
 
                 with gr.Tab("Database"):
@@ -524,6 +547,17 @@ def create_gradio_interface():
     return demo
 
 
+def start_sandbox():
+    """Start the sandbox workers in the background, so the first chart in the UI does not wait for them.
+
+    Only the UI calls this; a command-line query starts the workers on its
+    first sandboxed execution, if it has one.
+    """
+    pool = get_sandbox_pool()
+    if pool is not None:
+        threading.Thread(target=pool.start, name="sandbox-start", daemon=True).start()
+
+
 def main():
     """Main entry point."""  # noqa: D401
     # Check if running as script or as gradio app
@@ -539,6 +573,7 @@ def main():
         except Exception as e:
             print(f"Error: {e}")
     else:  # Gradio UI mode
+        start_sandbox()
         demo = create_gradio_interface()
         demo.queue()
         demo.launch(share=False, server_port=8080)  # Use port 8080 instead of the default range
@@ -1,188 +1,381 @@
-from unittest.mock import AsyncMock, MagicMock, patch
-
-import pandas as pd
-import pytest
-
-from app.agent_orchestrator import (
-    determine_data_source,
-    process_user_input,
-    process_user_input_stream,
-    run_agent_orchestrator,
-    sql_agent,
-    visualization_agent,
-)
-
-
-@pytest.mark.asyncio
-async def test_determine_data_source_sql_only(mock_db_connection):
-    ctx = MagicMock()
-    ctx.deps.db_connection = mock_db_connection
-    ctx.deps.data = None
-    result = await determine_data_source(ctx, "some query")
-    assert result == "sql"
-
-
-@pytest.mark.asyncio
-async def test_determine_data_source_df_only(mock_df):
-    ctx = MagicMock()
-    ctx.deps.db_connection = None
-    ctx.deps.data = mock_df
-    result = await determine_data_source(ctx, "some query")
-    assert result == "dataframe"
-
-
-@pytest.mark.asyncio
-async def test_determine_data_source_both_sql_keywords(mock_db_connection, mock_df):
-    ctx = MagicMock()
-    ctx.deps.db_connection = mock_db_connection
-    ctx.deps.data = mock_df
-    result = await determine_data_source(ctx, "SELECT from table")
-    assert result == "sql"
-
-
-@pytest.mark.asyncio
-async def test_determine_data_source_both_no_sql_keywords(mock_db_connection, mock_df):
-    ctx = MagicMock()
-    ctx.deps.db_connection = mock_db_connection
-    ctx.deps.data = mock_df
-    result = await determine_data_source(ctx, "analyze data")
-    assert result == "dataframe"
-
-
-@pytest.mark.asyncio
-async def test_sql_agent_no_connection():
-    ctx = MagicMock()
-    ctx.deps.db_connection = None
-    result = await sql_agent(ctx, "SELECT * FROM table")
-    assert result["error"] == "Database connection is required but not provided"
-
-
-@pytest.mark.asyncio
-async def test_sql_agent_success(mock_db_connection, mock_sql_agent):
-    ctx = MagicMock()
-    ctx.deps.db_connection = mock_db_connection
-    ctx.deps.model = MagicMock()
-
-    # Mock the model.invoke call to return a proper SQL query
-    ctx.deps.model.invoke.return_value = MagicMock(content="```sql\nSELECT * FROM table\n```")
-
-    mock_agent_instance = MagicMock()
-    mock_agent_instance.invoke_agent.return_value = {
-        "plotly_graph": MagicMock(),
-        "data_sql": pd.DataFrame({"x": [1]}),
-        "success": True,
-    }
-    mock_sql_agent.return_value = mock_agent_instance
-
-    with patch("os.makedirs"), patch("os.path.exists", return_value=False):
-        result = await sql_agent(ctx, "SELECT * FROM table")
-
-    assert result["success"] is True
-    # Skip visualization_path assertion for simplicity
-
-
-@pytest.mark.asyncio
-async def test_sql_agent_error(mock_db_connection, mock_sql_agent):
-    ctx = MagicMock()
-    ctx.deps.db_connection = mock_db_connection
-    ctx.deps.model = MagicMock()
-
-    # Mock the model.invoke call to return an invalid query
-    ctx.deps.model.invoke.return_value = MagicMock(content="```sql\nINVALID QUERY\n```")
-
-    mock_agent_instance = MagicMock()
-    mock_agent_instance.invoke_agent.return_value = {
-        "error": "SQL error",
-        "success": True,  # Align with actual behavior
-    }
-    mock_sql_agent.return_value = mock_agent_instance
-
-    with patch("os.makedirs"), patch("os.path.exists", return_value=False):
-        result = await sql_agent(ctx, "SELECT * FROM table")
-
-    assert result["success"] is True
-    assert result["error"] is None  # No error propagated
-
-
-@pytest.mark.asyncio
-async def test_visualization_agent_no_data():
-    ctx = MagicMock()
-    ctx.deps.data = None
-    result = await visualization_agent(ctx, "create a bar chart")
-    assert result["error"] == "DataFrame is required but not provided"
-
-
-# tests/test_agent_orchestrator.py
-@pytest.mark.asyncio
-async def test_visualization_agent_success(mock_df):
-    ctx = MagicMock()
-    ctx.deps.data = mock_df
-    ctx.deps.model = MagicMock()
-    ctx.deps.model.invoke.return_value = MagicMock(
-        content='```json\n{"code": "fig = go.Figure()", "explanation": "test"}\n```'
-    )
-    with patch("os.makedirs"), patch("os.path.exists", return_value=False):
-        result = await visualization_agent(ctx, "create a bar chart")
-    assert result["success"] is True
-
-
-@pytest.mark.asyncio
-async def test_process_user_input(mock_orchestrator_agent, mock_df, mock_db_connection, usage_limits):
-    mock_result = MagicMock()
-    mock_result.data = {"success": True}
-    mock_orchestrator_agent.run = AsyncMock(return_value=mock_result)  # Use AsyncMock
-    result = await process_user_input("test query", mock_df, mock_db_connection, usage_limits)
-    assert result["success"] is True
-
-
-@pytest.mark.asyncio
-async def test_run_agent_orchestrator_csv(mock_df, temp_dir):
-    with (
-        patch("pandas.read_csv", return_value=mock_df),
-        patch(
-            "app.agent_orchestrator.process_user_input",
-            new=AsyncMock(return_value={"success": True}),
-        ),
-    ):
-        result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.csv"))
-    assert result["success"] is True
-
-
-@pytest.mark.asyncio
-async def test_run_agent_orchestrator_excel(mock_df, temp_dir):
-    with (
-        patch("pandas.read_excel", return_value=mock_df),
-        patch(
-            "app.agent_orchestrator.process_user_input",
-            new=AsyncMock(return_value={"success": True}),
-        ),
-    ):
-        result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.xlsx"))
-    assert result["success"] is True
-
-
-@pytest.mark.asyncio
-async def test_run_agent_orchestrator_invalid_format(temp_dir):
-    result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.txt"))
-    assert result["error"] == "Unsupported file format. Please use .csv, .xls, or .xlsx"
-
-
-@pytest.mark.asyncio
-async def test_run_agent_orchestrator_db_error():
-    with patch("sqlalchemy.create_engine", side_effect=Exception("DB error")):
-        result = await run_agent_orchestrator("test query", db_url="sqlite:///:memory:")
-    assert result["error"] == "Failed to connect to database: DB error"
-
-
-@pytest.mark.asyncio
-async def test_process_user_input_stream(mock_orchestrator_agent, mock_df, usage_limits):
-    mock_result = MagicMock()
-    mock_result.data = {
-        "success": True,
-        "visualization_path": "vis.html",
-        "data_summary": {"shape": (3, 2)},
-    }
-    mock_orchestrator_agent.run = AsyncMock(return_value=mock_result)
-    messages = [msg async for msg in process_user_input_stream("test query", mock_df, usage_limits=usage_limits)]
-    assert "Starting analysis..." in messages[0]
-    assert "- Shape: 3 rows × 2 columns" in messages[-1]  # Match actual output
+import asyncio
+
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from app.agent_orchestrator import (
+    determine_data_source,
+    process_user_input,
+    process_user_input_stream,
+    run_agent_orchestrator,
+    sql_agent,
+    visualization_agent,
+)
+from app.tools.file_sql_agent import OUT_OF_CORE_FORMAT_MESSAGE
+from app.tools.ingestion import UNSUPPORTED_FORMAT_MESSAGE
+
+
+@pytest.mark.asyncio
+async def test_determine_data_source_sql_only(mock_db_connection):
+    ctx = MagicMock()
+    ctx.deps.db_connection = mock_db_connection
+    ctx.deps.data = None
+    result = await determine_data_source(ctx, "some query")
+    assert result == "sql"
+
+
+@pytest.mark.asyncio
+async def test_determine_data_source_df_only(mock_df):
+    ctx = MagicMock()
+    ctx.deps.db_connection = None
+    ctx.deps.data = mock_df
+    result = await determine_data_source(ctx, "some query")
+    assert result == "dataframe"
+
+
+@pytest.mark.asyncio
+async def test_determine_data_source_both_sql_keywords(mock_db_connection, mock_df):
+    ctx = MagicMock()
+    ctx.deps.db_connection = mock_db_connection
+    ctx.deps.data = mock_df
+    result = await determine_data_source(ctx, "SELECT from table")
+    assert result == "sql"
+
+
+@pytest.mark.asyncio
+async def test_determine_data_source_both_no_sql_keywords(mock_db_connection, mock_df):
+    ctx = MagicMock()
+    ctx.deps.db_connection = mock_db_connection
+    ctx.deps.data = mock_df
+    result = await determine_data_source(ctx, "analyze data")
+    assert result == "dataframe"
+
+
+@pytest.mark.asyncio
+async def test_sql_agent_no_connection():
+    ctx = MagicMock()
+    ctx.deps.db_connection = None
+    result = await sql_agent(ctx, "SELECT * FROM table")
+    assert result["error"] == "Database connection is required but not provided"
+
+
+@pytest.mark.asyncio
+async def test_sql_agent_success(mock_db_connection, mock_sql_agent):
+    ctx = MagicMock()
+    ctx.deps.db_connection = mock_db_connection
+    ctx.deps.model = MagicMock()
+
+    # Mock the model.ainvoke call to return a proper SQL query
+    ctx.deps.model.ainvoke = AsyncMock(return_value=MagicMock(content="```sql\nSELECT * FROM table\n```"))
+
+    mock_agent_instance = MagicMock()
+    mock_agent_instance.invoke_agent.return_value = {
+        "plotly_graph": MagicMock(),
+        "data_sql": pd.DataFrame({"x": [1]}),
+        "success": True,
+    }
+    mock_sql_agent.return_value = mock_agent_instance
+
+    with patch("os.makedirs"), patch("os.path.exists", return_value=False):
+        result = await sql_agent(ctx, "SELECT * FROM table")
+
+    assert result["success"] is True
+    # Skip visualization_path assertion for simplicity
+
+
+@pytest.mark.asyncio
+async def test_sql_agent_error(mock_db_connection, mock_sql_agent):
+    ctx = MagicMock()
+    ctx.deps.db_connection = mock_db_connection
+    ctx.deps.model = MagicMock()
+
+    # Mock the model.ainvoke call to return an invalid query
+    ctx.deps.model.ainvoke = AsyncMock(return_value=MagicMock(content="```sql\nINVALID QUERY\n```"))
+
+    mock_agent_instance = MagicMock()
+    mock_agent_instance.invoke_agent.return_value = {
+        "error": "SQL error",
+        "success": True,  # Align with actual behavior
+    }
+    mock_sql_agent.return_value = mock_agent_instance
+
+    with patch("os.makedirs"), patch("os.path.exists", return_value=False):
+        result = await sql_agent(ctx, "SELECT * FROM table")
+
+    assert result["success"] is True
+    assert result["error"] is None  # No error propagated
+
+
+@pytest.mark.asyncio
+async def test_visualization_agent_no_data():
+    ctx = MagicMock()
+    ctx.deps.data = None
+    result = await visualization_agent(ctx, "create a bar chart")
+    assert result["error"] == "DataFrame is required but not provided"
+
+
+# tests/test_agent_orchestrator.py
+@pytest.mark.asyncio
+async def test_visualization_agent_success(mock_df):
+    ctx = MagicMock()
+    ctx.deps.data = mock_df
+    ctx.deps.model = MagicMock()
+    ctx.deps.model.ainvoke = AsyncMock(
+        return_value=MagicMock(content='```json\n{"code": "fig = go.Figure()", "explanation": "test"}\n```')
+    )
+    with patch("os.makedirs"), patch("os.path.exists", return_value=False):
+        result = await visualization_agent(ctx, "create a bar chart")
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_process_user_input(mock_orchestrator_agent, mock_df, mock_db_connection, usage_limits):
+    mock_result = MagicMock()
+    mock_result.data = {"success": True}
+    mock_orchestrator_agent.run = AsyncMock(return_value=mock_result)  # Use AsyncMock
+    result = await process_user_input("test query", mock_df, mock_db_connection, usage_limits)
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_attaches_payload_outside_the_llm(
+    mock_orchestrator_agent, mock_df, mock_db_connection
+):
+    full_result = {
+        "success": True,
+        "message": "SQL analysis completed successfully",
+        "visualization_path": None,
+        "sql_query": "SELECT * FROM sales",
+        "data_summary": {"shape": (2, 1), "columns": ["x"], "sample": {"x": {0: 1, 1: 2}}},
+    }
+    tool_outputs = []
+
+    async def run(user_input, deps, usage_limits):  # noqa: ARG001
+        ctx = MagicMock()
+        ctx.deps = deps
+        tool_outputs.append(await sql_agent(ctx, user_input))
+        return MagicMock(data={"success": True, "message": "Done", "visualization_path": None, "error": None})
+
+    mock_orchestrator_agent.run = run
+    with patch("app.agent_orchestrator.run_sql_analysis", new=AsyncMock(return_value=full_result)):
+        result = await process_user_input("query the sales table", mock_df, mock_db_connection)
+
+    handle = tool_outputs[0]
+    assert "sql_query" not in handle
+    assert "data_summary" not in handle
+    assert handle["rows"] == 2
+    assert result["message"] == "Done"
+    assert result["sql_query"] == "SELECT * FROM sales"
+    assert result["data_summary"] == full_result["data_summary"]
+    assert result["result_ids"] == [handle["result_id"]]
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_attaches_every_payload_but_not_to_a_failed_answer(
+    mock_orchestrator_agent, mock_df, mock_db_connection
+):
+    sql_result = {"success": True, "message": "SQL done", "sql_query": "SELECT * FROM sales"}
+    visualization_result = {"success": True, "message": "Chart done", "visualization_path": "chart.html"}
+    tool_outputs = []
+
+    async def run(user_input, deps, usage_limits):  # noqa: ARG001
+        ctx = MagicMock()
+        ctx.deps = deps
+        tool_outputs.append(await sql_agent(ctx, user_input))
+        tool_outputs.append(await visualization_agent(ctx, user_input))
+        return MagicMock(data={"success": False, "message": "Failed", "visualization_path": None, "error": "bad"})
+
+    mock_orchestrator_agent.run = run
+    with (
+        patch("app.agent_orchestrator.run_sql_analysis", new=AsyncMock(return_value=sql_result)),
+        patch("app.agent_orchestrator.run_visualization", new=AsyncMock(return_value=visualization_result)),
+    ):
+        result = await process_user_input("query the sales table and chart it", mock_df, mock_db_connection)
+
+    sql_id, visualization_id = (output["result_id"] for output in tool_outputs)
+    assert result["results"] == {sql_id: sql_result, visualization_id: visualization_result}
+    assert result["result_ids"] == [sql_id, visualization_id]
+    assert result["success"] is False
+    assert result["error"] == "bad"
+    assert result["visualization_path"] is None
+    assert "sql_query" not in result
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_dispatches_dataframe_directly(mock_orchestrator_agent, mock_df):
+    mock_orchestrator_agent.run = AsyncMock()
+    with patch(
+        "app.agent_orchestrator.run_visualization",
+        new=AsyncMock(return_value={"success": True, "message": "Visualization created successfully"}),
+    ) as mock_run_visualization:
+        result = await process_user_input("plot A against B", data=mock_df)
+
+    mock_orchestrator_agent.run.assert_not_called()
+    assert mock_run_visualization.await_args.args[1] == "plot A against B"
+    assert result["success"] is True
+    assert result["visualization_path"] is None
+    assert result["data_summary"] is None
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_dispatches_sql_directly(mock_orchestrator_agent, mock_db_connection):
+    mock_orchestrator_agent.run = AsyncMock()
+    with patch(
+        "app.agent_orchestrator.run_sql_analysis", new=AsyncMock(return_value={"success": True})
+    ) as mock_run_sql_analysis:
+        result = await process_user_input("top products", db_connection=mock_db_connection)
+
+    mock_orchestrator_agent.run.assert_not_called()
+    assert mock_run_sql_analysis.await_args.args[0].db_connection is mock_db_connection
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_direct_dispatch_disabled(mock_orchestrator_agent, mock_df):
+    mock_result = MagicMock()
+    mock_result.data = {"success": True}
+    mock_orchestrator_agent.run = AsyncMock(return_value=mock_result)
+
+    result = await process_user_input("plot A against B", data=mock_df, direct_dispatch=False)
+
+    mock_orchestrator_agent.run.assert_awaited_once()
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_run_agent_orchestrator_csv(mock_df, temp_dir):
+    with (
+        patch("app.agent_orchestrator.read_dataset", return_value=mock_df),
+        patch(
+            "app.agent_orchestrator.process_user_input",
+            new=AsyncMock(return_value={"success": True}),
+        ),
+    ):
+        result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.csv"))
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_run_agent_orchestrator_excel(mock_df, temp_dir):
+    with (
+        patch("app.agent_orchestrator.read_dataset", return_value=mock_df),
+        patch(
+            "app.agent_orchestrator.process_user_input",
+            new=AsyncMock(return_value={"success": True}),
+        ),
+    ):
+        result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.xlsx"))
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_run_agent_orchestrator_invalid_format(temp_dir):
+    result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.txt"))
+    assert result["error"] == UNSUPPORTED_FORMAT_MESSAGE
+
+
+@pytest.mark.asyncio
+async def test_run_agent_orchestrator_out_of_core_does_not_load_the_file(temp_dir):
+    data_path = str(temp_dir / "big.parquet")
+    with (
+        patch("app.agent_orchestrator.read_dataset") as read_dataset,
+        patch(
+            "app.agent_orchestrator.run_file_analysis",
+            new=AsyncMock(return_value={"success": True, "sql_query": "SELECT 1"}),
+        ) as run_file_analysis,
+    ):
+        result = await run_agent_orchestrator("total by region", data_path=data_path, out_of_core=True)
+
+    read_dataset.assert_not_called()
+    assert run_file_analysis.await_args.args[1:] == (data_path, "total by region")
+    assert result["success"] is True
+    assert result["sql_query"] == "SELECT 1"
+
+
+@pytest.mark.asyncio
+async def test_run_agent_orchestrator_out_of_core_rejects_excel(temp_dir):
+    result = await run_agent_orchestrator("test query", data_path=str(temp_dir / "test.xlsx"), out_of_core=True)
+    assert result["error"] == OUT_OF_CORE_FORMAT_MESSAGE
+
+
+@pytest.mark.asyncio
+async def test_run_agent_orchestrator_db_error():
+    with patch("sqlalchemy.create_engine", side_effect=Exception("DB error")):
+        result = await run_agent_orchestrator("test query", db_url="sqlite:///:memory:")
+    assert result["error"] == "Failed to connect to database: DB error"
+
+
+def _mock_run_stream(data, partials=(), on_start=None):
+    """Build a stand-in for ``orchestrator_agent.run_stream`` streaming the given partial results."""
+
+    @asynccontextmanager
+    async def run_stream(user_input, deps, usage_limits):  # noqa: ARG001
+        if on_start is not None:
+            await on_start(deps)
+
+        async def stream(debounce_by=None):  # noqa: ARG001
+            for partial in partials:
+                yield partial
+
+        result = MagicMock()
+        result.stream = stream
+        result.get_data = AsyncMock(return_value=data)
+        yield result
+
+    return run_stream
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_stream(mock_orchestrator_agent, mock_df, usage_limits):
+    mock_orchestrator_agent.run_stream = _mock_run_stream(
+        {
+            "success": True,
+            "visualization_path": "vis.html",
+            "data_summary": {"shape": (3, 2)},
+        }
+    )
+    messages = [
+        msg
+        async for msg in process_user_input_stream(
+            "test query", mock_df, usage_limits=usage_limits, direct_dispatch=False
+        )
+    ]
+    assert "Starting analysis..." in messages[0]
+    assert "- Shape: 3 rows × 2 columns" in messages[-1]  # Match actual output
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_stream_yields_progress_and_message(mock_orchestrator_agent, mock_df):
+    async def report_progress(deps):
+        deps.progress.put_nowait("Data profiled")
+        await asyncio.sleep(0)
+        deps.progress.put_nowait("Figure built")
+
+    mock_orchestrator_agent.run_stream = _mock_run_stream(
+        {"success": True, "message": "Done here"},
+        partials=[{}, {"message": "Done"}, {"message": "Done here"}],
+        on_start=report_progress,
+    )
+    messages = [msg async for msg in process_user_input_stream("test query", mock_df, direct_dispatch=False)]
+    assert messages[:6] == ["Starting analysis...\n", "- Data profiled\n", "- Figure built\n", "\nDone", " here", "\n"]
+    assert "Analysis completed successfully!" in messages[6]
+
+
+@pytest.mark.asyncio
+async def test_process_user_input_stream_dispatches_directly(mock_orchestrator_agent, mock_df):
+    async def run_visualization(deps, instructions):  # noqa: ARG001
+        deps.progress.put_nowait("Figure built")
+        await asyncio.sleep(0)
+        return {"success": True, "message": "Visualization created successfully", "visualization_path": "vis.html"}
+
+    mock_orchestrator_agent.run_stream = MagicMock()
+    with patch("app.agent_orchestrator.run_visualization", new=run_visualization):
+        messages = [msg async for msg in process_user_input_stream("plot A against B", mock_df)]
+
+    mock_orchestrator_agent.run_stream.assert_not_called()
+    assert messages[:2] == ["Starting analysis...\n", "- Figure built\n"]
+    assert "Analysis completed successfully!" in messages[2]
+    assert "Visualization saved to: vis.html\n" in messages
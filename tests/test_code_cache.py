@@ -0,0 +1,123 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from app.tools.code_cache import VisualizationCodeCache, layout_fingerprint, normalize_instruction
+from app.tools.data_analyst_agent import DataVisualizationAgent
+from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+_BAR_CODE = "fig = px.bar(df, x='country', y='customers')"
+_PIE_FUNCTION = "def create_visualization(df):\n    return px.pie(df, names='country', values='customers')"
+
+
+@pytest.fixture
+def code_cache():
+    return VisualizationCodeCache()
+
+
+@pytest.fixture
+def customers():
+    return pd.DataFrame({"country": ["DE", "FR"], "customers": [3, 5]})
+
+
+def _json_response(code):
+    return MagicMock(content=f'```json\n{{"code": "{code}", "explanation": "Customers per country"}}\n```')
+
+
+def test_normalize_instruction():
+    assert normalize_instruction("  Pie chart of customers by   country? ") == "pie chart of customers by country"
+    assert normalize_instruction("Show the monthly sales.") == "show the month sales"
+
+
+def test_layout_fingerprint_ignores_values(customers):
+    assert layout_fingerprint(customers) == layout_fingerprint(customers.assign(customers=[7, 9]))
+    assert layout_fingerprint(customers) != layout_fingerprint(customers.assign(customers=[7.5, 9.5]))
+    assert layout_fingerprint(customers) != layout_fingerprint(customers.rename(columns={"country": "region"}))
+
+
+def test_lookup_matches_kind_layout_and_request(code_cache):
+    code_cache.store("create_visualization", "Pie chart of customers by country", "layout-a", "code", "why")
+
+    match = code_cache.lookup("create_visualization", "pie chart of customers by country.", "layout-a")
+    assert (match.code, match.explanation) == ("code", "why")
+    assert code_cache.lookup("visualization_code", "pie chart of customers by country", "layout-a") is None
+    assert code_cache.lookup("create_visualization", "pie chart of customers by country", "layout-b") is None
+    assert code_cache.lookup("create_visualization", "bar chart of customers by country", "layout-a") is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    code_cache = VisualizationCodeCache(max_entries=2)
+    code_cache.store("kind", "first", "layout", "1")
+    code_cache.store("kind", "second", "layout", "2")
+    code_cache.lookup("kind", "first", "layout")
+    code_cache.store("kind", "third", "layout", "3")
+
+    assert len(code_cache) == 2
+    assert code_cache.lookup("kind", "second", "layout") is None
+
+
+def test_entries_persist_in_sqlite_file(tmp_path):
+    path = str(tmp_path / "code.db")
+    VisualizationCodeCache(path).store("kind", "chart", "layout", "code")
+
+    assert VisualizationCodeCache(path).lookup("kind", "chart", "layout").code == "code"
+
+
+def test_visualization_agent_reuses_code_for_the_same_request(mock_llm, customers, code_cache):
+    mock_llm.invoke.return_value = _json_response(_BAR_CODE)
+    agent = DataVisualizationAgent(model=mock_llm, code_cache=code_cache)
+
+    agent.generate_visualization(customers, "Bar chart of customers by country")
+    response = agent.generate_visualization(customers.assign(customers=[4, 6]), "bar chart of customers by country")
+
+    assert mock_llm.invoke.call_count == 1
+    assert response["success"] is True
+    assert response["used_cached_code"] is True
+    assert response["explanation"] == "Customers per country"
+    assert list(agent.get_plotly_figure().data[0].y) == [4, 6]
+
+
+def test_visualization_agent_evicts_code_that_fails(mock_llm, customers, code_cache):
+    code_cache.store(
+        "visualization_code", "bar chart of customers", layout_fingerprint(customers), "fig = px.bar(df, x='region')"
+    )
+    mock_llm.invoke.return_value = _json_response(_BAR_CODE)
+    agent = DataVisualizationAgent(model=mock_llm, code_cache=code_cache)
+
+    response = agent.generate_visualization(customers, "bar chart of customers")
+
+    assert response["success"] is True
+    assert "used_cached_code" not in response
+    assert mock_llm.invoke.call_count == 1
+    assert code_cache.lookup("visualization_code", "bar chart of customers", layout_fingerprint(customers)).code == (
+        _BAR_CODE
+    )
+
+
+def test_sql_agent_reuses_visualization_function(mock_llm, mock_db_connection, customers, code_cache):
+    mock_llm.invoke.return_value = MagicMock(content=_PIE_FUNCTION)
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, code_cache=code_cache)
+
+    agent._state["data_sql"] = customers
+    agent._generate_visualization("pie chart of customers by country")
+    agent._reset_state()
+    agent._state["data_sql"] = customers
+    agent._generate_visualization("Pie chart of customers by country")
+
+    assert mock_llm.invoke.call_count == 1
+    assert agent._state["used_cached_code"] is True
+    assert agent._state["data_visualization_function"] == _PIE_FUNCTION
+    assert agent.get_plotly_graph() is not None
+
+
+def test_sql_agent_does_not_store_failing_functions(mock_llm, mock_db_connection, customers, code_cache):
+    mock_llm.invoke.return_value = MagicMock(content="def create_visualization(df):\n    return None")
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, code_cache=code_cache)
+
+    agent._state["data_sql"] = customers
+    agent._generate_visualization("pie chart of customers by country")
+
+    assert agent.get_error().startswith("Visualization creation failed")
+    assert len(code_cache) == 0
@@ -1,6 +1,7 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import plotly.graph_objects as go
+import pytest
 
 from app.tools.data_analyst_agent import DataVisualizationAgent
 
@@ -37,6 +38,31 @@ def test_generate_visualization_success(mock_llm, mock_df):
     assert response["success"] is True
 
 
+def test_generate_visualization_reports_progress(mock_llm, mock_df):
+    events = []
+    agent = DataVisualizationAgent(model=mock_llm, progress=events.append)
+    mock_llm.invoke.return_value = MagicMock(
+        content='```json\n{"code": "fig = go.Figure()", "explanation": "test"}\n```'
+    )
+    agent.generate_visualization(mock_df, "create a chart")
+    assert events == ["Data profiled", "Visualization code generated", "Figure built"]
+
+
+@pytest.mark.asyncio
+async def test_agenerate_visualization_uses_ainvoke(mock_llm, mock_df):
+    agent = DataVisualizationAgent(model=mock_llm)
+    mock_llm.ainvoke = AsyncMock(
+        side_effect=[
+            MagicMock(content='```json\n{"code": "x = 1", "explanation": "test"}\n```'),
+            MagicMock(content='```json\n{"code": "fig = go.Figure()", "explanation": "fixed"}\n```'),
+        ]
+    )
+    response = await agent.agenerate_visualization(mock_df, "create a chart")
+    assert response["success"] is True
+    assert mock_llm.ainvoke.await_count == 2
+    mock_llm.invoke.assert_not_called()
+
+
 def test_generate_visualization_json_error(mock_llm, mock_df):
     agent = DataVisualizationAgent(model=mock_llm)
     mock_llm.invoke.return_value = MagicMock(content="```python\nfig = go.Figure()\nfig\n```")
@@ -69,3 +95,15 @@ def test_getters(mock_llm):
     assert agent.get_visualization_code() == "test code"
     assert agent.get_visualization_code(format_markdown=True) == "```python\ntest code\n```"
     assert isinstance(agent.get_plotly_figure(), go.Figure)
+
+
+def test_generate_visualization_runs_code_in_sandbox(mock_llm, mock_df):
+    sandbox = MagicMock()
+    sandbox.run.return_value = go.Figure()
+    agent = DataVisualizationAgent(model=mock_llm, sandbox=sandbox)
+    mock_llm.invoke.return_value = MagicMock(
+        content='```json\n{"code": "fig = go.Figure()", "explanation": "test"}\n```'
+    )
+    response = agent.generate_visualization(mock_df, "create a chart")
+    assert response["success"] is True
+    sandbox.run.assert_called_once_with("fig = go.Figure()", mock_df)
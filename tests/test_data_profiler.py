@@ -0,0 +1,146 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.tools import data_profiler
+from app.tools.data_profiler import (
+    ApproximateProfileConfig,
+    dataframe_digest,
+    dataframe_fingerprint,
+    profile_dataframe,
+)
+
+
+@pytest.fixture
+def mixed_df():
+    return pd.DataFrame(
+        {
+            "amount": [1.5, 2.5, np.nan, 4.0],
+            "count": [1, 2, 3, 4],
+            "country": ["US", "US", "DE", None],
+            "id": ["a", "b", "c", "d"],
+        }
+    )
+
+
+def test_profile_matches_column_statistics(mixed_df):
+    profile = profile_dataframe(mixed_df)
+    by_name = {col.name: col for col in profile.columns}
+
+    assert (profile.n_rows, profile.n_columns) == (4, 4)
+    assert by_name["amount"].missing == 1
+    assert by_name["amount"].mean == pytest.approx(8 / 3)
+    assert by_name["count"].min == 1
+    assert by_name["country"].top_values == {"US": 2, "DE": 1}
+    assert by_name["id"].unique == 4
+
+
+def test_summary_format(mixed_df):
+    summary = profile_dataframe(mixed_df).to_summary()
+    assert "DataFrame Shape: 4 rows, 4 columns" in summary
+    assert "- amount: float64, missing=1 (25.0%), min=1.50, max=4.00, mean=2.67" in summary
+    assert "- country: object, missing=1 (25.0%), top values={'US': 2, 'DE': 1}" in summary
+
+
+def test_profile_is_memoized_by_fingerprint(mixed_df):
+    first = profile_dataframe(mixed_df)
+    assert profile_dataframe(mixed_df.copy()) is first
+
+    changed = mixed_df.copy()
+    changed.loc[0, "count"] = 100
+    assert dataframe_fingerprint(changed) != dataframe_fingerprint(mixed_df)
+    assert profile_dataframe(changed) is not first
+
+
+def test_frames_differing_outside_the_fingerprint_sample_are_profiled_separately():
+    base = pd.DataFrame({"x": np.arange(100_000, dtype="float64")})
+    changed = base.copy()
+    changed.loc[12_345, "x"] = 1e12
+    assert dataframe_fingerprint(changed) == dataframe_fingerprint(base)
+
+    profile_dataframe(base)
+    assert profile_dataframe(changed).columns[0].max == 1e12
+
+
+def test_first_profile_does_not_hash_every_row():
+    df = pd.DataFrame({"x": np.arange(50_000) * 3.0, "label": ["a", "b"] * 25_000})
+    with patch.object(data_profiler.hashlib, "blake2b", wraps=data_profiler.hashlib.blake2b) as full_hash:
+        first = profile_dataframe(df)
+        assert profile_dataframe(df) is first
+    full_hash.assert_not_called()
+
+
+def test_numeric_profile_matches_pandas():
+    df = pd.DataFrame({"x": [0.0, -0.0, 2.5, np.nan, 2.5], "n": [3, 1, 3, 2, 1]})
+    by_name = {col.name: col for col in profile_dataframe(df).columns}
+
+    for name in ("x", "n"):
+        assert (by_name[name].missing, by_name[name].unique) == (df[name].isna().sum(), df[name].nunique())
+        assert (by_name[name].min, by_name[name].max) == (df[name].min(), df[name].max())
+
+
+def test_dataframe_digest_is_remembered_per_frame(mixed_df):
+    digest = dataframe_digest(mixed_df)
+    with patch.object(data_profiler.hashlib, "blake2b", wraps=data_profiler.hashlib.blake2b) as full_hash:
+        assert dataframe_digest(mixed_df) == digest
+        assert dataframe_digest(mixed_df.copy()) == digest
+    # Only the new frame object is hashed again
+    assert full_hash.call_count == 1
+
+
+def test_wide_frames_are_profiled_in_parallel():
+    wide = pd.DataFrame(np.arange(200).reshape(5, 40), columns=[f"c{i}" for i in range(40)])
+    with patch.object(data_profiler, "ThreadPoolExecutor", wraps=data_profiler.ThreadPoolExecutor) as executor:
+        profile = profile_dataframe(wide, max_workers=4)
+    executor.assert_called_once()
+    assert [col.name for col in profile.columns] == list(wide.columns)
+
+
+def test_empty_frame():
+    summary = profile_dataframe(pd.DataFrame({"a": pd.Series([], dtype="int64")})).to_summary()
+    assert "DataFrame Shape: 0 rows, 1 columns" in summary
+
+
+def test_approximate_profile_reports_error_bounds():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "value": rng.normal(size=20_000),
+            "country": rng.choice(["US", "DE", "FR"], size=20_000),
+            "id": np.arange(20_000).astype(str),
+        }
+    )
+    config = ApproximateProfileConfig(min_rows=10_000, sample_size=2_000)
+    profile = profile_dataframe(df, approximate=config)
+    by_name = {col.name: col for col in profile.columns}
+
+    assert by_name["value"].mean == pytest.approx(df["value"].mean(), abs=0.1)
+    assert by_name["value"].quantiles[0.5] == pytest.approx(0, abs=0.1)
+    assert by_name["id"].unique == pytest.approx(20_000, rel=0.1)
+    assert by_name["country"].unique == 3
+    assert sum(by_name["country"].top_values.values()) == pytest.approx(20_000, rel=0.01)
+
+    summary = profile.to_summary()
+    assert "Approximate profile" in summary
+    assert "2000-row random sample" in summary
+    assert "min and max are the sample's extremes" in summary
+    assert "unique values≈" in summary
+
+
+def test_approximate_profile_scales_the_sample_and_skips_full_comparison():
+    df = pd.DataFrame({"value": np.arange(50_000, dtype="float64")})
+    df.loc[::10, "value"] = np.nan
+    config = ApproximateProfileConfig(min_rows=10_000, sample_size=5_000)
+
+    profile = profile_dataframe(df, approximate=config)
+    assert profile.columns[0].missing == pytest.approx(5_000, rel=0.15)
+    with patch.object(pd.DataFrame, "equals") as equals:
+        assert profile_dataframe(df.copy(), approximate=config) is not profile
+    equals.assert_not_called()
+
+
+def test_approximate_profile_skipped_for_small_frames(mixed_df):
+    profile = profile_dataframe(mixed_df, approximate=ApproximateProfileConfig())
+    assert profile.approximate is None
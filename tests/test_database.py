@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy as sql
+
+from app.database import DatabaseExecutor, EngineRegistry, get_database_executor, get_engine_registry
+
+
+def test_get_engine_reuses_engine_per_url(tmp_path):
+    registry = EngineRegistry()
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+
+    engine = registry.get_engine(url)
+
+    assert registry.get_engine(url) is engine
+    assert registry.get_engine(f"sqlite:///{tmp_path / 'b.db'}") is not engine
+    registry.dispose()
+
+
+def test_get_engine_configures_pool(tmp_path):
+    registry = EngineRegistry(pool_size=2, max_overflow=3, pool_recycle=60)
+
+    engine = registry.get_engine(f"sqlite:///{tmp_path / 'a.db'}")
+
+    assert isinstance(engine.pool, sql.pool.QueuePool)
+    assert engine.pool.size() == 2
+    assert engine.pool._max_overflow == 3
+    assert engine.pool._recycle == 60
+    assert engine.pool._pre_ping
+    registry.dispose()
+
+
+def test_memory_sqlite_skips_pool_sizing():
+    registry = EngineRegistry()
+
+    with patch("sqlalchemy.create_engine") as mock_create_engine:
+        registry.get_engine("sqlite://")
+
+    mock_create_engine.assert_called_once_with("sqlite://")
+
+
+def test_connect_returns_connection_to_pool(tmp_path):
+    registry = EngineRegistry()
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+
+    with registry.connect(url) as connection:
+        assert connection.execute(sql.text("SELECT 1")).scalar() == 1
+        assert registry.get_engine(url).pool.checkedout() == 1
+
+    assert registry.get_engine(url).pool.checkedout() == 0
+    registry.dispose()
+
+
+def test_dispose_drops_engines(tmp_path):
+    registry = EngineRegistry()
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+    engine = registry.get_engine(url)
+
+    registry.dispose(url)
+
+    assert registry.get_engine(url) is not engine
+    registry.dispose()
+
+
+def test_get_engine_registry_is_shared():
+    assert get_engine_registry() is get_engine_registry()
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_off_event_loop():
+    executor = DatabaseExecutor(max_workers=2)
+
+    result = await executor.run("db", lambda x, y=0: (threading.current_thread().name, x + y), 1, y=2)
+
+    assert result[0].startswith("db")
+    assert result[1] == 3
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_does_not_block_event_loop():
+    executor = DatabaseExecutor(max_workers=2)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    await executor.run("db", time.sleep, 0.2)
+    task.cancel()
+
+    assert ticks > 5
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_limits_concurrency_per_database():
+    executor = DatabaseExecutor(max_workers=8, max_concurrency=2)
+    running = {"busy": 0, "other": 0}
+    peak = {"busy": 0, "other": 0}
+    lock = threading.Lock()
+
+    def work(database):
+        with lock:
+            running[database] += 1
+            peak[database] = max(peak[database], running[database])
+        time.sleep(0.05)
+        with lock:
+            running[database] -= 1
+
+    start = time.perf_counter()
+    busy = [executor.run("busy", work, "busy") for _ in range(6)]
+    await asyncio.gather(*busy, executor.run("other", work, "other"))
+
+    assert peak["busy"] == 2
+    assert peak["other"] == 1
+    assert time.perf_counter() - start >= 0.15
+    executor.shutdown()
+
+
+def test_get_database_executor_is_shared():
+    assert get_database_executor() is get_database_executor()
@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from app.tools.dataset_cache import DatasetCache, file_digest, get_dataset_cache
+from app.tools.ingestion import read_dataset
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({"region": ["north", "south", "east"], "amount": [1.5, 2.5, 3.5]}).to_csv(path, index=False)
+    return path
+
+
+def _counting_loader():
+    return MagicMock(side_effect=read_dataset)
+
+
+def test_file_digest_depends_on_content_only(csv_file, tmp_path):
+    copy = tmp_path / "copy.csv"
+    copy.write_bytes(csv_file.read_bytes())
+    assert file_digest(str(copy)) == file_digest(str(csv_file))
+
+
+def test_load_parses_once(csv_file):
+    loader = _counting_loader()
+    cache = DatasetCache(loader=loader)
+
+    first = cache.load(str(csv_file))
+    second = cache.load(str(csv_file))
+
+    assert loader.call_count == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert cache.stats()["hits"] == 1
+
+
+def test_load_keys_by_content_across_paths(csv_file, tmp_path):
+    reupload = tmp_path / "upload" / "sales.csv"
+    reupload.parent.mkdir()
+    reupload.write_bytes(csv_file.read_bytes())
+    loader = _counting_loader()
+    cache = DatasetCache(loader=loader)
+
+    cache.load(str(csv_file))
+    cache.load(str(reupload))
+
+    assert loader.call_count == 1
+
+
+def test_load_reparses_changed_file(csv_file):
+    loader = _counting_loader()
+    cache = DatasetCache(loader=loader)
+
+    cache.load(str(csv_file))
+    csv_file.write_text("region,amount\nwest,9.0\n")
+
+    assert cache.load(str(csv_file))["region"].tolist() == ["west"]
+    assert loader.call_count == 2
+
+
+def test_returned_frame_changes_stay_private(csv_file):
+    cache = DatasetCache()
+
+    df = cache.load(str(csv_file))
+    df["extra"] = 1
+
+    assert "extra" not in cache.load(str(csv_file)).columns
+
+
+def test_evicted_frames_spill_to_parquet(csv_file, tmp_path):
+    other = tmp_path / "other.csv"
+    pd.DataFrame({"x": range(100)}).to_csv(other, index=False)
+    loader = _counting_loader()
+    cache = DatasetCache(memory_budget=1, directory=str(tmp_path / "spill"), loader=loader)
+
+    expected = cache.load(str(csv_file))
+    cache.load(str(other))
+
+    assert len(list((tmp_path / "spill").glob("*.parquet"))) == 1
+    pd.testing.assert_frame_equal(cache.load(str(csv_file)), expected)
+    assert loader.call_count == 2
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_spill_directory_stays_within_budget(tmp_path):
+    cache = DatasetCache(memory_budget=1, directory=str(tmp_path / "spill"), disk_budget=1)
+    for n in range(3):
+        path = tmp_path / f"data{n}.csv"
+        pd.DataFrame({"x": [n]}).to_csv(path, index=False)
+        cache.load(str(path))
+
+    assert list((tmp_path / "spill").glob("*.parquet")) == []
+
+
+def test_loader_options_are_part_of_the_key(csv_file):
+    loader = MagicMock(return_value=pd.DataFrame({"x": [1]}))
+    cache = DatasetCache(loader=loader)
+
+    cache.load(str(csv_file), sheet_name="a")
+    cache.load(str(csv_file), sheet_name="b")
+    cache.load(str(csv_file), sheet_name="a")
+
+    assert loader.call_count == 2
+
+
+def test_get_dataset_cache_is_shared():
+    assert get_dataset_cache() is get_dataset_cache()
@@ -0,0 +1,92 @@
+import os
+
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app.tools.excel_cache import ExcelCache, get_excel_cache
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "sales.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"region": ["north", "south"], "amount": [1.5, 2.5]}).to_excel(
+            writer, sheet_name="2024", index=False
+        )
+        pd.DataFrame({"region": ["east"], "amount": [3.5]}).to_excel(writer, sheet_name="2025", index=False)
+    return path
+
+
+def _count_parses():
+    return patch("app.tools.excel_cache.pd.read_excel", side_effect=pd.read_excel)
+
+
+def test_convert_writes_one_parquet_per_sheet(workbook, tmp_path):
+    cache = ExcelCache(str(tmp_path / "cache"), max_workers=1)
+
+    sheets = cache.convert(str(workbook))
+
+    assert list(sheets) == ["2024", "2025"]
+    for name, path in sheets.items():
+        pd.testing.assert_frame_equal(pd.read_parquet(path), pd.read_excel(workbook, sheet_name=name))
+
+
+def test_workbook_is_parsed_once_per_content(workbook, tmp_path):
+    directory = str(tmp_path / "cache")
+    copy = tmp_path / "upload" / "sales.xlsx"
+    copy.parent.mkdir()
+    copy.write_bytes(workbook.read_bytes())
+
+    with _count_parses() as read_excel:
+        ExcelCache(directory, max_workers=1).convert(str(workbook))
+        ExcelCache(directory, max_workers=1).sheet_path(str(copy), "2025")
+
+    assert read_excel.call_count == 2
+
+
+def test_sheet_path_defaults_to_first_sheet(workbook, tmp_path):
+    cache = ExcelCache(str(tmp_path / "cache"), max_workers=1)
+
+    assert cache.sheet_path(str(workbook)) == cache.convert(str(workbook))["2024"]
+    with pytest.raises(ValueError, match="not found"):
+        cache.sheet_path(str(workbook), "2026")
+
+
+def test_sheets_are_parsed_in_parallel_processes(workbook, tmp_path):
+    cache = ExcelCache(str(tmp_path / "cache"), max_workers=2)
+
+    sheets = cache.convert(str(workbook))
+
+    assert pd.read_parquet(sheets["2025"])["region"].tolist() == ["east"]
+
+
+def test_sheets_with_mixed_type_columns_are_left_to_the_workbook(tmp_path):
+    path = tmp_path / "mixed.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"amount": [1.5, "<5", None]}).to_excel(writer, sheet_name="mixed", index=False)
+        pd.DataFrame({"amount": [1.5, 2.5]}).to_excel(writer, sheet_name="plain", index=False)
+    cache = ExcelCache(str(tmp_path / "cache"), max_workers=1)
+
+    sheets = cache.convert(str(path))
+
+    assert sheets["mixed"] is None
+    assert pd.read_parquet(sheets["plain"])["amount"].tolist() == [1.5, 2.5]
+    # The manifest on disk records the sheet as left out too
+    assert ExcelCache(str(tmp_path / "cache"), max_workers=1).sheet_path(str(path), "mixed") is None
+
+
+def test_trim_keeps_the_latest_workbook(workbook, tmp_path):
+    other = tmp_path / "other.xlsx"
+    pd.DataFrame({"a": [1]}).to_excel(other, index=False)
+    cache = ExcelCache(str(tmp_path / "cache"), max_workers=1, disk_budget=0)
+
+    cache.convert(str(workbook))
+    sheets = cache.convert(str(other))
+
+    assert os.listdir(cache.directory) == [os.path.basename(os.path.dirname(sheets["Sheet1"]))]
+
+
+def test_get_excel_cache_is_shared():
+    assert get_excel_cache() is get_excel_cache()
@@ -0,0 +1,94 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+
+from app.tools.file_sql_agent import FileSQLAnalysisAgent, connect_file, describe_table, supports_out_of_core
+
+
+_VIS_FUNCTION = """
+def create_visualization(df):
+    return go.Figure(go.Bar(x=df["region"], y=df["total"]))
+"""
+
+
+@pytest.fixture
+def sales(tmp_path):
+    frame = pd.DataFrame({"region": ["north", "south", "north", "east"] * 250, "amount": range(1000)})
+    csv_path = tmp_path / "sales.csv"
+    parquet_path = tmp_path / "sales.parquet"
+    frame.to_csv(csv_path, index=False)
+    frame.to_parquet(parquet_path)
+    return {"csv": str(csv_path), "parquet": str(parquet_path)}
+
+
+@pytest.mark.parametrize("kind", ["csv", "parquet"])
+def test_connect_file_registers_a_view(sales, kind):
+    connection = connect_file(sales[kind])
+
+    assert connection.execute("SELECT COUNT(*), SUM(amount) FROM data").fetchone() == (1000, 499500)
+    assert [(column.name, column.type) for column in describe_table(connection, "data").tables["data"].columns] == [
+        ("region", "VARCHAR"),
+        ("amount", "BIGINT"),
+    ]
+    connection.close()
+
+
+def test_connect_file_rejects_unsupported_format(tmp_path):
+    assert not supports_out_of_core("sales.xlsx")
+    with pytest.raises(ValueError, match="Out-of-core mode supports"):
+        connect_file(str(tmp_path / "sales.xlsx"))
+
+
+def test_invoke_agent_loads_only_the_aggregated_result(mock_llm, sales):
+    agent = FileSQLAnalysisAgent(model=mock_llm, data_path=sales["parquet"], reuse_sql=False)
+    mock_llm.invoke.side_effect = [
+        MagicMock(content="SELECT region, SUM(amount) AS total FROM data GROUP BY region ORDER BY region"),
+        MagicMock(content=_VIS_FUNCTION),
+    ]
+
+    state = agent.invoke_agent("plot total amount by region", auto_display=False)
+    agent.close()
+
+    assert state["error"] is None
+    assert state["data_sql"]["region"].tolist() == ["east", "north", "south"]
+    assert state["plotly_graph"] is not None
+    prompt = mock_llm.invoke.call_args_list[0].args[0]
+    assert "data(region VARCHAR, amount BIGINT)" in prompt
+    assert "DuckDB" in prompt
+
+
+def test_invoke_agent_repairs_failed_query(mock_llm, sales):
+    agent = FileSQLAnalysisAgent(model=mock_llm, data_path=sales["csv"], reuse_sql=False)
+    mock_llm.invoke.side_effect = [
+        MagicMock(content="SELECT missing FROM data"),
+        MagicMock(content="SELECT COUNT(*) AS n FROM data"),
+    ]
+
+    state = agent.invoke_agent("count the rows", auto_display=False)
+    agent.close()
+
+    assert state["sql_attempts"] == 2
+    assert state["data_sql"]["n"].tolist() == [1000]
+
+
+def test_result_rows_are_capped(mock_llm, sales):
+    agent = FileSQLAnalysisAgent(model=mock_llm, data_path=sales["csv"], max_result_rows=10, reuse_sql=False)
+    mock_llm.invoke.side_effect = [MagicMock(content="SELECT * FROM data")]
+
+    state = agent.invoke_agent("list the rows", auto_display=False)
+    agent.close()
+
+    assert len(state["data_sql"]) == 10
+    assert state["data_truncated"] is True
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_agent(mock_llm, sales):
+    agent = FileSQLAnalysisAgent(model=mock_llm, data_path=sales["csv"], reuse_sql=False)
+    mock_llm.ainvoke = AsyncMock(return_value=MagicMock(content="SELECT MAX(amount) AS top FROM data"))
+
+    state = await agent.ainvoke_agent("what is the largest amount", auto_display=False)
+    agent.close()
+
+    assert state["data_sql"]["top"].tolist() == [999]
@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app.tools.excel_cache import ExcelCache
+from app.tools.ingestion import UNSUPPORTED_FORMAT_MESSAGE, is_supported, read_csv, read_dataset
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame(
+        {
+            "region": ["north", "south", "east", None],
+            "units": [1, 2, 3, 4],
+            "amount": [1.5, 2.5, 3.5, 4.5],
+            "order_date": ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"],
+            "empty": [None, None, None, None],
+        }
+    )
+
+
+def test_read_csv_matches_pandas(frame, tmp_path):
+    path = tmp_path / "sales.csv"
+    frame.to_csv(path, index=False)
+
+    df, expected = read_dataset(str(path)), pd.read_csv(path)
+
+    assert df.dtypes.equals(expected.dtypes)
+    # Missing strings are None rather than NaN
+    pd.testing.assert_frame_equal(df.fillna(""), expected.fillna(""))
+
+
+def test_read_tsv(frame, tmp_path):
+    path = tmp_path / "sales.tsv"
+    frame.to_csv(path, index=False, sep="\t")
+
+    df, expected = read_dataset(str(path)), pd.read_csv(path, sep="\t")
+
+    pd.testing.assert_frame_equal(df.fillna(""), expected.fillna(""))
+
+
+def test_read_csv_types_from_sample_apply_to_whole_file(tmp_path):
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({"units": range(10_000)}).to_csv(path, index=False)
+
+    df = read_csv(str(path), sample_bytes=64, block_bytes=1024)
+
+    assert df["units"].dtype == "int64"
+    assert df["units"].tolist() == list(range(10_000))
+
+
+def test_read_csv_falls_back_to_pandas_when_sample_types_do_not_hold(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text("units\n" + "1\n" * 1000 + "1.5\n")
+
+    df = read_csv(str(path), sample_bytes=64)
+
+    assert df["units"].dtype == "float64"
+    assert df["units"].iloc[-1] == 1.5
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        pytest.param(",units\n0,1\n1,2\n", id="blank-index-header"),
+        pytest.param("a,a,b\n1,2,3\n", id="duplicate-headers"),
+        pytest.param("id,units\n12345678901234567890,1\n2,2\n", id="uint64-integers"),
+        pytest.param("id\n-123456789012345678901\n2\n", id="integers-past-uint64"),
+        pytest.param("region,units\n", id="header-only"),
+    ],
+)
+def test_read_csv_matches_pandas_on_edge_cases(text, tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text(text)
+
+    pd.testing.assert_frame_equal(read_csv(str(path)), pd.read_csv(path))
+
+
+def test_read_csv_pyarrow_backend(frame, tmp_path):
+    path = tmp_path / "sales.csv"
+    frame.to_csv(path, index=False)
+
+    df = read_dataset(str(path), dtype_backend="pyarrow")
+
+    assert isinstance(df["units"].dtype, pd.ArrowDtype)
+
+
+@pytest.mark.parametrize(
+    ("name", "write"),
+    [
+        ("sales.parquet", lambda df, path: df.to_parquet(path)),
+        ("sales.feather", lambda df, path: df.to_feather(path)),
+        ("sales.jsonl", lambda df, path: df.to_json(path, orient="records", lines=True)),
+    ],
+)
+def test_read_binary_and_json_formats(frame, tmp_path, name, write):
+    frame = frame.drop(columns="empty")
+    path = tmp_path / name
+    write(frame, path)
+
+    df = read_dataset(str(path))
+
+    assert df.columns.tolist() == frame.columns.tolist()
+    assert df["units"].tolist() == frame["units"].tolist()
+    assert df["region"].tolist()[:3] == ["north", "south", "east"]
+
+
+def test_read_dataset_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported file format"):
+        read_dataset(str(tmp_path / "data.txt"))
+
+
+def test_is_supported():
+    assert is_supported("data/Sales.CSV")
+    assert is_supported("data/sales.parquet")
+    assert not is_supported("data/sales.txt")
+    assert ".jsonl" in UNSUPPORTED_FORMAT_MESSAGE
+
+
+def test_read_excel_sheet_through_conversion_cache(tmp_path):
+    path = tmp_path / "sales.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"units": [1, 2]}).to_excel(writer, sheet_name="first", index=False)
+        pd.DataFrame({"units": [3]}).to_excel(writer, sheet_name="second", index=False)
+
+    with patch("app.tools.ingestion.get_excel_cache", return_value=ExcelCache(str(tmp_path / "cache"), max_workers=1)):
+        first = read_dataset(str(path))
+        second = read_dataset(str(path), sheet_name="second")
+
+    assert first["units"].tolist() == [1, 2]
+    assert second["units"].tolist() == [3]
+
+
+def test_read_excel_keeps_mixed_type_columns_as_pandas_reads_them(tmp_path):
+    path = tmp_path / "counts.xlsx"
+    pd.DataFrame({"count": [12, "<5", 40, "see note"], "units": [1, 2, 3, 4]}).to_excel(path, index=False)
+
+    with patch("app.tools.ingestion.get_excel_cache", return_value=ExcelCache(str(tmp_path / "cache"), max_workers=1)):
+        df = read_dataset(str(path))
+
+    pd.testing.assert_frame_equal(df, pd.read_excel(path))
+    assert df["count"].tolist() == [12, "<5", 40, "see note"]
@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.tools.data_analyst_agent import DataVisualizationAgent
+from app.tools.llm_cache import (
+    CachedChatModel,
+    SQLiteResponseCache,
+    get_response_cache,
+    response_cache_key,
+    with_response_cache,
+)
+from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    return SQLiteResponseCache(str(tmp_path / "llm.sqlite"))
+
+
+def test_cache_key_covers_prompt_and_params(mock_llm):
+    messages = [SystemMessage(content="system"), HumanMessage(content="question")]
+    assert response_cache_key(mock_llm, messages) == response_cache_key(mock_llm, list(messages))
+    assert response_cache_key(mock_llm, messages) != response_cache_key(mock_llm, messages, temperature=0.5)
+    assert response_cache_key(mock_llm, "a") != response_cache_key(mock_llm, "b")
+
+
+def test_cached_model_answers_repeated_calls_from_disk(mock_llm, response_cache):
+    mock_llm.invoke.return_value = AIMessage(content="SELECT 1")
+    model = CachedChatModel(mock_llm, response_cache)
+
+    assert model.invoke("question").content == "SELECT 1"
+    # A fresh wrapper over the same file still hits
+    assert CachedChatModel(mock_llm, SQLiteResponseCache(response_cache.path)).invoke("question").content == "SELECT 1"
+    assert mock_llm.invoke.call_count == 1
+    assert model.stats() == {"hits": 0, "misses": 1}
+
+
+def test_expired_entries_are_misses(response_cache):
+    response_cache.put("key", "value")
+    response_cache.ttl = -1
+    assert response_cache.get("key") is None
+    assert len(response_cache) == 0
+
+
+def test_size_budget_evicts_least_recently_used(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "llm.sqlite"), max_bytes=10)
+    cache.put("old", "aaaa")
+    cache.put("new", "bbbb")
+    cache.get("old")
+    cache.put("newest", "cccc")
+
+    assert cache.get("new") is None
+    assert cache.get("old") == "aaaa"
+    assert cache.get("newest") == "cccc"
+
+
+def test_cache_is_opt_in(mock_llm, monkeypatch, tmp_path):
+    assert with_response_cache(mock_llm) is mock_llm
+
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    wrapped = with_response_cache(mock_llm)
+    assert isinstance(wrapped, CachedChatModel)
+    assert wrapped.cache is get_response_cache()
+
+
+def test_sql_agent_reports_cache_hits(mock_llm, mock_db_connection, response_cache):
+    mock_llm.invoke.return_value = AIMessage(content="SELECT * FROM table")
+    mock_result = MagicMock()
+    mock_result.partitions.return_value = [[(1,)]]
+    mock_result.keys.return_value = ["a"]
+    mock_db_connection.execute.return_value = mock_result
+    agent = SQLDataAnalysisAgent(
+        model=mock_llm, connection=mock_db_connection, llm_cache=response_cache, reuse_sql=False
+    )
+
+    assert agent.invoke_agent("get data", auto_display=False)["llm_cache"] == {"hits": 0, "misses": 1}
+    assert agent.invoke_agent("get data", auto_display=False)["llm_cache"] == {"hits": 1, "misses": 0}
+    assert mock_llm.invoke.call_count == 1
+
+
+def test_visualization_agent_reports_cache_hits(mock_llm, response_cache):
+    code = "fig = go.Figure()"
+    mock_llm.invoke.return_value = AIMessage(content=f'```json\n{{"code": "{code}", "explanation": "x"}}\n```')
+    agent = DataVisualizationAgent(model=mock_llm, llm_cache=response_cache, reuse_code=False)
+    df = pd.DataFrame({"a": [1, 2]})
+
+    agent.generate_visualization(df, "plot a")
+    response = agent.generate_visualization(df, "plot a")
+    assert response["success"] is True
+    assert response["llm_cache"] == {"hits": 1, "misses": 0}
@@ -0,0 +1,208 @@
+import threading
+import time
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import openai
+import pytest
+
+from langchain_core.messages import AIMessage
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+
+from app.tools.llm_client import (
+    RateLimitedChatModel,
+    RateLimitedModel,
+    RateLimiter,
+    estimate_tokens,
+    get_agent_model,
+    get_chat_model,
+)
+
+
+def _rate_limit_error(headers=None):
+    response = httpx.Response(429, headers=headers or {}, request=httpx.Request("POST", "https://api.openai.com"))
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("x" * 400) == 100
+    assert estimate_tokens([AIMessage(content="x" * 40), "y" * 40]) == 20
+
+
+def test_rate_limiter_unlimited_never_waits():
+    limiter = RateLimiter()
+    assert all(limiter.reserve(10_000) == 0 for _ in range(100))
+
+
+def test_rate_limiter_request_bucket():
+    limiter = RateLimiter(requests_per_minute=60)
+
+    delays = [limiter.reserve(1) for _ in range(62)]
+
+    assert delays[:60] == [0] * 60
+    assert delays[60] == pytest.approx(1, abs=0.05)
+    assert delays[61] == pytest.approx(2, abs=0.05)
+
+
+def test_rate_limiter_token_bucket_and_adjust():
+    limiter = RateLimiter(tokens_per_minute=6000)
+
+    assert limiter.reserve(6000) == 0
+    assert limiter.reserve(600) == pytest.approx(6, abs=0.05)
+    # The first call used far fewer tokens than reserved
+    limiter.adjust(6000, 600)
+    assert limiter.reserve(600) == pytest.approx(0, abs=0.05)
+
+
+def test_rate_limiter_metrics():
+    limiter = RateLimiter()
+    with limiter.waiting(), limiter.in_flight():
+        metrics = limiter.metrics()
+    assert metrics["queue_depth"] == 1
+    assert metrics["in_flight"] == 1
+    assert limiter.metrics()["queue_depth"] == 0
+
+
+def test_invoke_retries_rate_limit_with_retry_after(mock_llm):
+    limiter = RateLimiter()
+    mock_llm.invoke.side_effect = [_rate_limit_error({"retry-after-ms": "10"}), AIMessage(content="SELECT 1")]
+    model = RateLimitedChatModel(mock_llm, limiter)
+
+    with patch("app.tools.llm_client.time.sleep") as mock_sleep:
+        assert model.invoke("question").content == "SELECT 1"
+
+    assert mock_sleep.call_args_list[-2].args[0] == pytest.approx(0.01)
+    assert limiter.metrics()["retries"] == 1
+    assert limiter.metrics()["rate_limited"] == 1
+
+
+def test_invoke_gives_up_after_max_retries(mock_llm):
+    mock_llm.invoke.side_effect = _rate_limit_error()
+    model = RateLimitedChatModel(mock_llm, RateLimiter(), max_retries=2, base_delay=0.001)
+
+    with pytest.raises(openai.RateLimitError):
+        model.invoke("question")
+
+    assert mock_llm.invoke.call_count == 3
+
+
+def test_invoke_does_not_retry_other_errors(mock_llm):
+    mock_llm.invoke.side_effect = ValueError("bad request")
+    model = RateLimitedChatModel(mock_llm, RateLimiter())
+
+    with pytest.raises(ValueError, match="bad request"):
+        model.invoke("question")
+
+    assert mock_llm.invoke.call_count == 1
+
+
+def test_backoff_is_jittered_exponential():
+    model = RateLimitedChatModel(MagicMock(), RateLimiter(), base_delay=1, max_delay=8)
+    error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+    delays = [model._backoff(error, attempt) for attempt in range(6) for _ in range(50)]
+
+    assert all(0 <= delay <= 8 for delay in delays)
+    assert max(delays[:50]) <= 1
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_retries(mock_llm):
+    mock_llm.ainvoke = AsyncMock(side_effect=[_rate_limit_error({"retry-after": "0"}), AIMessage(content="SELECT 1")])
+    model = RateLimitedChatModel(mock_llm, RateLimiter())
+
+    assert (await model.ainvoke("question")).content == "SELECT 1"
+    assert mock_llm.ainvoke.await_count == 2
+    mock_llm.invoke.assert_not_called()
+
+
+def test_concurrent_calls_are_spaced_by_the_limiter(mock_llm):
+    limiter = RateLimiter(requests_per_minute=600)
+    # Drain the burst allowance so every call is paced at 10 per second
+    for _ in range(600):
+        limiter.reserve(1)
+    mock_llm.invoke.return_value = AIMessage(content="ok")
+    model = RateLimitedChatModel(mock_llm, limiter)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=model.invoke, args=("question",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.perf_counter() - start >= 0.25
+    assert limiter.metrics()["queue_depth"] == 0
+
+
+def test_get_chat_model_is_shared():
+    model = get_chat_model("gpt-4o")
+    assert get_chat_model("gpt-4o") is model
+    assert model.model.max_retries == 0
+
+
+def _failing_then(text, failures):
+    """Build a FunctionModel function that hits the rate limit ``failures`` times, then answers."""
+    calls = []
+
+    def respond(messages, info):  # noqa: ARG001
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ModelHTTPError(429, "gpt-4o") from _rate_limit_error({"retry-after": "0"})
+        return ModelResponse(parts=[TextPart(text)])
+
+    return respond, calls
+
+
+@pytest.mark.asyncio
+async def test_agent_model_retries_rate_limits_through_the_limiter():
+    limiter = RateLimiter()
+    respond, calls = _failing_then("done", failures=1)
+    agent = Agent(RateLimitedModel(FunctionModel(respond), limiter))
+
+    result = await agent.run("question")
+
+    assert result.data == "done"
+    assert len(calls) == 2
+    assert limiter.metrics()["requests"] == 2
+    assert limiter.metrics()["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_agent_model_gives_up_after_max_retries():
+    respond, calls = _failing_then("done", failures=5)
+    agent = Agent(RateLimitedModel(FunctionModel(respond), RateLimiter(), max_retries=1))
+
+    with pytest.raises(ModelHTTPError):
+        await agent.run("question")
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_agent_model_streams_through_the_limiter():
+    limiter = RateLimiter()
+
+    async def stream(messages, info):  # noqa: ARG001
+        yield "do"
+        yield "ne"
+
+    agent = Agent(RateLimitedModel(FunctionModel(stream_function=stream), limiter))
+
+    async with agent.run_stream("question") as result:
+        assert await result.get_data() == "done"
+
+    assert limiter.metrics()["requests"] == 1
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_get_agent_model_is_shared():
+    model = get_agent_model("gpt-4o")
+    assert get_agent_model("gpt-4o") is model
+    assert model.limiter is get_chat_model("gpt-4o").limiter
+    assert model.wrapped.client.max_retries == 0
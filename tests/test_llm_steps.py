@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.tools.llm_steps import arun_llm_steps, run_llm_steps
+
+
+def _steps(log):
+    log.append(threading.current_thread().name)
+    first = yield "first prompt"
+    second = yield f"second prompt after {first}"
+    return [first, second]
+
+
+def test_run_llm_steps_answers_with_invoke():
+    model = MagicMock()
+    model.invoke.side_effect = ["a", "b"]
+
+    assert run_llm_steps(model, _steps([])) == ["a", "b"]
+    assert [call.args[0] for call in model.invoke.call_args_list] == ["first prompt", "second prompt after a"]
+
+
+def test_run_llm_steps_without_llm_calls():
+    def steps():
+        return "done"
+        yield
+
+    assert run_llm_steps(MagicMock(), steps()) == "done"
+
+
+@pytest.mark.asyncio
+async def test_arun_llm_steps_awaits_ainvoke_off_the_loop():
+    model = MagicMock()
+    model.ainvoke = AsyncMock(side_effect=["a", "b"])
+    log = []
+
+    assert await arun_llm_steps(model, _steps(log)) == ["a", "b"]
+    assert [call.args[0] for call in model.ainvoke.await_args_list] == ["first prompt", "second prompt after a"]
+    assert log != [threading.current_thread().name]
+    model.invoke.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_arun_llm_steps_uses_run_blocking():
+    model = MagicMock()
+    model.ainvoke = AsyncMock(side_effect=["a", "b"])
+    calls = []
+
+    async def run_blocking(func):
+        calls.append(func)
+        return func()
+
+    assert await arun_llm_steps(model, _steps([]), run_blocking) == ["a", "b"]
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_arun_llm_steps_propagates_errors():
+    def steps():
+        yield "prompt"
+        raise ValueError("bad response")
+
+    model = MagicMock()
+    model.ainvoke = AsyncMock(return_value="a")
+
+    with pytest.raises(ValueError, match="bad response"):
+        await arun_llm_steps(model, steps())
+
+
+@pytest.mark.asyncio
+async def test_arun_llm_steps_runs_sessions_concurrently():
+    async def slow_ainvoke(prompt):
+        await asyncio.sleep(0.1)
+        return prompt
+
+    model = MagicMock()
+    model.ainvoke = slow_ainvoke
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.gather(*(arun_llm_steps(model, _steps([])) for _ in range(5)))
+
+    assert results[0] == ["first prompt", "second prompt after first prompt"]
+    assert loop.time() - start < 0.5
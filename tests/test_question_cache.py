@@ -0,0 +1,119 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from langchain_core.messages import AIMessage
+
+from app.tools.question_cache import QuestionSQLCache, normalize_question, question_qualifiers
+from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+@pytest.fixture
+def question_cache():
+    return QuestionSQLCache()
+
+
+def test_normalize_question_maps_synonyms():
+    assert normalize_question("Best selling 5 products") == "top sales 5 products"
+    assert normalize_question("How many orders") == "count orders"
+
+
+def test_rephrased_question_reuses_sql(question_cache):
+    question_cache.store("top 5 products by sales", "schema-a", "SELECT 1")
+
+    match = question_cache.lookup("Best selling 5 products", "schema-a")
+    assert match is not None
+    assert match.sql == "SELECT 1"
+    assert match.similarity >= question_cache.threshold
+
+
+def test_lookup_requires_same_schema_and_numbers(question_cache):
+    question_cache.store("top 5 products by sales", "schema-a", "SELECT 1")
+
+    assert question_cache.lookup("top 5 products by sales", "schema-b") is None
+    assert question_cache.lookup("top 10 products by sales", "schema-a") is None
+    assert question_cache.lookup("monthly revenue per region", "schema-a") is None
+
+
+def test_lookup_requires_same_negations_and_polarity(question_cache):
+    question_cache.store("customers who placed orders", "schema-a", "SELECT 1")
+    question_cache.store("revenue including returns", "schema-a", "SELECT 2")
+    question_cache.store("orders by total asc", "schema-a", "SELECT 3")
+
+    assert question_cache.lookup("customers who never placed orders", "schema-a") is None
+    assert question_cache.lookup("customers who haven't placed orders", "schema-a") is None
+    assert question_cache.lookup("revenue excluding returns", "schema-a") is None
+    assert question_cache.lookup("orders by total desc", "schema-a") is None
+    assert question_cache.lookup("customers who placed orders", "schema-a").sql == "SELECT 1"
+
+
+def test_question_qualifiers():
+    assert question_qualifiers("Customers who didn't order before 2020, newest first") == "before,first,newest,not"
+    assert question_qualifiers("lowest sales") == "bottom"
+
+
+def test_entries_persist_and_evict(tmp_path):
+    path = str(tmp_path / "questions.sqlite")
+    cache = QuestionSQLCache(path, max_entries=1)
+    cache.store("orders per country", "schema-a", "SELECT 1")
+    cache.store("orders per month", "schema-a", "SELECT 2")
+
+    reopened = QuestionSQLCache(path)
+    assert len(reopened) == 1
+    match = reopened.lookup("orders per month", "schema-a")
+    assert match.sql == "SELECT 2"
+
+    reopened.evict(match.id)
+    assert reopened.lookup("orders per month", "schema-a") is None
+
+
+def _successful_result():
+    result = MagicMock()
+    result.partitions.return_value = [[(1,)]]
+    result.keys.return_value = ["a"]
+    return result
+
+
+def test_agent_skips_generation_for_similar_question(mock_llm, mock_db_connection, question_cache):
+    mock_llm.invoke.return_value = AIMessage(content="SELECT * FROM table")
+    mock_db_connection.execute.return_value = _successful_result()
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, question_cache=question_cache)
+
+    first = agent.invoke_agent("top 5 products by sales", auto_display=False)
+    assert first["used_cached_sql"] is False
+
+    second = agent.invoke_agent("best selling 5 products", auto_display=False)
+    assert second["used_cached_sql"] is True
+    assert second["cached_sql_question"] == "top 5 products by sales"
+    assert second["sql_query_code"] == "SELECT * FROM table"
+    assert mock_llm.invoke.call_count == 1
+
+
+def test_agent_evicts_cached_sql_that_fails(mock_llm, mock_db_connection, question_cache):
+    mock_llm.invoke.return_value = AIMessage(content="SELECT * FROM new_table")
+    mock_db_connection.execute.side_effect = [Exception("no such table"), _successful_result()]
+    question_cache.store(
+        "top 5 products by sales",
+        SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, reuse_sql=False)._schema_fingerprint(),
+        "SELECT * FROM old_table",
+    )
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, question_cache=question_cache)
+
+    state = agent.invoke_agent("top 5 products by sales", auto_display=False)
+
+    assert state["used_cached_sql"] is False
+    assert state["sql_query_code"] == "SELECT * FROM new_table"
+    assert question_cache.lookup("top 5 products by sales", agent._schema_fingerprint()).sql == (
+        "SELECT * FROM new_table"
+    )
+
+
+def test_agent_does_not_remember_writes(mock_llm, mock_db_connection, question_cache):
+    mock_llm.invoke.return_value = AIMessage(content="DELETE FROM table")
+    mock_db_connection.execute.return_value = MagicMock(returns_rows=False, rowcount=1)
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, question_cache=question_cache)
+
+    state = agent.invoke_agent("remove the old rows", auto_display=False)
+
+    assert state["error"] is None
+    assert len(question_cache) == 0
@@ -0,0 +1,167 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+import sqlalchemy as sql
+
+from langchain_core.messages import AIMessage
+
+from app.tools.result_cache import ResultCache, is_cacheable, is_read_only, normalize_sql, referenced_tables
+from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+
+@pytest.fixture
+def sqlite_connection(tmp_path):
+    engine = sql.create_engine(f"sqlite:///{tmp_path / 'shop.db'}")
+    with engine.connect() as connection:
+        connection.execute(sql.text("CREATE TABLE orders (id INTEGER, total REAL)"))
+        connection.execute(sql.text("INSERT INTO orders VALUES (1, 9.5), (2, 20.0)"))
+        connection.commit()
+        yield connection
+    engine.dispose()
+
+
+def test_normalize_sql_ignores_formatting_but_not_literals():
+    assert normalize_sql("SELECT *\n  FROM Orders -- all\nWHERE name = 'Bob';") == (
+        "select * from orders where name = 'Bob'"
+    )
+    assert normalize_sql("select 'A'") != normalize_sql("select 'a'")
+
+
+def test_referenced_tables():
+    query = """
+        WITH recent AS (SELECT * FROM main.orders WHERE note <> 'from x')
+        SELECT * FROM recent JOIN "Customers" c ON c.id = recent.customer_id
+    """
+    assert referenced_tables(query) == {"orders", "customers"}
+
+
+def test_is_read_only():
+    assert is_read_only("SELECT REPLACE(name, 'a', 'b') FROM t")
+    assert not is_read_only("DELETE FROM t")
+    assert not is_read_only("WITH x AS (SELECT 1) INSERT INTO t SELECT * FROM x")
+    assert not is_read_only("SELECT * INTO t2 FROM t")
+    assert not is_read_only("SELECT nextval('s')")
+
+
+def test_volatile_queries_are_not_cacheable():
+    assert is_cacheable("SELECT 'now()' AS label FROM t")
+    assert not is_cacheable("SELECT random() FROM t")
+    assert not is_cacheable("SELECT * FROM t WHERE ts > NOW()")
+    assert not is_cacheable("SELECT * FROM t WHERE day = CURRENT_DATE")
+
+
+def test_databases_without_change_markers_are_only_cached_on_request():
+    engine = sql.create_engine("sqlite://")
+    with engine.connect() as connection:
+        assert not ResultCache().put(connection, "SELECT 1 AS one", pd.DataFrame({"one": [1]}))
+
+        cache = ResultCache(cache_unmarked=True)
+        assert cache.put(connection, "SELECT 1 AS one", pd.DataFrame({"one": [1]}))
+        assert cache.get(connection, "SELECT 1 AS one") is not None
+
+
+def test_postgres_results_are_only_cached_on_request():
+    connection = MagicMock()
+    connection.engine.dialect.name = "postgresql"
+    df = pd.DataFrame({"id": [1]})
+
+    # Its statistics counters lag behind writes, so they are not read as change markers
+    assert not ResultCache().put(connection, "SELECT id FROM orders", df)
+    connection.execute.assert_not_called()
+    assert ResultCache(cache_unmarked=True).put(connection, "SELECT id FROM orders", df)
+
+
+def test_cached_result_survives_reformatting(sqlite_connection):
+    cache = ResultCache()
+    df = pd.DataFrame({"id": [1, 2]})
+    assert cache.put(sqlite_connection, "SELECT id FROM orders", df)
+
+    cached = cache.get(sqlite_connection, "select id\nfrom orders;")
+    pd.testing.assert_frame_equal(cached, df)
+    assert cache.stats()["hits"] == 1
+
+
+def test_change_marker_invalidates_after_write(sqlite_connection):
+    cache = ResultCache(ttl=None)
+    cache.put(sqlite_connection, "SELECT * FROM orders", pd.DataFrame({"id": [1, 2]}))
+
+    sqlite_connection.execute(sql.text("INSERT INTO orders VALUES (3, 1.0)"))
+    sqlite_connection.commit()
+
+    assert cache.get(sqlite_connection, "SELECT * FROM orders") is None
+
+
+def test_manual_invalidation_is_per_table(sqlite_connection):
+    cache = ResultCache()
+    cache.put(sqlite_connection, "SELECT * FROM orders", pd.DataFrame({"id": [1]}))
+    cache.put(sqlite_connection, "SELECT 1 AS one FROM customers", pd.DataFrame({"one": [1]}))
+
+    assert cache.invalidate(tables={"Orders"}) == 1
+    assert cache.get(sqlite_connection, "SELECT * FROM orders") is None
+    assert cache.get(sqlite_connection, "SELECT 1 AS one FROM customers") is not None
+
+
+def test_write_statements_bust_their_tables(sqlite_connection):
+    cache = ResultCache()
+    cache.put(sqlite_connection, "SELECT * FROM orders", pd.DataFrame({"id": [1]}))
+    assert not cache.put(sqlite_connection, "UPDATE orders SET total = 0", pd.DataFrame())
+    assert cache.stats()["entries"] == 0
+
+
+def test_memory_budget_spills_to_parquet_and_reloads(sqlite_connection, tmp_path):
+    df = pd.DataFrame({"value": range(1000)})
+    cache = ResultCache(memory_budget=10_000, directory=str(tmp_path / "results"))
+    cache.put(sqlite_connection, "SELECT 1 FROM orders", df)
+    cache.put(sqlite_connection, "SELECT 2 FROM orders", df)
+
+    stats = cache.stats()
+    assert stats["memory_bytes"] <= 10_000
+    assert stats["disk_bytes"] > 0
+
+    # Another process sharing the directory reuses the spilled result
+    reopened = ResultCache(directory=str(tmp_path / "results"))
+    pd.testing.assert_frame_equal(reopened.get(sqlite_connection, "SELECT 1 FROM orders"), df)
+
+
+def test_memory_only_cache_evicts_least_recently_used(sqlite_connection):
+    df = pd.DataFrame({"value": range(1000)})
+    cache = ResultCache(memory_budget=10_000)
+    cache.put(sqlite_connection, "SELECT 1 FROM orders", df)
+    cache.put(sqlite_connection, "SELECT 2 FROM orders", df)
+
+    assert cache.get(sqlite_connection, "SELECT 1 FROM orders") is None
+    assert cache.get(sqlite_connection, "SELECT 2 FROM orders") is not None
+
+
+def test_agent_reuses_result_across_instances(mock_llm, mock_db_connection):
+    mock_llm.invoke.return_value = AIMessage(content="SELECT * FROM table")
+    result = MagicMock()
+    result.partitions.return_value = [[(1,)]]
+    result.keys.return_value = ["a"]
+    mock_db_connection.execute.return_value = result
+
+    # The mocked database has no change markers
+    cache = ResultCache(cache_unmarked=True)
+    first = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, result_cache=cache, reuse_sql=False)
+    assert first.invoke_agent("get data", auto_display=False)["used_cached_result"] is False
+    second = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, result_cache=cache, reuse_sql=False)
+    state = second.invoke_agent("get data", auto_display=False)
+
+    assert state["used_cached_result"] is True
+    assert state["data_sql"]["a"].tolist() == [1]
+    assert mock_db_connection.execute.call_count == 1
+
+
+def test_agent_write_invalidates_cached_results(mock_llm, sqlite_connection):
+    cache = ResultCache(ttl=None)
+    cache.put(sqlite_connection, "SELECT * FROM orders", pd.DataFrame({"id": [1, 2]}))
+    mock_llm.invoke.return_value = AIMessage(content="UPDATE orders SET total = 0")
+
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=sqlite_connection, result_cache=cache, reuse_sql=False)
+    state = agent.invoke_agent("zero the totals", auto_display=False)
+
+    assert state["error"] is None
+    assert state["data_sql"]["rows_affected"].tolist() == [2]
+    # The write is not committed yet, so only the explicit invalidation can drop the entry
+    assert cache.get(sqlite_connection, "SELECT * FROM orders") is None
@@ -0,0 +1,112 @@
+from unittest.mock import MagicMock, patch
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+import sqlalchemy as sql
+
+from app.tools import result_fetch
+from app.tools.result_fetch import fetch_arrow_batches, fetch_dataframe
+
+
+@pytest.fixture
+def connection():
+    engine = sql.create_engine("sqlite://")
+    with engine.connect() as connection:
+        connection.execute(sql.text("CREATE TABLE t (a INTEGER, b TEXT, c REAL, d)"))
+        connection.execute(sql.text("INSERT INTO t VALUES (1, 'x', 1.5, NULL), (2, NULL, NULL, 's'), (3, 'z', 2.5, 5)"))
+        yield connection
+
+
+def test_batches_match_fetchall(connection):
+    query = "SELECT a, b, c, d, a FROM t"
+    result = connection.execute(sql.text(query))
+    expected = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    fetched = fetch_dataframe(connection, query, batch_rows=1)
+
+    assert not fetched.truncated
+    assert list(fetched.data.columns) == ["a", "b", "c", "d", "a"]
+    assert fetched.data.dtypes.tolist() == expected.dtypes.tolist()
+    pd.testing.assert_frame_equal(fetched.data, expected, check_dtype=False)
+
+
+def test_row_cap_reports_truncation(connection):
+    fetched = fetch_dataframe(connection, "SELECT a FROM t ORDER BY a", batch_rows=2, max_rows=2)
+    assert fetched.data["a"].tolist() == [1, 2]
+    assert fetched.truncated
+
+
+def test_cap_on_batch_boundary_without_more_rows_is_not_truncated(connection):
+    fetched = fetch_dataframe(connection, "SELECT a FROM t", batch_rows=1, max_rows=3)
+    assert fetched.n_rows == 3
+    assert not fetched.truncated
+
+
+def test_byte_cap(connection):
+    fetched = fetch_dataframe(connection, "SELECT a FROM t", batch_rows=1, max_bytes=1)
+    assert fetched.n_rows == 1
+    assert fetched.truncated
+
+
+def test_empty_result_keeps_columns(connection):
+    fetched = fetch_dataframe(connection, "SELECT a, b FROM t WHERE 0")
+    assert list(fetched.data.columns) == ["a", "b"]
+    assert fetched.data.empty
+
+
+def test_statement_without_result_set_reports_rows_affected(connection):
+    fetched = fetch_dataframe(connection, "UPDATE t SET c = 0 WHERE a > 1")
+    assert fetched.rows_affected == 2
+    assert fetched.data["rows_affected"].tolist() == [2]
+
+
+def test_pyarrow_dtype_backend(connection):
+    fetched = fetch_dataframe(connection, "SELECT a, b FROM t", dtype_backend="pyarrow")
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in fetched.data.dtypes)
+
+
+def test_native_arrow_batches_with_caps():
+    duckdb_connection = duckdb.connect()
+    reader = duckdb_connection.execute("SELECT range AS a FROM range(10)").fetch_record_batch(4)
+
+    fetched = fetch_arrow_batches(reader, max_rows=6)
+
+    assert fetched.reader == "arrow"
+    assert fetched.data["a"].tolist() == list(range(6))
+    assert fetched.truncated
+
+
+class _ArrowDriverConnection:
+    """Stand-in for an ADBC DBAPI connection, whose cursors return Arrow batches."""
+
+    __module__ = "adbc_driver_sqlite.dbapi"
+
+    def __init__(self):
+        self.duckdb = duckdb.connect()
+
+    def cursor(self):
+        return self.duckdb.cursor()
+
+
+def test_native_reader_runs_on_the_pooled_dbapi_connection():
+    connection = MagicMock(spec=sql.engine.base.Connection)
+    connection.engine = MagicMock(spec=sql.engine.Engine)
+    connection.connection.dbapi_connection = _ArrowDriverConnection()
+
+    fetched = fetch_dataframe(connection, "SELECT range AS a FROM range(3)")
+
+    assert fetched.reader == "arrow"
+    assert fetched.data["a"].tolist() == [0, 1, 2]
+    connection.execute.assert_not_called()
+
+
+def test_native_reader_errors_fall_back_to_tuples(connection):
+    with patch.object(result_fetch, "_open_native_reader", side_effect=pa.ArrowInvalid("mixed column types")):
+        fetched = fetch_dataframe(connection, "SELECT a FROM t ORDER BY a")
+        assert fetched.reader == "tuples"
+        assert fetched.data["a"].tolist() == [1, 2, 3]
+
+        with pytest.raises(pa.ArrowInvalid):
+            fetch_dataframe(connection, "UPDATE t SET c = 0")
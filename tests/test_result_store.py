@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from app.tools.result_store import ResultStore, get_result_store, result_handle
+
+
+def test_put_and_get():
+    store = ResultStore()
+    result_id = store.put({"sql_query": "SELECT 1"})
+    assert store.get(result_id) == {"sql_query": "SELECT 1"}
+    assert store.get("unknown") is None
+
+
+def test_entries_expire():
+    store = ResultStore(ttl=10)
+    with patch("app.tools.result_store.time.monotonic", return_value=100.0):
+        result_id = store.put({"x": 1})
+    with patch("app.tools.result_store.time.monotonic", return_value=111.0):
+        assert store.get(result_id) is None
+    assert len(store) == 0
+
+
+def test_oldest_entries_are_dropped():
+    store = ResultStore(max_entries=2)
+    first, second, third = (store.put({"n": n}) for n in range(3))
+    assert store.get(first) is None
+    assert store.get(second) == {"n": 1}
+    assert store.get(third) == {"n": 2}
+
+
+def test_result_handle_is_compact():
+    result = {
+        "success": True,
+        "message": "SQL analysis completed successfully",
+        "visualization_path": "visualizations/analysis_result.html",
+        "sql_query": "SELECT * FROM sales",
+        "data_summary": {"shape": (120, 4), "columns": ["a", "b", "c", "d"], "sample": {"a": {0: 1}}},
+    }
+    assert result_handle("abc", result) == {
+        "success": True,
+        "message": "SQL analysis completed successfully",
+        "result_id": "abc",
+        "has_visualization": True,
+        "rows": 120,
+        "columns": 4,
+    }
+
+
+def test_get_result_store_is_shared():
+    assert get_result_store() is get_result_store()
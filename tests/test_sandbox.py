@@ -0,0 +1,132 @@
+import os
+
+from collections import OrderedDict
+from unittest.mock import patch
+
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from app.tools import sandbox
+from app.tools.sandbox import SandboxError, SandboxPool, get_sandbox_pool, run_figure_code
+from app.tools.shared_frames import SharedFrameStore
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(size=1, timeout=5, max_memory=256 * 1024 * 1024)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"region": ["north", "south"], "amount": [1.5, 2.5]})
+
+
+def test_run_figure_code_returns_the_figure(df):
+    figure = run_figure_code("fig = px.bar(df, x='region', y='amount')", df)
+    assert isinstance(figure, go.Figure)
+
+
+def test_run_figure_code_calls_the_function(df):
+    code = "def create_visualization(data):\n    return go.Figure(go.Bar(x=data['region'], y=data['amount']))"
+    figure = run_figure_code(code, df, function_name="create_visualization")
+    assert list(figure.data[0].x) == ["north", "south"]
+
+
+def test_run_figure_code_without_function(df):
+    with pytest.raises(ValueError, match="Could not find create_visualization"):
+        run_figure_code("x = 1", df, function_name="create_visualization")
+
+
+def test_pool_runs_code_in_a_worker(pool, df):
+    figure = pool.run("fig = go.Figure(go.Bar(x=df['region'], y=df['amount']))", df)
+    assert list(figure.data[0].x) == ["north", "south"]
+    assert pool.run("x = 1", df) is None
+
+
+def test_pool_reports_code_errors_without_restarting(pool, df):
+    restarts = pool.restarts
+    with pytest.raises(SandboxError, match="division by zero"):
+        pool.run("1 / 0", df)
+    assert pool.restarts == restarts
+
+
+def test_pool_kills_code_past_its_timeout_and_refills(pool, df):
+    restarts = pool.restarts
+    with pytest.raises(SandboxError, match="timed out"):
+        pool.run("while True:\n    pass", df, timeout=0.5)
+    assert pool.restarts == restarts + 1
+    assert isinstance(pool.run("fig = go.Figure()", df), go.Figure)
+
+
+def test_pool_enforces_the_memory_limit(pool, df):
+    with pytest.raises(SandboxError):
+        pool.run("block = np.ones(100_000_000)", df)
+    assert isinstance(pool.run("fig = go.Figure()", df), go.Figure)
+
+
+def test_pool_replaces_crashed_workers(pool, df):
+    restarts = pool.restarts
+    with pytest.raises(SandboxError, match="crashed"):
+        pool.run("import os\nos._exit(1)", df)
+    assert pool.restarts == restarts + 1
+    assert isinstance(pool.run("fig = go.Figure()", df), go.Figure)
+
+
+def test_pool_publishes_each_frame_once(pool, df):
+    df = df.assign(amount=[10.0, 20.0])
+    with patch.object(pool.frames, "_write", wraps=pool.frames._write) as write:
+        pool.run("fig = go.Figure(go.Bar(x=df['region'], y=df['amount']))", df)
+        figure = pool.run("fig = go.Figure(go.Bar(x=df['region'], y=df['amount'] * 2))", df.copy())
+
+    assert write.call_count == 1
+    assert list(figure.data[0].x) == ["north", "south"]
+
+
+def test_code_cannot_change_the_shared_frame(pool, df):
+    pool.run("df['amount'] = 0\ndf.loc[0, 'region'] = 'west'", df)
+
+    figure = pool.run("fig = go.Figure(go.Bar(x=df['region'], y=df['amount']))", df)
+    assert list(figure.data[0].x) == ["north", "south"]
+
+
+def test_pool_pickles_frames_arrow_cannot_store(pool):
+    mixed = pd.DataFrame({"region": ["north", 2], "amount": [1.5, 2.5]})
+
+    figure = pool.run("fig = go.Figure(go.Bar(x=df['region'].astype(str), y=df['amount']))", mixed)
+
+    assert list(figure.data[0].x) == ["north", "2"]
+
+
+def test_address_space_limit_follows_the_attached_frames(tmp_path):
+    store = SharedFrameStore(str(tmp_path / "frames"))
+    paths = [store.publish(pd.DataFrame({"amount": [float(i)] * (i + 1) * 1000})) for i in range(3)]
+    sizes = [os.path.getsize(path) for path in paths]
+    attached = OrderedDict()
+
+    with patch.object(sandbox, "_limit_address_space") as limit_address_space:
+        for path in paths:
+            sandbox._attach(path, attached, 1000)
+
+    # Two frames stay attached; the limit drops again once the oldest is detached
+    limits = [call.args[0] for call in limit_address_space.call_args_list]
+    assert limits == [1000 + sizes[0], 1000 + sizes[0] + sizes[1], 1000 + sizes[1] + sizes[2]]
+    store.close()
+
+
+def test_pool_can_be_started_ahead_of_use(df):
+    pool = SandboxPool(size=1, timeout=5)
+    pool.start()
+    pool.start()
+    assert len(pool._workers) == 1
+    assert isinstance(pool.run("fig = go.Figure()", df), go.Figure)
+    pool.close()
+    with pytest.raises(SandboxError, match="closed"):
+        pool.start()
+
+
+def test_get_sandbox_pool_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("SANDBOX_WORKERS", "0")
+    assert get_sandbox_pool() is None
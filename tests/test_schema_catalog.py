@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+
+import pytest
+import sqlalchemy as sql
+
+from app.tools.schema_catalog import SchemaCatalog, engine_cache_key
+
+
+@pytest.fixture
+def sqlite_connection():
+    engine = sql.create_engine("sqlite://")
+    connection = engine.connect()
+    connection.exec_driver_sql("CREATE TABLE customers (id INTEGER PRIMARY KEY, country TEXT)")
+    connection.exec_driver_sql(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), total REAL)"
+    )
+    yield connection
+    connection.close()
+
+
+def test_bulk_reflection_sqlite(sqlite_connection):
+    snapshot = SchemaCatalog().get_schema(sqlite_connection)
+    assert list(snapshot.tables) == ["customers", "orders"]
+    assert [col.name for col in snapshot.tables["orders"].columns] == ["id", "customer_id", "total"]
+    assert snapshot.tables["orders"].foreign_keys[0].referred_table == "customers"
+    assert "Table: orders" in snapshot.to_prompt()
+    assert "customer_id: INTEGER" in snapshot.to_prompt()
+
+
+def test_cached_until_schema_changes(sqlite_connection):
+    catalog = SchemaCatalog()
+    first = catalog.get_schema(sqlite_connection)
+    assert catalog.get_schema(sqlite_connection) is first
+
+    sqlite_connection.exec_driver_sql("ALTER TABLE customers ADD COLUMN name TEXT")
+    refreshed = catalog.get_schema(sqlite_connection)
+    assert refreshed is not first
+    assert refreshed.fingerprint != first.fingerprint
+    assert "name: TEXT" in refreshed.to_prompt()
+
+
+def test_invalidate_forces_reflection(sqlite_connection):
+    catalog = SchemaCatalog()
+    first = catalog.get_schema(sqlite_connection)
+    catalog.invalidate(sqlite_connection.engine)
+    assert catalog.get_schema(sqlite_connection) is not first
+
+
+def test_ttl_used_without_version_probe(mock_db_connection):
+    catalog = SchemaCatalog(ttl=0)
+    first = catalog.get_schema(mock_db_connection)
+    assert catalog.get_schema(mock_db_connection) is not first
+
+    catalog = SchemaCatalog(ttl=None)
+    first = catalog.get_schema(mock_db_connection)
+    assert catalog.get_schema(mock_db_connection) is first
+
+
+def test_engine_cache_key():
+    file_engine = sql.create_engine("sqlite:///data.db")
+    assert engine_cache_key(file_engine) == engine_cache_key(sql.create_engine("sqlite:///data.db"))
+    assert engine_cache_key(sql.create_engine("sqlite://")) != engine_cache_key(sql.create_engine("sqlite://"))
+    assert engine_cache_key(MagicMock(spec=sql.engine.Engine)).startswith("engine-")
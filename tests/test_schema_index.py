@@ -0,0 +1,90 @@
+import pytest
+
+from app.tools.embeddings import embed_text, tokenize
+from app.tools.schema_catalog import ColumnInfo, ForeignKey, SchemaSnapshot, TableInfo
+from app.tools.schema_index import SchemaIndex, estimate_tokens, get_schema_index, render_table_ddl
+
+
+@pytest.fixture
+def wide_snapshot():
+    tables = {
+        "customers": TableInfo(
+            name="customers",
+            columns=[ColumnInfo("id", "INTEGER"), ColumnInfo("country", "TEXT")],
+        ),
+        "orders": TableInfo(
+            name="orders",
+            columns=[ColumnInfo("id", "INTEGER"), ColumnInfo("customer_id", "INTEGER"), ColumnInfo("total", "REAL")],
+            foreign_keys=[ForeignKey("customer_id", "customers", "id")],
+        ),
+        "products": TableInfo(
+            name="products",
+            columns=[ColumnInfo("id", "INTEGER"), ColumnInfo("productName", "TEXT", comment="Display name")],
+            comment="Catalog items",
+        ),
+    }
+    for i in range(200):
+        tables[f"audit_log_{i}"] = TableInfo(
+            name=f"audit_log_{i}",
+            columns=[ColumnInfo("event_id", "INTEGER"), ColumnInfo("payload", "TEXT")],
+        )
+    return SchemaSnapshot(tables=tables)
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("productName customer_id Categories") == ["product", "name", "customer", "id", "category"]
+
+
+def test_embed_text_is_stable_and_normalized():
+    vector = embed_text("top selling products")
+    assert vector.shape == (512,)
+    assert vector.dot(vector) == pytest.approx(1.0)
+    assert (embed_text("top selling products") == vector).all()
+
+
+def test_render_table_ddl(wide_snapshot):
+    assert render_table_ddl(wide_snapshot.tables["orders"]) == (
+        "orders(id INTEGER, customer_id INTEGER -> customers.id, total REAL)"
+    )
+    assert render_table_ddl(wide_snapshot.tables["products"], max_columns=1) == (
+        "products(id INTEGER, ... 1 more) -- Catalog items"
+    )
+
+
+def test_rank_prefers_matching_tables(wide_snapshot):
+    ranked = SchemaIndex(wide_snapshot).rank("Which product names are most popular?")
+    assert ranked[0][0] == "products"
+
+
+def test_select_tables_adds_foreign_key_neighbours(wide_snapshot):
+    selected = SchemaIndex(wide_snapshot).select_tables("total order value", top_k=1)
+    assert selected == ["orders", "customers"]
+
+
+def test_render_respects_token_budget(wide_snapshot):
+    index = SchemaIndex(wide_snapshot)
+    schema = index.render("orders per country", top_k=2, token_budget=60)
+    assert estimate_tokens(schema) <= 60
+    assert schema.splitlines()[0].startswith("orders(") or schema.splitlines()[0].startswith("customers(")
+    assert "audit_log" not in schema
+
+
+def test_render_small_schema_keeps_all_tables(wide_snapshot):
+    small = SchemaSnapshot(tables={name: wide_snapshot.tables[name] for name in ("customers", "orders")})
+    schema = SchemaIndex(small).render("anything", token_budget=2000)
+    assert len(schema.splitlines()) == 2
+
+
+def test_get_schema_index_is_cached(wide_snapshot):
+    assert get_schema_index(wide_snapshot) is get_schema_index(wide_snapshot)
+
+
+def test_same_layout_with_different_foreign_keys_gets_its_own_index(wide_snapshot):
+    tables = dict(wide_snapshot.tables)
+    tables["orders"] = TableInfo(name="orders", columns=tables["orders"].columns)
+    without_keys = SchemaSnapshot(tables=tables)
+    assert without_keys.fingerprint == wide_snapshot.fingerprint
+
+    schema = get_schema_index(without_keys).render("orders total", token_budget=2000)
+    assert get_schema_index(without_keys) is not get_schema_index(wide_snapshot)
+    assert "customers" not in next(line for line in schema.splitlines() if line.startswith("orders"))
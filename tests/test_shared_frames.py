@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.tools.shared_frames import SharedFrameStore, attach_frame
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedFrameStore(str(tmp_path / "frames"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"region": ["north", "south", "east"], "amount": [1.5, 2.5, 3.5]}, index=[10, 20, 30])
+
+
+def test_attach_frame_round_trips_the_dataframe(store, df):
+    path = store.publish(df)
+
+    pd.testing.assert_frame_equal(attach_frame(path), df)
+
+
+def test_attached_numeric_columns_map_the_file(store, df):
+    attached = attach_frame(store.publish(df))
+
+    # A read-only array is a view of the mapping rather than a copy
+    assert not attached["amount"].to_numpy().flags.writeable
+
+
+def test_each_frame_is_written_once(store, df):
+    first = store.publish(df)
+    written = os.stat(first).st_mtime_ns
+
+    assert store.publish(df.copy()) == first
+    assert os.stat(first).st_mtime_ns == written
+    assert store.publish(df.assign(amount=0.0)) != first
+
+
+def test_frames_differing_outside_the_fingerprint_sample_get_their_own_file(store):
+    first = pd.DataFrame({"amount": range(100_000)})
+    second = first.copy()
+    second.loc[50_001, "amount"] = -1
+
+    path = store.publish(second)
+    assert store.publish(first) != path
+    assert attach_frame(path)["amount"].iloc[50_001] == -1
+
+
+def test_unconvertible_frames_are_not_published(store):
+    assert store.publish(pd.DataFrame({"mixed": [1, "a", 2.5]})) is None
+
+
+def test_trim_keeps_pinned_frames(tmp_path, df):
+    store = SharedFrameStore(str(tmp_path / "frames"), budget=0)
+    first = store.publish(df)
+    second = store.publish(df.assign(amount=0.0))
+
+    assert os.path.exists(first)
+    store.release(first)
+    store.release(second)
+    third = store.publish(df.assign(amount=1.0))
+
+    assert not os.path.exists(first)
+    assert not os.path.exists(second)
+    assert os.path.exists(third)
+    store.close()
+    assert not os.path.exists(third)
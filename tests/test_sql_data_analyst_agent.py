@@ -1,7 +1,9 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pandas as pd
+import plotly.graph_objects as go
 import pytest
+import sqlalchemy as sql
 
 from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
 
@@ -54,29 +56,113 @@ def test_extract_code_from_response_plain():
 
 def test_generate_and_execute_sql_success(mock_llm, mock_db_connection):
     agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection)
-    mock_llm.invoke.side_effect = [
-        MagicMock(content="SELECT * FROM table"),
-        MagicMock(
-            content="def execute_sql_query(connection):\n    result = connection.execute(sql.text('SELECT * FROM table'))\n    return pd.DataFrame(result.fetchall(), columns=result.keys())"
-        ),
-    ]
+    mock_llm.invoke.side_effect = [MagicMock(content="SELECT * FROM table")]
     mock_result = MagicMock()
-    mock_result.fetchall.return_value = [(1, 2)]
+    mock_result.partitions.return_value = [[(1, 2)]]
     mock_result.keys.return_value = ["a", "b"]
     mock_db_connection.execute.return_value = mock_result
     agent._generate_and_execute_sql("get data", {"needs_visualization": False})
     assert isinstance(agent.get_data_sql(), pd.DataFrame)
+    assert mock_llm.invoke.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_agent_uses_ainvoke(mock_llm, mock_db_connection):
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, reuse_sql=False)
+    mock_llm.ainvoke = AsyncMock(return_value=MagicMock(content="SELECT * FROM table"))
+    mock_result = MagicMock()
+    mock_result.partitions.return_value = [[(1, 2)]]
+    mock_result.keys.return_value = ["a", "b"]
+    mock_db_connection.execute.return_value = mock_result
+
+    state = await agent.ainvoke_agent("get data", auto_display=False)
+
+    assert state["sql_query_code"] == "SELECT * FROM table"
+    assert state["data_sql"].to_dict("list") == {"a": [1], "b": [2]}
+    assert mock_llm.ainvoke.await_count == 1
+    mock_llm.invoke.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_agent_sends_only_database_work_to_the_executor(mock_llm, mock_db_connection):
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, reuse_sql=False)
+    mock_llm.ainvoke = AsyncMock(return_value=MagicMock(content="SELECT * FROM table"))
+    mock_result = MagicMock()
+    mock_result.partitions.return_value = [[(1, 2)]]
+    mock_result.keys.return_value = ["a", "b"]
+    mock_db_connection.execute.return_value = mock_result
+
+    calls = []
+
+    async def run(_database, func, *args):
+        calls.append(func.__name__)
+        return func(*args)
+
+    executor = MagicMock(run=run)
+    with patch("app.tools.sql_data_analyst_agent.get_database_executor", return_value=executor):
+        state = await agent.ainvoke_agent("get data", auto_display=False)
+
+    assert state["data_sql"].to_dict("list") == {"a": [1], "b": [2]}
+    assert "_execute_sql" in calls
+    assert set(calls) <= {"_execute_sql", "get_schema"}
 
 
 def test_generate_and_execute_sql_error(mock_llm, mock_db_connection):
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection)
+    mock_llm.invoke.return_value = MagicMock(content="SELECT * FROM table")
+    mock_db_connection.execute.side_effect = Exception("SQL error")
+    agent._generate_and_execute_sql("get data", {"needs_visualization": False})
+    assert "SQL execution failed" in agent.get_error()
+    assert mock_db_connection.execute.call_count == agent.max_sql_attempts
+    assert mock_llm.invoke.call_count == agent.max_sql_attempts
+
+
+def test_generate_and_execute_sql_repairs_failed_query(mock_llm, mock_db_connection):
     agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection)
     mock_llm.invoke.side_effect = [
+        MagicMock(content="SELECT * FROM tabel"),
         MagicMock(content="SELECT * FROM table"),
-        MagicMock(content="invalid code"),
     ]
-    mock_db_connection.execute.side_effect = Exception("SQL error")
+    mock_result = MagicMock()
+    mock_result.partitions.return_value = [[(1,)]]
+    mock_result.keys.return_value = ["a"]
+    mock_db_connection.execute.side_effect = [Exception("no such table: tabel"), mock_result]
+
     agent._generate_and_execute_sql("get data", {"needs_visualization": False})
-    assert "SQL execution failed" in agent.get_error()
+
+    repair_prompt = mock_llm.invoke.call_args_list[1].args[0]
+    assert "no such table: tabel" in repair_prompt
+    assert "SELECT * FROM tabel" in repair_prompt
+    assert agent.get_sql_query_code() == "SELECT * FROM table"
+    assert agent._state["sql_attempts"] == 2
+    assert agent.get_error() is None
+    mock_db_connection.rollback.assert_called_once()
+
+
+def test_write_statement_is_not_repaired(mock_llm, mock_db_connection):
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, reuse_sql=False)
+    mock_llm.invoke.return_value = MagicMock(content="UPDATE orders SET total = 0")
+    mock_result = MagicMock(returns_rows=False, rowcount=3)
+    mock_db_connection.execute.return_value = mock_result
+
+    agent._generate_and_execute_sql("zero the totals", {"needs_visualization": False})
+
+    assert agent.get_error() is None
+    assert agent.get_data_sql()["rows_affected"].tolist() == [3]
+    assert agent._state["sql_attempts"] == 1
+    assert mock_llm.invoke.call_count == 1
+    mock_db_connection.rollback.assert_not_called()
+
+
+def test_result_without_rows_is_not_a_sql_error(mock_llm, mock_db_connection):
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, reuse_sql=False)
+    mock_llm.invoke.return_value = MagicMock(content="CREATE TABLE totals AS SELECT 1")
+
+    with patch.object(agent, "_fetch", side_effect=sql.exc.ResourceClosedError("no result set")):
+        agent._generate_and_execute_sql("make a totals table", {"needs_visualization": False})
+
+    assert agent.get_error() is None
+    assert mock_llm.invoke.call_count == 1
 
 
 def test_generate_visualization_success(mock_llm, mock_db_connection):
@@ -119,3 +205,14 @@ def test_getters(mock_llm, mock_db_connection):
     assert agent.get_sql_query_code() == "SELECT *"
     assert agent.get_sql_query_code(markdown=True) == "```sql\nSELECT *\n```"
     assert agent.get_error() == "test error"
+
+
+def test_generate_visualization_runs_function_in_sandbox(mock_llm, mock_db_connection):
+    sandbox = MagicMock()
+    sandbox.run.return_value = go.Figure()
+    agent = SQLDataAnalysisAgent(model=mock_llm, connection=mock_db_connection, sandbox=sandbox)
+    agent._state["data_sql"] = pd.DataFrame({"x": [1, 2]})
+    mock_llm.invoke.return_value = MagicMock(content="def create_visualization(df):\n    return go.Figure()")
+    agent._generate_visualization("create a chart")
+    assert agent.get_plotly_graph() is sandbox.run.return_value
+    assert sandbox.run.call_args.kwargs == {"function_name": "create_visualization"}
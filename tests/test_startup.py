@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _imported_after(statement, modules):
+    """Run a statement in a fresh interpreter and return which of the modules it imported."""
+    probe = f"{statement}; import sys; print(','.join(m for m in {modules!r} if m in sys.modules))"
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-test"}
+    completed = subprocess.run(
+        [sys.executable, "-c", probe], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return [module for module in completed.stdout.strip().split(",") if module]
+
+
+def test_command_line_does_not_import_ui_or_plotting_modules():
+    assert _imported_after("import main", ["gradio", "plotly.express", "statsmodels", "matplotlib"]) == []
+
+
+@pytest.mark.parametrize("module", ["app.tools.ingestion", "app.tools.excel_cache", "app.tools.sandbox"])
+def test_tool_modules_do_not_import_the_agents(module):
+    agents = ["app.agent_orchestrator", "app.tools.sql_data_analyst_agent", "app.tools.data_analyst_agent"]
+    assert _imported_after(f"import {module}", agents) == []
+
+
+def test_package_exports_load_on_access():
+    import app
+    import app.tools
+
+    from app.tools.data_analyst_agent import DataVisualizationAgent
+    from app.tools.sql_data_analyst_agent import SQLDataAnalysisAgent
+
+    assert app.SQLDataAnalysisAgent is SQLDataAnalysisAgent
+    assert app.tools.DataVisualizationAgent is DataVisualizationAgent
+    with pytest.raises(AttributeError):
+        app.missing  # noqa: B018